@@ -98,9 +98,6 @@ def main(fromMonth, fromDay, fromHour, toMonth, toDay, toHour):
     analysisPeriod = makeTuple(int(fromMonth), int(fromDay), int(fromHour),
                             int(toMonth),int(toDay), int(toHour))
     
-    lb_preparation = sc.sticky["ladybug_Preparation"]()
-    lb_preparation.readRunPeriod(analysisPeriod)
-    
     return analysisPeriod
 
 if _fromMonth_==None: _fromMonth_ = 1;
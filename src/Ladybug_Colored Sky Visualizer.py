@@ -362,27 +362,15 @@ def main(projection, doy, days, months, year, hours, timeZone, latitude, longitu
                 northRotation = rc.Geometry.Transform.Rotation(northAngle, rc.Geometry.Vector3d.ZAxis, basePoints[domeCount])
                 dome.Transform(northRotation)
         
-        #Create a function to split up lists into chunks based on the resolution.
-        def chunks(l, n):
-            if n < 1:
-                n = 1
-            return [l[i:i + n] for i in range(0, len(l), n)]
+        #Get the color values for all the skies at once. They are in the order of the mesh vertices.
+        dates = [(day, hour) for day in doy for hour in hours]
+        allSkies = lb_skyColor.calcSkies(dates, year, timeZone, latitude, longitude, turbidity, int(resolution))
         
         #Create the skies.
         for dayCount, day in enumerate(doy):
             for hourCount, hour in enumerate(hours):
-                #Get the color values for the sky and create the mesh.
-                sky = lb_skyColor.createSky(day, year, hour, timeZone, latitude, longitude, turbidity)
-                fullSkyRGB, fullSkyXYZ = lb_skyColor.calcFullSky(int(resolution))
-                fullSkyXYZ = chunks(fullSkyXYZ, resolution+1)
-                fullSkyRGB = chunks(fullSkyRGB, resolution+1)
-                finalFullSkyRGB = []
-                finalFullSkyXYZ = []
-                for count, item in enumerate(fullSkyRGB[0]):
-                    for list in fullSkyRGB:
-                        finalFullSkyRGB.append(list[count])
-                    for list in fullSkyXYZ:
-                        finalFullSkyXYZ.append(list[count])
+                #Color the mesh.
+                finalFullSkyRGB, finalFullSkyXYZ = allSkies[dayCount*len(hours)+hourCount]
                 skyColors.append(finalFullSkyRGB)
                 skyColorsXYZ.append(finalFullSkyXYZ)
                 skyMesh = uncoloredSkyMeshes[dayCount*hourCount+hourCount]
@@ -400,6 +388,7 @@ def main(projection, doy, days, months, year, hours, timeZone, latitude, longitu
                 allTextPt.append(lb_visualization.BoundingBoxPar[5])
                 
                 #Print the information for each sky
+                lb_skyColor.createSky(day, year, hour, timeZone, latitude, longitude, turbidity)
                 lb_skyColor.info()
         
         #If the user has specified a base point, move all of the geometry.
@@ -429,7 +429,6 @@ def checkSkyResolution(skyResolution, allDataDict, analysisPeriod, latitude, lon
     #Get all of the sun vectors for the analysis period.
     sunVectors = []
     sunUpHoys = []
-    lb_sunpath.initTheClass(latitude, north, rc.Geometry.Point3d.Origin, 1, longitude, timeZone)
     if analysisPeriod != [(1,1,1), (12,31,24)]:
         HOYs, months, days = lb_preparation.getHOYsBasedOnPeriod(analysisPeriod, 1)
     else:
@@ -438,14 +437,12 @@ def checkSkyResolution(skyResolution, allDataDict, analysisPeriod, latitude, lon
     
     
     
+    lb_sunPositions = sc.sticky["ladybug_SunPositions"]
     if skyResolution <= 4:
+        sunPositionTable = lb_sunPositions.fromHOYs(latitude, longitude, timeZone, HOYs, north)
         for count, hoy in enumerate(HOYs):
-            d, m, h = lb_preparation.hour2Date(hoy, True)
-            m += 1
-            lb_sunpath.solInitOutput(m, d, h)
-            
-            if lb_sunpath.solAlt >= 0:
-                sunVec = lb_sunpath.sunReverseVectorCalc()
+            if sunPositionTable.altitudes[count] >= 0:
+                sunVec = rc.Geometry.Vector3d(*sunPositionTable.vectors[count])
                 sunVectors.append(sunVec)
                 sunUpHoys.append(count)
                 for path in allDataDict:
@@ -462,13 +459,10 @@ def checkSkyResolution(skyResolution, allDataDict, analysisPeriod, latitude, lon
             for division in hourDivisions:
                 newHOYs.append(hoy - 1 + division)
             newHOYs.append(hoy)
-        for hoy in newHOYs:
-            d, m, h = lb_preparation.hour2Date(hoy, True)
-            m += 1
-            lb_sunpath.solInitOutput(m, d, h)
-            
-            if lb_sunpath.solAlt >= 0:
-                sunVec = lb_sunpath.sunReverseVectorCalc()
+        sunPositionTable = lb_sunPositions.fromHOYs(latitude, longitude, timeZone, newHOYs, north, False, len(hourDivisions) + 1)
+        for count, hoy in enumerate(newHOYs):
+            if sunPositionTable.altitudes[count] >= 0:
+                sunVec = rc.Geometry.Vector3d(*sunPositionTable.vectors[count])
                 sunVectors.append(sunVec)
                 sunUpHoys.append(hoy)
                 for path in allDataDict:
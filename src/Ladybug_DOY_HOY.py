@@ -70,15 +70,16 @@ def main(days, months, hours):
             ghenv.Component.AddRuntimeMessage(w, warning)
             return -1
         lb_preparation = sc.sticky["ladybug_Preparation"]()
+        lb_calendar = sc.sticky["ladybug_Calendar"].get()
         for m in months:
             for d in days:
                 for h in hours:
                     hour = lb_preparation.checkHour(float(h))
                     month  = lb_preparation.checkMonth(int(m))
                     day = lb_preparation.checkDay(int(d), m, ghenv.Component)
-                    HOY.append(lb_preparation.date2Hour(month, day, hour))
-                    DOY.append(int(lb_preparation.getJD(month, day)))
-                    date.append(lb_preparation.hour2Date(lb_preparation.date2Hour(month, day, hour)))
+                    HOY.append(lb_calendar.date2Hour(month, day, hour))
+                    DOY.append(int(lb_calendar.getJD(month, day)))
+                    date.append(lb_calendar.hour2Date(HOY[-1]))
         return HOY, DOY, date
     else:
         print "You should first let the Ladybug fly..."
@@ -66,17 +66,17 @@ def main(HOY):
             w = gh.GH_RuntimeMessageLevel.Warning
             ghenv.Component.AddRuntimeMessage(w, warning)
             return -1
-        lb_preparation = sc.sticky["ladybug_Preparation"]()
+        lb_calendar = sc.sticky["ladybug_Calendar"].get()
         day = []
         month = []
         hour = []
         date = []
         for hoy in HOY:
-            d, m, t = lb_preparation.hour2Date(hoy, True)
+            d, m, t = lb_calendar.hour2Date(hoy, True)
             day.append(d)
             month.append(m + 1)
             hour.append(t)
-            dat = lb_preparation.hour2Date(hoy)
+            dat = lb_calendar.hour2Date(hoy)
             
             if dat.endswith('24:00'):
                 dat = dat.replace("24:00", "00:00")
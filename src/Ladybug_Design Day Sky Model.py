@@ -62,7 +62,6 @@ import Grasshopper.Kernel as gh
 import Rhino as rc
 import math
 import os
-from itertools import izip
 import shutil
 
 w = gh.GH_RuntimeMessageLevel.Warning
@@ -87,107 +86,6 @@ def generateWea(workingDir, header, diffuseRad, directRad, lb_preparation):
     weaFile.close()
     return outputFile
 
-def readMTXFile(daylightMtxDif, daylightMtxDir, n, newLocName, lat, lngt, timeZone):
-    # All the patches on top high get the same values so maybe
-    # I should re-create the geometry 577 instead of 580
-    # and keep in mind that first patch is ground!
-    # I create the dictionary only for sky patches and don't collect the data
-    # for the first patch
-    # this line could have saved me 5 hours
-    skyPatchesDict = {1 : 145,
-                      2 : 580 - 3}
-
-    numOfPatchesInEachRow = {1: [30, 30, 24, 24, 18, 12, 6, 1],
-                             2: [60, 60, 60, 60, 48, 48, 48, 48, 36, 36, 24, 24, 12, 12, 1]}
-                             
-    # first row is horizon and last row is the one 
-    strConv = {1 : [0.0435449227, 0.0416418006, 0.0473984151, 0.0406730411, 0.0428934136, 0.0445221864, 0.0455168385, 0.0344199465],
-               2: [0.0113221971, 0.0111894547, 0.0109255262, 0.0105335058, 0.0125224872, 0.0117312774, 0.0108025291, 0.00974713106, 0.011436609, 0.00974295956, 0.0119026242, 0.00905126163, 0.0121875626, 0.00612971396, 0.00921483254]}
-    
-    numOfSkyPatches = skyPatchesDict[n]
-    
-    # create an empty dictionary
-    radValuesDict = {}
-    for skyPatch in range(numOfSkyPatches):
-        radValuesDict[skyPatch] = {}
-        
-    resFileDif = open(daylightMtxDif, "r") 
-    resFileDir = open(daylightMtxDir, "r") 
-    
-    def getValue(line, rowNumber):
-        R, G, B = line.split(' ')
-        value = (.265074126 * float(R) + .670114631 * float(G) + .064811243 * float(B)) * strConv[n][rowNumber]
-        return value
-        
-    lineCount = 0
-    extraHeadingLines = 0 # no heading
-    warnOff = False
-    failedHours = {}
-    for difLine, dirLine in izip(resFileDif, resFileDir):
-        # each line is the data for each hour for a single patch
-        
-        # new version of gendaymtx genrates a header
-        # this is a check to make sure the component will work for both versions
-        if lineCount == 0 and difLine.startswith("#?RADIANCE"):
-            # the file has a header
-            extraHeadingLines = -8
-            
-        if lineCount + extraHeadingLines < 0:
-            # pass heading line
-            lineCount += 1
-            continue
-        
-        # these lines is an empty line to separate patches do let's pass them
-        hour = (lineCount + 1 + extraHeadingLines)% 8761
-        
-        #print lineCount, hour
-        
-        if hour != 0:
-            patchNumber = int((lineCount + 1 + extraHeadingLines) /8761)
-            
-            # first patch is ground!
-            if patchNumber != 0: #and patchNumber < numOfSkyPatches:
-                for rowCount, patchCountInRow in enumerate(numOfPatchesInEachRow[n]):
-                    if patchNumber - 1 < sum(numOfPatchesInEachRow[n][:rowCount+1]):
-                        rowNumber = rowCount
-                        # print rowNumber
-                        break
-                try:
-                    difValue = getValue(difLine, rowNumber)
-                    dirValue = getValue(dirLine, rowNumber)
-                except Exception, e:
-                    value = 0
-                    if not warnOff:
-                        print "genDayMtx returns null Values for few hours. The study will run anyways." + \
-                              "\nMake sure that you are using an standard epw file." + \
-                              "\nThe failed hours are listed below in [Month/Day @Hour] format."
-                    warnOff = True
-                    day, month, time = hour2Date(hour - 1)
-                    if hour-1 not in failedHours.keys():
-                        failedHours[hour-1] = [day, month, time]
-                        print "Failed to read the results > " + month + "/" + day + " @" + time
-                    
-                try: radValuesDict[patchNumber-1][hour] = [difValue, dirValue]
-                except:print patchNumber-1, hour, value
-            
-        lineCount += 1
-    
-    resFileDif.close()
-    resFileDir.close()
-    
-    class SkyResultsCollection(object):
-        def __init__(self, valuesDict, locationName, lat, lngt, timeZone):
-            self.d = valuesDict
-            self.location = locationName
-            self.lat = lat
-            self.lngt = lngt
-            self.timeZone = timeZone
-        
-        def ToString(self):
-            return 'AnnualDaylightMatrix::%s' % self.location
-    
-    return SkyResultsCollection(radValuesDict, newLocName, lat, lngt, timeZone)
-
 def main(location, monthlyTauBeam, monthlyTauDiffuse, skyDensity, workingDir, useOldRes, genCumSky):
     # Call the necessary libraries.
     lb_preparation = sc.sticky["ladybug_Preparation"]()
@@ -377,7 +275,7 @@ def main(location, monthlyTauBeam, monthlyTauDiffuse, skyDensity, workingDir, us
             os.system('"%s"' % batchFile)
         
         # Read in the result matrix.
-        cumulativeSkyMtx = readMTXFile(outputFileDif, outputFileDir, n, newLocName, lat, lngt, timeZone)
+        cumulativeSkyMtx = sc.sticky["ladybug_SkyMatrix"].fromMtxFiles(outputFileDif, outputFileDir, n, newLocName, lat, lngt, timeZone)
     else:
         cumulativeSkyMtx = None
     
@@ -95,7 +95,7 @@ def main(_epw_file):
             return -1
         
         locationData = lb_preparation.epwLocation(_epw_file)
-        weatherData = lb_preparation.epwDataReader(_epw_file, locationData[0])
+        weatherData = lb_preparation.epwDataReader(_epw_file, locationData[0], extraFields = [33])
         
         return locationData, weatherData
     
@@ -132,7 +132,7 @@ if initCheck == True and _epwFile and _epwFile.lower().endswith('.epw'):
     result = main(_epwFile)
     if result!= -1:
         location, locName, latitude = result[0][-1], result[0][0], result[0][1]
-        dryBulbTemperature, dewPointTemperature, relativeHumidity, windSpeed, windDirection, directNormalRadiation, diffuseHorizontalRadiation, globalHorizontalRadiation, directNormalIlluminance, diffuseHorizontalIlluminance, globalHorizontalIlluminance, totalSkyCover, horizontalInfraredRadiation, barometricPressure, modelYear = result[1][:]
+        dryBulbTemperature, dewPointTemperature, relativeHumidity, windSpeed, windDirection, directNormalRadiation, diffuseHorizontalRadiation, globalHorizontalRadiation, directNormalIlluminance, diffuseHorizontalIlluminance, globalHorizontalIlluminance, totalSkyCover, horizontalInfraredRadiation, barometricPressure, modelYear, liquidPrecipitationDepth = result[1][:]
         print 'Hourly weather data for ' + locName + ' is imported successfully!'
 elif initCheck == True:
     print "Please connect a valid epw file address to _epw_file input..."
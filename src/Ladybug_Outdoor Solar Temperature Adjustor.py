@@ -204,7 +204,7 @@ def checkTheInputs():
     directSolarRad = []
     if len(_cumSkyMtxOrDirNormRad) > 0:
         if _cumSkyMtxOrDirNormRad != [None]:
-            if "SkyResultsCollection object" in str(_cumSkyMtxOrDirNormRad[0]):
+            if hasattr(_cumSkyMtxOrDirNormRad[0], 'diffuse'):
                 cumSkyMtx = _cumSkyMtxOrDirNormRad[0]
                 location = cumSkyMtx.location
             elif str(_cumSkyMtxOrDirNormRad[0]) == 'key:location/dataType/units/frequency/startsAt/endsAt':
@@ -681,65 +681,18 @@ def runAnalyses(testPoints, ptsNormals, meshSrfAreas, analysisSrfs, contextSrfs,
     
     return radResults, totalRadResults, listInfo, intersectionMtx
 
-def getHourlySky(daylightMtxDict, HOY):
+def getHourlySky(skyMtx, HOY):
     # for presentation
     lb_preparation = sc.sticky["ladybug_Preparation"]()
     stDate = lb_preparation.hour2Date(HOY, 1)
     analysisP = ((stDate[1]+1, stDate[0], stDate[2]-1),(stDate[1]+1, stDate[0], stDate[2]))
     
-    hourlyMtx = []
-    for patchNumber in daylightMtxDict.keys():
-        # first patch is the ground
-        #if patchNumber!=0:
-        hourlyMtx.append(daylightMtxDict[patchNumber][HOY])
+    hourlyMtx = skyMtx.hourlyValues(HOY)
     return hourlyMtx, analysisP
 
-def getCumulativeSky(daylightMtxDict, runningPeriod):
-    
-    lb_preparation = sc.sticky["ladybug_Preparation"]()
-    
-    def selectHourlyData(dataList, analysisPeriodOrHOY):
-        # read analysis period
-        stMonth, stDay, stHour, endMonth, endDay, endHour = lb_preparation.readRunPeriod(analysisPeriodOrHOY, False)
-        
-        selHourlyData =[];
-        
-        # select data
-        stAnnualHour = lb_preparation.date2Hour(stMonth, stDay, stHour)
-        endAnnualHour = lb_preparation.date2Hour(endMonth, endDay, endHour)
-        
-        # check it goes from the end of the year to the start of the year
-        if stAnnualHour < endAnnualHour:
-            for i, item in enumerate(dataList[stAnnualHour-1:endAnnualHour+1]):
-                if stHour-1 <= (i + stHour - 1)%24 <= endHour-1: selHourlyData.append(item)
-            type = True
-        else:
-            for i, item in enumerate(dataList[stAnnualHour-1:]):
-                if stHour-1 <= (i + stHour - 1)%24 <= endHour-1: selHourlyData.append(item)
-            for i, item in enumerate(dataList[:endAnnualHour + 1]):
-                if stHour-1 <= i %24 <= endHour-1: selHourlyData.append(item)
-            type = False
-        
-        return selHourlyData
-    
-    HOYS = selectHourlyData(range(8760), runningPeriod)
-    
-    hourlyMtx = []
-    for patchNumber in daylightMtxDict.keys():
-        cumulativeDifValue = 0
-        cumulativeDirValue = 0
-        # adding upp the values
-        try:
-            for HOY in HOYS:
-                difValue, dirValue = daylightMtxDict[patchNumber][HOY + 1]
-                cumulativeDifValue += difValue
-                cumulativeDirValue += dirValue 
-        except Exception, e:
-            print `e`
-            
-        hourlyMtx.append([cumulativeDifValue/1000, cumulativeDirValue/1000])
-
-    return hourlyMtx
+def getCumulativeSky(skyMtx, runningPeriod):
+    # the period is cumulated from the running totals of the sky matrix
+    return [[difValue/1000, dirValue/1000] for difValue, dirValue in skyMtx.cumulatePeriod(runningPeriod)]
 
 def prepareLBList(skyMtxLists, analysisPeriodOrHOY, locName, unit, removeDiffuse, removeDirect):
     lb_preparation = sc.sticky["ladybug_Preparation"]()
@@ -877,8 +830,8 @@ def main(method, baseTempType, radTemp, infraredRad, mannequinMesh, groundMesh,
     
     #Process the cumulative sky into an initial selected sky.
     skyMtxLists = []
-    if periodMethod == 0: skyMtxLists = getCumulativeSky(cumSkyMtx.d, analysisPeriodOrHOY)
-    else: skyMtxLists, analysisPeriodTxt = getHourlySky(cumSkyMtx.d, analysisPeriodOrHOY)
+    if periodMethod == 0: skyMtxLists = getCumulativeSky(cumSkyMtx, analysisPeriodOrHOY)
+    else: skyMtxLists, analysisPeriodTxt = getHourlySky(cumSkyMtx, analysisPeriodOrHOY)
     
     #Set a unit for the analysis.
     if len(HOYS) == 1: unit = 'Wh'
@@ -921,13 +874,8 @@ def main(method, baseTempType, radTemp, infraredRad, mannequinMesh, groundMesh,
             skyViews = []
             if baseTempType == True:
                 avgSkyTemp = sum(skyTemp)/len(skyTemp)
-                for ptCount in intersectionMtx.keys():
-                    skyView = 0
-                    numPatches = len(intersectionMtx[ptCount].keys())
-                    for patchCount in intersectionMtx[ptCount].keys():
-                        if intersectionMtx[ptCount][patchCount]['isIntersect']:
-                            skyView = skyView + 1/numPatches
-                    skyViews.append(skyView)
+                for ptCount in range(intersectionMtx.numOfPoints):
+                    skyViews.append(float(intersectionMtx.visiblePatchCount(ptCount)) / intersectionMtx.numOfPatches)
                 skyViewFac = 0
                 for count, area in enumerate(personMeshAreas):
                     skyViewFac = skyViewFac + ((area/totalPersonArea) * skyViews[count])
@@ -968,6 +916,12 @@ def main(method, baseTempType, radTemp, infraredRad, mannequinMesh, groundMesh,
             
             intDict = intersectionMtx
             
+            #Get the radiation on the person and on the ground for all the hours with one pass of the intersection matrix over the hourly sky.
+            hourlyRadiation = {}
+            for blockHOYs, blockResults in intDict.hourlyIrradiance(cumSkyMtx, HOYS):
+                for hour, radiationResult in zip(blockHOYs, zip(*blockResults)):
+                    hourlyRadiation[hour] = (sum([a*b for a,b in zip(radiationResult[:-1],personMeshAreas)]), radiationResult[-1])
+            
             #Add the headers to the computed lists.
             if periodMethod == 0:
                 analysisStart = analysisPeriodOrHOY[0]
@@ -1009,30 +963,7 @@ def main(method, baseTempType, radTemp, infraredRad, mannequinMesh, groundMesh,
                         if count != len(HOYS)-1: lastVal = 1
                         else: lastVal = 0
                         if altitudes[count] > 0 or altitudes[count-1] > 0 or altitudes[count+lastVal] > 0:
-                            skyMtxLists, _analysisPeriodOrHOY_ = getHourlySky(cumSkyMtx.d, hour)
-                            selSkyMatrix = prepareLBList(skyMtxLists, _analysisPeriodOrHOY_, location, unit, False, False)
-                            
-                            indexList, listInfo = lb_preparation.separateList(selSkyMatrix, lb_preparation.strToBeFound)
-                            #separate total, diffuse and direct radiations
-                            separatedLists = []
-                            for i in range(len(indexList)-1):
-                                selList = []
-                                [selList.append(float(x)) for x in selSkyMatrix[indexList[i] + 7:indexList[i+1]]]
-                                separatedLists.append(selList)
-                            
-                            skyMatrix = separatedLists[0]
-                            
-                            radiationResult = []
-                            for ptCount in  intDict.keys():
-                                radValue = 0
-                                for patchCount in intDict[ptCount].keys():
-                                    if intDict[ptCount][patchCount]['isIntersect']:
-                                        radValue = radValue + (skyMatrix[patchCount] * math.cos(intDict[ptCount][patchCount]['vecAngle']))
-                                radiationResult.append(radValue)
-                            
-                            personRad = radiationResult[:-1]
-                            groundRad = radiationResult[-1]
-                            totalPersonBeamDiffRad = sum([a*b for a,b in zip(personRad,personMeshAreas)])
+                            totalPersonBeamDiffRad, groundRad = hourlyRadiation[hour]
                             
                             #Account for the transmissivity of glass.
                             if finalWinTransmiss[count] != 1:
@@ -1076,30 +1007,7 @@ def main(method, baseTempType, radTemp, infraredRad, mannequinMesh, groundMesh,
                     if count != len(HOYS)-1: lastVal = 1
                     else: lastVal = 0
                     if altitudes[count] > 0 or altitudes[count-1] > 0 or altitudes[count+lastVal] > 0:
-                        skyMtxLists, _analysisPeriodOrHOY_ = getHourlySky(cumSkyMtx.d, HOYS[count])
-                        selSkyMatrix = prepareLBList(skyMtxLists, _analysisPeriodOrHOY_, location, unit, False, False)
-                        
-                        indexList, listInfo = lb_preparation.separateList(selSkyMatrix, lb_preparation.strToBeFound)
-                        #separate total, diffuse and direct radiations
-                        separatedLists = []
-                        for i in range(len(indexList)-1):
-                            selList = []
-                            [selList.append(float(x)) for x in selSkyMatrix[indexList[i] + 7:indexList[i+1]]]
-                            separatedLists.append(selList)
-                        
-                        skyMatrix = separatedLists[0]
-                        
-                        radiationResult = []
-                        for ptCount in  intDict.keys():
-                            radValue = 0
-                            for patchCount in intDict[ptCount].keys():
-                                if intDict[ptCount][patchCount]['isIntersect']:
-                                    radValue = radValue + (skyMatrix[patchCount] * math.cos(intDict[ptCount][patchCount]['vecAngle']))
-                            radiationResult.append(radValue)
-                        
-                        personRad = radiationResult[:-1]
-                        groundRad = radiationResult[-1]
-                        totalPersonBeamDiffRad = sum([a*b for a,b in zip(personRad,personMeshAreas)])
+                        totalPersonBeamDiffRad, groundRad = hourlyRadiation[HOYS[count]]
                         
                         #Account for the transmissivity of glass.
                         if (finalWinTransmiss[count]) != 1:
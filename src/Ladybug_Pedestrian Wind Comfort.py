@@ -154,7 +154,6 @@ import System
 import Rhino
 import time
 import math
-import re
 
 
 def getEpwData(epwFile):
@@ -163,12 +162,11 @@ def getEpwData(epwFile):
         try:
             # location data
             locationName, latitude, longitude, timeZone, elevation, locationString = lb_preparation.epwLocation(epwFile)
-            # weather data
-            weatherData = lb_preparation.epwDataReader(epwFile, locationName)
-            dryBulbTemperature, dewPointTemperature, relativeHumidity, windSpeed, windDirection, directNormalRadiation, diffuseHorizontalRadiation, globalHorizontalRadiation, directNormalIlluminance, diffuseHorizontalIlluminance, globalHorizontalIlluminance, totalSkyCover, liquidPrecipitationDepth, barometricPressure, modelYear = weatherData
+            # weather data. only wind speed and direction are loaded from the weather cache
+            columns = lb_preparation.epwColumnReader(epwFile, [21, 20])[1]
             
-            windSpeedData = windSpeed[7:]
-            windDirectionData = windDirection[7:]
+            windSpeedData = columns[21].tolist()
+            windDirectionData = columns[20].tolist()
             
             validEpwData = True
             printMsg = "ok"
@@ -377,86 +375,6 @@ def checkAnnualHourlyInputData(annualHourlyData):
         return validAnnualHourlyData, annualHourlyDataLists, annualHourlyDataListsEpwNames, printMsg
 
 
-def checkConditionalStatement(conditionalStatement, annualHourlyDataLists, annualHourlyDataListsEpwNames, weatherPerHourDataSubLists, addZero):
-    
-    if conditionalStatement == None and len(annualHourlyDataLists) > 0: # conditionalStatement_ not inputted, annualHourlyData_ inputted
-        validConditionalStatement = False
-        weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-        printMsg = "Please supply \"conditionalStatement_\" for inputted \"annualHourlyData_\" data."
-        return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-    elif conditionalStatement == None and len(annualHourlyDataLists) == 0:  # conditionalStatement_ not inputted, annualHourlyData_ not inputted
-        conditionalStatement = "True"
-    else:  # conditionalStatement_ inputted, annualHourlyData_ not
-        if annualHourlyDataLists == []:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "Please supply \"annualHourlyData_\" data for inputted \"conditionalStatement_\"."
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        else:  # both conditionalStatement_ and annualHourlyData_ inputted
-            conditionalStatement = conditionalStatement.lower()
-            conditionalStatement = re.sub(r"\b([a-z])\b", r"\1[i]", conditionalStatement)
-    
-    annualHourlyDataListsNames = map(chr, range(97, 123))
-    
-    # finalPrint conditonal statements for "printOutput" function
-    if conditionalStatement != "True":  # conditionalStatement_ not inputted
-        # replace conditionalStatement annualHourlyDataListsNames[i] names with annualHourlyDataListsEpwNames:
-        conditionalStatementForFinalPrint = conditionalStatement[:]
-        for i in range(len(annualHourlyDataLists)):
-            conditionalStatementForFinalPrint = conditionalStatementForFinalPrint.replace(annualHourlyDataListsNames[i]+"[i]", annualHourlyDataListsEpwNames[i])
-    else:
-        conditionalStatementForFinalPrint = "No condition"
-    
-    annualHourlyDataListsNames = map(chr, range(97, 123))
-    numberOfLetters = 0
-    
-    for letter in annualHourlyDataListsNames:
-        changedLetter = letter+"[i]"
-        if changedLetter in conditionalStatement:
-            numberOfLetters += 1
-    if numberOfLetters > len(annualHourlyDataLists):
-        validConditionalStatement = False
-        weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-        printMsg = "The number of a,b,c... variables you supplied in \"conditionalStatement_\" is larger than the number of \"annualHourlyData_\" lists you inputted. Please make the numbers of these two equal or less."
-        return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-    else:
-        for i in range(len(annualHourlyDataLists)):
-            exec("%s = %s" % (annualHourlyDataListsNames[i],annualHourlyDataLists[i]))
-        
-        try:
-            weatherPerHourDataConditionalStatementSubLists = []
-            for i in range(len(weatherPerHourDataSubLists)):
-                weatherPerHourDataConditionalStatementSubLists.append([])
-            for i in range(len(weatherPerHourDataSubLists[0])):
-                exec("conditionalSt = %s" % conditionalStatement)
-                if addZero == True:  # add 0 if conditionalStatement == False
-                    if conditionalSt:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(weatherPerHourDataSubLists[k][i])
-                    else:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(0)
-                else:  # skip the value
-                    if conditionalSt:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(weatherPerHourDataSubLists[k][i])
-        except Exception, e:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "Your \"conditionalStatement_\" is incorrect. Please provide a valid conditional statement in Python, such as \"a>25 and b<80\" (without the quotation marks)"
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        
-        if len(weatherPerHourDataConditionalStatementSubLists[0]) == 0:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "No \"annualHourlyData_\" coresponds to \"conditionalStatement_\". Please edit your \"conditionalStatement_\""
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        else:
-            validConditionalStatement = True
-            printMsg = "ok"
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-
-
 def correctEpwWindDirection(cfdSimulationDirections, epwWindDirection):
     # correct the "windDirectionsData" according to the "cfdSimulationDirections"
     # the first closer value will always be used (e.g. epwWindDirection = 30, cfdSimulationDirections = [0,60...], closestEpwWindDirection = 0
@@ -876,7 +794,7 @@ if sc.sticky.has_key("ladybug_release"):
                 if validInputData:
                     validAnnualHourlyData, annualHourlyDataLists, annualHourlyDataListsEpwNames, printMsg = checkAnnualHourlyInputData(annualHourlyData_)
                     if validAnnualHourlyData:
-                        validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg = checkConditionalStatement(conditionalStatement_, annualHourlyDataLists, annualHourlyDataListsEpwNames, [windSpeedData, windDirectionData], True)
+                        validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg = sc.sticky["ladybug_ConditionalStatement"].filterDataLists(conditionalStatement_, annualHourlyDataLists, annualHourlyDataListsEpwNames, [windSpeedData, windDirectionData], True)
                         if validConditionalStatement:
                             windSpeedCondStat, windDirectionCondStat = weatherPerHourDataConditionalStatementSubLists
                             if _runIt:
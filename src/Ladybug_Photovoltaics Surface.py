@@ -122,7 +122,6 @@ import rhinoscriptsyntax as rs
 import scriptcontext as sc
 import Rhino
 import math
-import re
 
 
 def getEpwData(epwFile, albedo):
@@ -131,14 +130,13 @@ def getEpwData(epwFile, albedo):
         try:
             # location data
             locationName, latitude, longitude, timeZone, elevationM, locationString = lb_preparation.epwLocation(epwFile)
-            # weather data
-            weatherData = lb_preparation.epwDataReader(epwFile, locationName)
-            dryBulbTemperature, dewPointTemperature, relativeHumidity, windSpeed, windDirection, directNormalRadiation, diffuseHorizontalRadiation, globalHorizontalRadiation, directNormalIlluminance, diffuseHorizontalIlluminance, globalHorizontalIlluminance, totalSkyCover, liquidPrecipitationDepth, barometricPressure, modelYear = weatherData
+            # weather data. only the required fields are loaded from the weather cache
+            columns = lb_preparation.epwColumnReader(epwFile, [6, 21, 14, 15, 0])[1]
             
-            Ta = dryBulbTemperature[7:]
-            ws = windSpeed[7:]
-            DNI = directNormalRadiation[7:]
-            DHI = diffuseHorizontalRadiation[7:]
+            Ta = columns[6].tolist()
+            ws = columns[21].tolist()
+            DNI = columns[14].tolist()
+            DHI = columns[15].tolist()
             
             if (len(albedo) == 0) or (albedo[0] is ""):
                 albedoL = lb_photovoltaics.calculateAlbedo(Ta)  # default
@@ -153,7 +151,7 @@ def getEpwData(epwFile, albedo):
                 
                 return locationName, latitude, longitude, timeZone, elevationM, Ta, ws, DNI, DHI, yearsHOY, monthsHOY, daysHOY, hoursHOY, HOYs, albedoL, validEpwData, printMsg
             
-            yearsHOY = modelYear[7:]
+            yearsHOY = columns[0].tolist()
             monthsHOY = [1 for i in range(744)] + [2 for i in range(672)] + [3 for i in range(744)] + [4 for i in range(720)] + [5 for i in range(744)] + [6 for i in range(720)] + [7 for i in range(744)] + [8 for i in range(744)] + [9 for i in range(720)] + [10 for i in range(744)] + [11 for i in range(720)] + [12 for i in range(744)]
             
             numberOfDaysMonth = [31,28,31,30,31,30,31,31,30,31,30,31]
@@ -296,86 +294,6 @@ def checkAnnualHourlyInputData(annualHourlyData):
         return validAnnualHourlyData, annualHourlyDataLists, annualHourlyDataListsEpwNames, printMsg
 
 
-def checkConditionalStatement(conditionalStatement, annualHourlyDataLists, annualHourlyDataListsEpwNames, weatherPerHourDataSubLists, addZero):
-    
-    if conditionalStatement == None and len(annualHourlyDataLists) > 0: # conditionalStatement_ not inputted, annualHourlyData_ inputted
-        validConditionalStatement = False
-        weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-        printMsg = "Please supply \"conditionalStatement_\" for inputted \"annualHourlyData_\" data."
-        return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-    elif conditionalStatement == None and len(annualHourlyDataLists) == 0:  # conditionalStatement_ not inputted, annualHourlyData_ not inputted
-        conditionalStatement = "True"
-    else:  # conditionalStatement_ inputted, annualHourlyData_ not
-        if annualHourlyDataLists == []:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "Please supply \"annualHourlyData_\" data for inputted \"conditionalStatement_\"."
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        else:  # both conditionalStatement_ and annualHourlyData_ inputted
-            conditionalStatement = conditionalStatement.lower()
-            conditionalStatement = re.sub(r"\b([a-z])\b", r"\1[i]", conditionalStatement)
-    
-    annualHourlyDataListsNames = map(chr, range(97, 123))
-    
-    # finalPrint conditonal statements for "printOutput" function
-    if conditionalStatement != "True":  # conditionalStatement_ not inputted
-        # replace conditionalStatement annualHourlyDataListsNames[i] names with annualHourlyDataListsEpwNames:
-        conditionalStatementForFinalPrint = conditionalStatement[:]
-        for i in range(len(annualHourlyDataLists)):
-            conditionalStatementForFinalPrint = conditionalStatementForFinalPrint.replace(annualHourlyDataListsNames[i]+"[i]", annualHourlyDataListsEpwNames[i])
-    else:
-        conditionalStatementForFinalPrint = "No condition"
-    
-    annualHourlyDataListsNames = map(chr, range(97, 123))
-    numberOfLetters = 0
-    
-    for letter in annualHourlyDataListsNames:
-        changedLetter = letter+"[i]"
-        if changedLetter in conditionalStatement:
-            numberOfLetters += 1
-    if numberOfLetters > len(annualHourlyDataLists):
-        validConditionalStatement = False
-        weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-        printMsg = "The number of a,b,c... variables you supplied in \"conditionalStatement_\" is larger than the number of \"annualHourlyData_\" lists you inputted. Please make the numbers of these two equal or less."
-        return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-    else:
-        for i in range(len(annualHourlyDataLists)):
-            exec("%s = %s" % (annualHourlyDataListsNames[i],annualHourlyDataLists[i]))
-        
-        try:
-            weatherPerHourDataConditionalStatementSubLists = []
-            for i in range(len(weatherPerHourDataSubLists)):
-                weatherPerHourDataConditionalStatementSubLists.append([])
-            for i in range(len(weatherPerHourDataSubLists[0])):
-                exec("conditionalSt = %s" % conditionalStatement)
-                if addZero == True:  # add 0 if conditionalStatement == False
-                    if conditionalSt:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(weatherPerHourDataSubLists[k][i])
-                    else:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(0)
-                else:  # skip the value
-                    if conditionalSt:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(weatherPerHourDataSubLists[k][i])
-        except Exception, e:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "Your \"conditionalStatement_\" is incorrect. Please provide a valid conditional statement in Python, such as \"a>25 and b<80\" (without the quotation marks)"
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        
-        if len(weatherPerHourDataConditionalStatementSubLists[0]) == 0:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "No \"annualHourlyData_\" coresponds to \"conditionalStatement_\". Please edit your \"conditionalStatement_\""
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        else:
-            validConditionalStatement = True
-            printMsg = "ok"
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-
-
 def main(latitude, longitude, timeZone, elevationM, locationName, years, months, days, hours, HOYs, nameplateDCpowerRating, DCtoACderateFactor, srfArea, srfTiltD, srfAzimuthD, PVmoduleSettings, dryBulbTemperature, windSpeed, directNormalRadiation, diffuseHorizontalRadiation, albedoL, conditionalStatementForFinalPrint):
     # solar radiation, AC,DC power output, module temperature, cell temperature
     ACenergyPerHour = ["key:location/dataType/units/frequency/startsAt/endsAt", locationName, "AC power output", "kWh", "Hourly", (1, 1, 1), (12, 31, 24)]
@@ -388,8 +306,11 @@ def main(latitude, longitude, timeZone, elevationM, locationName, years, months,
     sunZenithDL = []
     AOI_RL = []
     
+    # sun positions for all hours at once
+    sunZenithDs, sunAzimuthDs, sunAltitudeDs = lb_photovoltaics.sunPositions(latitude, longitude, timeZone, years[:len(HOYs)], months[:len(HOYs)], days[:len(HOYs)], [hour-1 for hour in hours[:len(HOYs)]])
+    
     for i,hoy in enumerate(HOYs):
-        sunZenithD, sunAzimuthD, sunAltitudeD = lb_photovoltaics.NRELsunPosition(latitude, longitude, timeZone, years[i], months[i], days[i], hours[i]-1)
+        sunZenithD, sunAzimuthD, sunAltitudeD = sunZenithDs[i], sunAzimuthDs[i], sunAltitudeDs[i]
         Epoa, Eb, Ed_sky, Eground, AOI_R = lb_photovoltaics.POAirradiance(sunZenithD, sunAzimuthD, srfTiltD, srfAzimuthD, directNormalRadiation[i], diffuseHorizontalRadiation[i], albedoL[i])
         Tcell, Pdc_, Pac = lb_photovoltaics.pvwatts(nameplateDCpowerRating, DCtoACderateFactor, srfTiltD, sunZenithD, AOI_R, Epoa, Eb, Ed_sky, Eground, dryBulbTemperature[i], windSpeed[i], directNormalRadiation[i], diffuseHorizontalRadiation[i], PVmoduleSettings, elevationM)
         Epoa = Epoa/1000 # to kWh/m2
@@ -574,7 +495,7 @@ if sc.sticky.has_key("ladybug_release"):
                 if validPVsurfaceData:
                     validAnnualHourlyData, annualHourlyDataLists, annualHourlyDataListsEpwNames, printMsg = checkAnnualHourlyInputData(annualHourlyData_)
                     if validAnnualHourlyData:
-                        validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg = checkConditionalStatement(conditionalStatement_, annualHourlyDataLists, annualHourlyDataListsEpwNames, [dryBulbTemperature, windSpeed, directNormalRadiation, diffuseHorizontalRadiation], True)
+                        validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg = sc.sticky["ladybug_ConditionalStatement"].filterDataLists(conditionalStatement_, annualHourlyDataLists, annualHourlyDataListsEpwNames, [dryBulbTemperature, windSpeed, directNormalRadiation, diffuseHorizontalRadiation], True)
                         if validConditionalStatement:
                             dryBulbTemperatureCondStat, windSpeedCondStat, directNormalRadiationCondStat, diffuseHorizontalRadiationCondStat = weatherPerHourDataConditionalStatementSubLists
                             # all inputs ok
@@ -65,7 +65,7 @@ Provided by Ladybug 0.0.66
         radiationLegend: A legend for the radiation study showing radiation values that correspond to the colors of the radiationMesh. Connect this output to a grasshopper "Geo" component in order to preview the legend separately in the Rhino scene.  
         legendBasePt: The legend base point, which can be used to move the legend in relation to the radiation mesh with the grasshopper "move" component.
         totalRadiation: The total radiation in kWh falling on the input test _geometry.  This is computed through a mass addition of results at each of the test points in kWh/m2 multiplied by the area of the face that the test point is representing.
-        intersectionMtx: A python list that includes the relation between each test point and all the sky patchs on the sky dome.  After running a basic radiation study, you can connect this output to the Ladybug "Real Time Radiation Analysis" component to scroll through the radiation falling on your test geometry on an hour-by-hour, day-by-day, or month-by-month basis in real time.
+        intersectionMtx: A compact matrix that includes the sky patches that each test point sees and how much each of them counts for the point.  After running a basic radiation study, you can connect this output to the Ladybug "Real Time Radiation Analysis" component to scroll through the radiation falling on your test geometry on an hour-by-hour, day-by-day, or month-by-month basis in real time.
 """
 
 ghenv.Component.Name = "Ladybug_Radiation Analysis"
@@ -522,13 +522,7 @@ if _runIt:
             
             legendBasePt = result[-3]
             originalTestPoints = result[-2]
-            intMtx = result[-1]
-            
-            class conevertDictToClass(object):
-                def __init__(self, valuesDict):
-                    self.d = valuesDict
-            
-            intersectionMtx = conevertDictToClass(intMtx)
+            intersectionMtx = result[-1]
             
         elif result!= -1 and len(result) == 5:
             contextMesh, analysisMesh, testPts_flatten, testVec_flatten, originalTestPoints = result
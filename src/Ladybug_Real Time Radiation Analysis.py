@@ -30,7 +30,7 @@ Provided by Ladybug 0.0.66
     
     Args:
         _selectedSkyMatrix: The output from a Ladybug selectedSkyMtx component.  This matrix basically carries all of the radiation values that define a sky and includes a radiation value for each sky patch on the sky dome.  You should use the selectSkyMxt component connected here to scroll through radiation results.
-        _intersectionMatrix: The intersectionMxt output from a Ladybug Radiation Analysis component that has been run for test geometry.  This matrix is basically a python list that includes the relation between each test point in the Radiation Analysis and all the sky patchs on the sky dome.
+        _intersectionMatrix: The intersectionMxt output from a Ladybug Radiation Analysis component that has been run for test geometry.  This matrix includes the sky patches that each test point in the Radiation Analysis sees and how much each of them counts for the point.
     Returns:
         radiationResult: New radiation values for each test point in the original Radiation Analysis.  Values indicate radiation for the the connected sky matrix.  To visualize these new radiation values in the Rhino scene, connect these values to the Ladybug Re-Color Mesh component to re-color the mesh from the original Radiation Analysis with these new values.
 """
@@ -47,9 +47,8 @@ except: pass
 
 
 import scriptcontext as sc
-import math
 
-def main(intDict, selSkyMatrix):
+def main(intersectionMtx, selSkyMatrix):
     if sc.sticky.has_key('ladybug_release'):
         try:
             if not sc.sticky['ladybug_release'].isCompatible(ghenv.Component): return
@@ -66,23 +65,10 @@ def main(intDict, selSkyMatrix):
     else:
         return
         
-    indexList, listInfo = lb_preparation.separateList(selSkyMatrix, lb_preparation.strToBeFound)
     #separate total, diffuse and direct radiations
-    separatedLists = []
-    for i in range(len(indexList)-1):
-        selList = []
-        [selList.append(float(x)) for x in selSkyMatrix[indexList[i] + 7:indexList[i+1]]]
-        separatedLists.append(selList)
+    skyMatrix = sc.sticky["ladybug_DataCollection"].fromHeaderLists(selSkyMatrix)[0]
     
-    skyMatrix = separatedLists[0]
-    
-    radiationResult = []
-    for ptCount in  intDict.keys():
-        radValue = 0
-        for patchCount in intDict[ptCount].keys():
-            if intDict[ptCount][patchCount]['isIntersect']:
-                radValue = radValue + (skyMatrix[patchCount] * math.cos(intDict[ptCount][patchCount]['vecAngle']))
-        radiationResult.append(radValue)
+    radiationResult = intersectionMtx.multiply(skyMatrix)
     return radiationResult
 if _selectedSkyMatrix and _intersectionMatrix:
-    radiationResult = main(_intersectionMatrix.d, _selectedSkyMatrix)
+    radiationResult = main(_intersectionMatrix, _selectedSkyMatrix)
@@ -137,7 +137,6 @@ import rhinoscriptsyntax as rs
 import scriptcontext as sc
 import Rhino
 import math
-import re
 
 
 def getEpwData(epwFile, albedo):
@@ -475,86 +474,6 @@ def checkAnnualHourlyInputData(annualHourlyData):
         return validAnnualHourlyData, annualHourlyDataLists, annualHourlyDataListsEpwNames, printMsg
 
 
-def checkConditionalStatement(conditionalStatement, annualHourlyDataLists, annualHourlyDataListsEpwNames, weatherPerHourDataSubLists, addZero):
-    
-    if conditionalStatement == None and len(annualHourlyDataLists) > 0: # conditionalStatement_ not inputted, annualHourlyData_ inputted
-        validConditionalStatement = False
-        weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-        printMsg = "Please supply \"conditionalStatement_\" for inputted \"annualHourlyData_\" data."
-        return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-    elif conditionalStatement == None and len(annualHourlyDataLists) == 0:  # conditionalStatement_ not inputted, annualHourlyData_ not inputted
-        conditionalStatement = "True"
-    else:  # conditionalStatement_ inputted, annualHourlyData_ not
-        if annualHourlyDataLists == []:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "Please supply \"annualHourlyData_\" data for inputted \"conditionalStatement_\"."
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        else:  # both conditionalStatement_ and annualHourlyData_ inputted
-            conditionalStatement = conditionalStatement.lower()
-            conditionalStatement = re.sub(r"\b([a-z])\b", r"\1[i]", conditionalStatement)
-    
-    annualHourlyDataListsNames = map(chr, range(97, 123))
-    
-    # finalPrint conditonal statements for "printOutput" function
-    if conditionalStatement != "True":  # conditionalStatement_ not inputted
-        # replace conditionalStatement annualHourlyDataListsNames[i] names with annualHourlyDataListsEpwNames:
-        conditionalStatementForFinalPrint = conditionalStatement[:]
-        for i in range(len(annualHourlyDataLists)):
-            conditionalStatementForFinalPrint = conditionalStatementForFinalPrint.replace(annualHourlyDataListsNames[i]+"[i]", annualHourlyDataListsEpwNames[i])
-    else:
-        conditionalStatementForFinalPrint = "No condition"
-    
-    annualHourlyDataListsNames = map(chr, range(97, 123))
-    numberOfLetters = 0
-    
-    for letter in annualHourlyDataListsNames:
-        changedLetter = letter+"[i]"
-        if changedLetter in conditionalStatement:
-            numberOfLetters += 1
-    if numberOfLetters > len(annualHourlyDataLists):
-        validConditionalStatement = False
-        weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-        printMsg = "The number of a,b,c... variables you supplied in \"conditionalStatement_\" is larger than the number of \"annualHourlyData_\" lists you inputted. Please make the numbers of these two equal or less."
-        return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-    else:
-        for i in range(len(annualHourlyDataLists)):
-            exec("%s = %s" % (annualHourlyDataListsNames[i],annualHourlyDataLists[i]))
-        
-        try:
-            weatherPerHourDataConditionalStatementSubLists = []
-            for i in range(len(weatherPerHourDataSubLists)):
-                weatherPerHourDataConditionalStatementSubLists.append([])
-            for i in range(len(weatherPerHourDataSubLists[0])):
-                exec("conditionalSt = %s" % conditionalStatement)
-                if addZero == True:  # add 0 if conditionalStatement == False
-                    if conditionalSt:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(weatherPerHourDataSubLists[k][i])
-                    else:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(0)
-                else:  # skip the value
-                    if conditionalSt:
-                        for k in range(len(weatherPerHourDataConditionalStatementSubLists)):
-                            weatherPerHourDataConditionalStatementSubLists[k].append(weatherPerHourDataSubLists[k][i])
-        except Exception, e:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "Your \"conditionalStatement_\" is incorrect. Please provide a valid conditional statement in Python, such as \"a>25 and b<80\" (without the quotation marks)"
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        
-        if len(weatherPerHourDataConditionalStatementSubLists[0]) == 0:
-            validConditionalStatement = False
-            weatherPerHourDataConditionalStatementSubLists = conditionalStatementForFinalPrint = None
-            printMsg = "No \"annualHourlyData_\" coresponds to \"conditionalStatement_\". Please edit your \"conditionalStatement_\""
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-        else:
-            validConditionalStatement = True
-            printMsg = "ok"
-            return validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg
-
-
 def main(latitude, longitude, timeZone, locationName, years, months, days, hours, heatingLoadPerHour, coldWaterTemperaturePerHour, activeArea, srfTiltD, correctedSrfAzimuthD, dryBulbTemperature, directNormalRadiation, diffuseHorizontalRadiation, albedoL, SWHsystemSettings, conditionalStatementForFinalPrint):
     
     Fr, FrUL, dummycollectorActiveAreaPercent, Cp, mDot, bo, SVF, beamIndexPerHourData, TmaxW, TdischargeW, TdeliveryW, TcoldJanuaryW, TmechRoomL, L, Di, insulT, pipeInsulationConductivity, pumpPower, pumpEfficiency, tankSizeM3, tankLoss, heightDiameterTankRatio, epsilon = SWHsystemSettings
@@ -570,8 +489,11 @@ def main(latitude, longitude, timeZone, locationName, years, months, days, hours
     
     tankArea = 2 * (((tankSizeM3**2)*math.pi*2*heightDiameterTankRatio) ** (1/3)) * (1+1/(2*heightDiameterTankRatio))
     
+    # sun positions for all hours at once
+    sunZenithDs, sunAzimuthDs, sunAltitudeDs = lb_photovoltaics.sunPositions(latitude, longitude, timeZone, years[:8760], months[:8760], days[:8760], [hour-1 for hour in hours[:8760]])
+    
     for i in range(1,8760):
-        sunZenithD, sunAzimuthD, sunAltitudeD = lb_photovoltaics.NRELsunPosition(latitude, longitude, timeZone, years[i], months[i], days[i], hours[i]-1)
+        sunZenithD, sunAzimuthD, sunAltitudeD = sunZenithDs[i], sunAzimuthDs[i], sunAltitudeDs[i]
         Epoa_shaded, Eb_shaded, Ed_sky, Eground, AOI_R = lb_photovoltaics.POAirradiance(sunZenithD, sunAzimuthD, srfTiltD, srfAzimuthD, directNormalRadiation[i], diffuseHorizontalRadiation[i], albedoL[i], beamIndexPerHourData[i], SVF)
         collectorHeatLoss, collectorEfficiency, Qsolar, Qloss, Qsupply, Qaux, Qdis, Qpump, dQ, dt, Tw = lb_photovoltaics.swhdesign(activeArea, srfTiltD, AOI_R, bo, Fr, FrUL, Eb_shaded, Ed_sky, Eground, heatingLoadPerHour[i], Cp, mDot, dryBulbTemperature[i], coldWaterTemperaturePerHour[i], tankWaterTemperaturePerHour[i-1], TdeliveryW, TmaxW, TdischargeW, TmechRoomL[i], L, Di, insulT, pipeInsulationConductivity, pumpPower, pumpEfficiency, tankSizeM3, tankArea, tankLoss, epsilon)
         heatFromTankPerHour.append(Qsupply)
@@ -677,7 +599,7 @@ if sc.sticky.has_key("ladybug_release"):
                     if validSWHsystemSettings:
                         validAnnualHourlyData, annualHourlyDataLists, annualHourlyDataListsEpwNames, printMsg = checkAnnualHourlyInputData(annualHourlyData_)
                         if validAnnualHourlyData:
-                            validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg = checkConditionalStatement(conditionalStatement_, annualHourlyDataLists, annualHourlyDataListsEpwNames, [directNormalRadiation, diffuseHorizontalRadiation], True)
+                            validConditionalStatement, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, printMsg = sc.sticky["ladybug_ConditionalStatement"].filterDataLists(conditionalStatement_, annualHourlyDataLists, annualHourlyDataListsEpwNames, [directNormalRadiation, diffuseHorizontalRadiation], True)
                             if validConditionalStatement:
                                 directNormalRadiationCondStat, diffuseHorizontalRadiationCondStat = weatherPerHourDataConditionalStatementSubLists
                                 # all inputs ok
@@ -400,16 +400,19 @@ def main(latitude, longitude, timeZone, elevation, north, hour, day, month, time
         
         
         lb_sunpath.initTheClass(float(latitude), northAngle, cenPt, scale, longitude, timeZone)
+        # get all the sun positions at once. annual tables are cached for each location
+        days, months, hours = sc.sticky["ladybug_Calendar"].get().hoys2Dates(HOYs)
+        months = [m + 1 for m in months]
+        sunPositionTable = sc.sticky["ladybug_SunPositions"].fromHOYs(float(latitude), longitude, timeZone, HOYs, northAngle, solarOrStandardTime)
         # count total sun up hours
         SUH = 0
         
-        for HOY in HOYs:
-            d, m, h = lb_preparation.hour2Date(HOY, True)
-            m += 1
-            lb_sunpath.solInitOutput(m, d, h, solarOrStandardTime)
+        for count, (d, m, h) in enumerate(zip(days, months, hours)):
+            solAlt = sunPositionTable.altitudes[count]
             
-            if lb_sunpath.solAlt >= 0: SUH += 1
-            if lb_sunpath.solAlt >= 0 and patternList[int(round(lb_preparation.date2Hour(m, d, h)))-1]:
+            if solAlt >= 0: SUH += 1
+            if solAlt >= 0 and patternList[int(round(lb_preparation.date2Hour(m, d, h)))-1]:
+                lb_sunpath.solInitFromTable(sunPositionTable, count)
                 sunSphere, sunVector, sunPoint = lb_sunpath.sunPosPt(sunSc)
                 sunSphere, sunPoint = lb_visualization.sunSpherePt(sunSc, sunPoint, projection, cenPt, scale)
                 # find the hour of the year
@@ -208,7 +208,8 @@ def main(north, geometry, context, gridSize, disFromBase, orientationStudyP,
             else: joinedContext = None
 
             hoursResults, totalHoursResults, sunVisibility = lb_runStudy_GH.parallel_sunlightHoursCalculator(testPoints, ptsNormals, meshSrfAreas, joinedAnalysisMesh, joinedContext,
-                                            parallel, sunVectors_sunlightHour, conversionFac, northVector, timeStep)
+                                            parallel, sunVectors_sunlightHour, conversionFac, northVector, timeStep,
+                                            backend = "ShadowMap", gridSize = float(gridSize))
         else:
             print "Sun vectors should be provided... No sunlight hours study!"
             hoursResults = totalHoursResults = None
@@ -533,11 +533,15 @@ def sunWindowCurves(latitude, northRad, northVec, testPt, scale, hoursPositionSc
     lb_sunpath.initTheClass(float(latitude), northRad, testPt, scale, longitude, timeZone)
     
     months = range(1,13); d = 21; hours = range(0,25)
+    # sun positions of all the curves at once from the shared cache
+    sunPositionTable = sc.sticky["ladybug_SunPositions"].fromDates(float(latitude), longitude, timeZone, \
+        [m for h in range(len(hours)) for m in range(len(months))], [d] * (len(hours) * len(months)), \
+        [h for h in range(len(hours)) for m in range(len(months))], northRad)
     sunPsolarTimeL = []
     for h in range(len(hours)):
         subListPts = []
         for m in range(len(months)):
-            lb_sunpath.solInitOutput(m, d, h)
+            lb_sunpath.solInitFromTable(sunPositionTable, h * len(months) + m)
             sunPt = lb_sunpath.sunPosPt()[2]
             subListPts.append(sunPt)
         hourlyPtsSolarTime = [subListPts[0], (subListPts[1]+subListPts[11])/2, (subListPts[2]+subListPts[10])/2, (subListPts[3]+subListPts[9])/2, (subListPts[4]+subListPts[8])/2, (subListPts[5]+subListPts[7])/2, subListPts[6]]
@@ -1111,7 +1115,7 @@ def noaaSolarCalculator(latitude, longitude, timeZone, month, day, hour):
     return solarZenithD, solarAzimuthD, solarAltitudeD
 
 
-def beamShadingPerEachHour(testPt, srfNormal, srfTiltD, correctedSrfAzimuthD, SVF, contextMeshes, treesTransmissionIndices, leaflessStartHOY, leaflessEndHOY, albedoL, scale, latitude, longitude, timeZone, directNormalRadiationData, diffuseHorizontalRadiationData, yearsHOY, monthsHOY, daysHOY, hoursHOY):
+def beamShadingPerEachHour(testPt, srfNormal, srfTiltD, correctedSrfAzimuthD, SVF, contextMeshes, treesTransmissionIndices, leaflessStartHOY, leaflessEndHOY, albedoL, scale, latitude, longitude, timeZone, directNormalRadiationData, diffuseHorizontalRadiationData, sunPositionsPerHour):
     
     # lift the testPt so that it does not lie on the "contextMeshes[0]" and "outerBaseMesh", which would result in "intersectParam" returning: 0 value or very close to 0
     # testPt will always be lifted for the srfNormal identified at srfCentroid (if _analysisGeometry is a Brep), not at each srfCornerPtsLL (that is: testPt)
@@ -1121,7 +1125,7 @@ def beamShadingPerEachHour(testPt, srfNormal, srfTiltD, correctedSrfAzimuthD, SV
     
     beamIndexPerHourL = []
     for i in range(8760):
-        sunZenithD, sunAzimuthD, sunAltitudeD = noaaSolarCalculator(latitude, longitude, timeZone, monthsHOY[i], daysHOY[i], hoursHOY[i])
+        sunZenithD, sunAzimuthD, sunAltitudeD = sunPositionsPerHour[i]
         if sunZenithD <= 90:  # above the horizon
             sunAzimuthR = math.radians(sunAzimuthD)
             rotationAxis = Rhino.Geometry.Vector3d(0, 0, 1)
@@ -1157,7 +1161,7 @@ def beamShadingPerEachHour(testPt, srfNormal, srfTiltD, correctedSrfAzimuthD, SV
     # totalRadiationPerHour
     totalRadiationPerHourL = []
     for i in range(8760):
-        sunZenithD, sunAzimuthD, sunAltitudeD = noaaSolarCalculator(latitude, longitude, timeZone, monthsHOY[i], daysHOY[i], hoursHOY[i])
+        sunZenithD, sunAzimuthD, sunAltitudeD = sunPositionsPerHour[i]
         Epoa_shaded, Eb_shaded, Ed_sky, Eground, AOI_R = lb_photovoltaics.POAirradiance(sunZenithD, sunAzimuthD, srfTiltD, correctedSrfAzimuthD, directNormalRadiationData[i], diffuseHorizontalRadiationData[i], albedoL[i], beamIndexPerHourL[i], SVF)
         totalRadiationPerHourL.append(Epoa_shaded)
     
@@ -1202,9 +1206,11 @@ def swhshading(srfCornerPts, srfNormal, srfTiltD, correctedSrfAzimuthD, contextM
     skyExposureFactorL = []
     beamIndexPerHourLL = []
     totalRadiationPerHourLL = []
+    # sun positions are the same for all corner points
+    sunPositionsPerHour = [noaaSolarCalculator(latitude, longitude, timeZone, monthsHOY[i], daysHOY[i], hoursHOY[i]) for i in range(8760)]
     for srfCornerPt in srfCornerPts:
         skyExposureFactor = diffuseShading(srfCornerPt, srfNormal, contextMeshes, treesTransmissionIndices, leaflessStartHOY, leaflessEndHOY, scale, precision)
-        beamIndexPerHourL, totalRadiationPerHourL = beamShadingPerEachHour(srfCornerPt, srfNormal, srfTiltD, correctedSrfAzimuthD, skyExposureFactor, contextMeshes, treesTransmissionIndices, leaflessStartHOY, leaflessEndHOY, albedoL, scale, latitude, longitude, timeZone, directNormalRadiationData, diffuseHorizontalRadiationData, yearsHOY, monthsHOY, daysHOY, hoursHOY)
+        beamIndexPerHourL, totalRadiationPerHourL = beamShadingPerEachHour(srfCornerPt, srfNormal, srfTiltD, correctedSrfAzimuthD, skyExposureFactor, contextMeshes, treesTransmissionIndices, leaflessStartHOY, leaflessEndHOY, albedoL, scale, latitude, longitude, timeZone, directNormalRadiationData, diffuseHorizontalRadiationData, sunPositionsPerHour)
         skyExposureFactorL.append(skyExposureFactor)
         beamIndexPerHourLL.append(beamIndexPerHourL)
         totalRadiationPerHourLL.append(totalRadiationPerHourL)
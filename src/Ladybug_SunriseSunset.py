@@ -142,153 +142,6 @@ def JDtoTime(hour):
     time = str(hours) + ":" + str(minutes)
     return time
 
-def dateToDOY(month, day):
-    doy = math.floor((275 * month)/9) - math.floor((month + 9)/12) + day -30
-    
-    return doy
-
-def sunCalcPreparation(hour, day, month, year, timeZone):
-    # year input
-    if year == None:
-        year = 2016
-    else: year = year_
-    
-    # Julian day from calendar day
-    if (month <= 2):
-        year -= 1
-        month += 12
-    A = math.floor(year/100)
-    B = 2 - A + math.floor(A/4)
-    
-    JulianDay = (math.floor(365.25*(year + 4716)) + math.floor(30.6001*(month+1))\
-    + day + B - 1524.5) - timeZone / 24 + hour
-    
-    # calcTimeJulianCent	
-    julianCent = (JulianDay - 2451545.0)/36525.0
-    
-    # calculate the Geometric Mean Longitude of the Sun
-    L0 = 280.46646 + julianCent * (36000.76983 + 0.0003032 * julianCent)
-    while (L0 > 360.0):
-        L0 -= 360.0
-    while (L0 < 0.0):
-        L0 += 360.0
-    
-    # calculate the Geometric Mean Anomaly of the Sun
-    M = 357.52911 + julianCent * (35999.05029 - 0.0001537 * julianCent)
-    
-    # calculate the eccentricity of earth's orbit
-    e = 0.016708634 - julianCent * (0.000042037 + 0.0000001267 * julianCent)
-    
-    # calculate the equation of center for the sun
-    CentreSun = math.sin(math.radians(M)) * (1.914602 - julianCent\
-    * (0.004817 + 0.000014 * julianCent)) + math.sin(math.radians(2 * M))\
-    * (0.019993 - 0.000101 * julianCent) + math.sin(math.radians(3 * julianCent)) * 0.000289
-    
-    #Sun True Long (deg)
-    sunTrueLog = L0 + CentreSun
-    
-    #Sun True Anom (deg)
-    sunTrueAnom = M + CentreSun
-    
-    #Sun Rad Vector (AUs)
-    sunRadVector = (1.000001018 * (1 - e * e))/(1 + e * math.cos(math.radians(sunTrueAnom)))
-    
-    #Sun App Long (deg)
-    sunAppLog = sunTrueLog - 0.00569 - 0.00478 * math.sin(math.radians(125.04 - 1934.136 * julianCent))
-    
-    #Mean Obliq Ecliptic (deg)
-    meanObliqEcliptic = 23 + (26 + ((21.448 - julianCent\
-    * (46.815 + julianCent * (0.00059 - julianCent * 0.001813)))) / 60) / 60
-    
-    #Obliq Corr (deg)
-    obliqCorr = meanObliqEcliptic + 0.00256 * math.cos(math.radians(125.04 - 1934.136 * julianCent))
-    
-    #Sun Rt Ascen (deg)
-    data1 = math.cos(math.radians(sunAppLog))
-    data2 = math.cos(math.radians(obliqCorr))* math.sin(math.radians(sunAppLog))
-    
-    sunRtAscend = 90 - math.degrees(math.atan2(data1 , data2))
-    
-    #Sun Declin (deg)
-    sunDeclin = math.degrees(math.asin(math.sin(math.radians(obliqCorr)) * math.sin(math.radians(sunAppLog))))
-    
-    #var y
-    varY = math.tan(math.radians(obliqCorr / 2)) * math.tan(math.radians(obliqCorr / 2))
-    
-    #equation of time
-    eqOfTime = 4 * math.degrees(varY * math.sin(2 * math.radians(L0))\
-    - 2 * e * math.sin(math.radians(M)) + 4 * e * varY * math.sin(math.radians(M))\
-    * math.cos(2 * math.radians(L0)) - 0.5 * varY * varY * math.sin(4 * math.radians(L0))\
-    - 1.25 * e * e * math.sin(2 * math.radians(M)))
-    
-    #returns
-    return eqOfTime, sunDeclin
-
-def sunCalcTimeData(day, month, latitude, longitude, timeZone, eqOfTime, sunDeclin):
-    try:
-        #Solar Noon
-        solarNoon = (720 - 4 * longitude - eqOfTime + timeZone * 60) / 1440
-        solarNoonTime = JDtoTime(solarNoon)
-        
-        #HA Sunrise (deg)
-        haSunrise = math.degrees(math.acos(math.cos(math.radians(90.833))\
-        / (math.cos(math.radians(latitude)) * math.cos(math.radians(sunDeclin)))\
-        - math.tan(math.radians(latitude)) * math.tan(math.radians(sunDeclin))))
-        
-        #Solar Noon
-        solarNoon = (720 - 4 * longitude - eqOfTime + timeZone * 60) / 1440
-        solarNoonTime = JDtoTime(solarNoon)
-        
-        #Sunrise Time (LST)
-        sunriseTime = solarNoon - haSunrise * 4 / 1440
-        time1 = JDtoTime(sunriseTime)
-        if (sunriseTime*24 <= 0):
-            time1 = "up"
-        else:
-            time1 = time1
-        
-        #Sunset Time (LST)
-        sunsetTime = solarNoon + haSunrise * 4 / 1440
-        time2 = JDtoTime(sunsetTime)
-        if sunsetTime*24 >= 24:
-            time2 = "up"
-        else:
-            time2 = time2
-            
-        #Sunlight Duration (minutes)
-        sunLightDuration = int(round(haSunrise * 8,1))
-        
-        #solve the issue of extreme location
-    except:
-        solarNoonTime = solarNoonTime
-        if ((latitude > 66.4) and (dateToDOY(month, day) < 79 or dateToDOY(month, day) > 267)):
-            time1 = "down"
-            time2 = "down"
-            sunLightDuration = "0"
-            sunriseTime = 9999
-            sunsetTime = 9999
-        elif ((latitude > 66.4) and (dateToDOY(month, day) > 79 or dateToDOY(month, day) < 267)):
-            time1 = "up"
-            time2 = "up"
-            sunLightDuration = "1440"
-            sunriseTime = 99
-            sunsetTime = 99
-        elif ((latitude < -66.4) and (dateToDOY(month, day) < 83 or dateToDOY(month, day) > 263)):
-            time1 = "up"
-            time2 = "up"
-            sunLightDuration = "1440"
-            sunriseTime = 99
-            sunsetTime = 99
-        elif ((latitude < -66.4) and (dateToDOY(month, day) > 83 or dateToDOY(month, day) < 263)):
-            time1 = "down"
-            time2 = "down"
-            sunLightDuration = "0"
-            sunriseTime = 9999
-            sunsetTime = 9999
-    
-    #returns
-    return time1, time2, solarNoonTime, sunriseTime, sunsetTime, sunLightDuration
-
 def sunCalcSunData(hour, latitude, longitude, timeZone, eqOfTime, sunDeclin):
     #True Solar Time (min)
     trueSolarTime = (hour * 1440 + eqOfTime + 4 * longitude - 60 * timeZone) % 1440
@@ -336,12 +189,18 @@ def sunCalcSunData(hour, latitude, longitude, timeZone, eqOfTime, sunDeclin):
     return solarElevationCorrected, solarAzimut, vector
 
 def main():
-    if readLocation(_location)[0] == 90 or readLocation(_location)[0] == -90:
+    latitude, longitude, timeZone = readLocation(_location)
+    if latitude == 90 or latitude == -90:
         warning = "Latitude should be in range (-89.99 , 89.99)"
         w = gh.GH_RuntimeMessageLevel.Warning
         ghenv.Component.AddRuntimeMessage(w, warning)
         return -1
-        
+    
+    # year input
+    if year_ == None:
+        year = 2016
+    else: year = year_
+    
     # output lists
     officialSunriseSunset = []
     solarElevationCorrected = []
@@ -351,233 +210,77 @@ def main():
     solarAzimut = []
     date = []
     sunLightDuration = []
-    # function lists
-    sunRiseTime = []
-    sunSetTime = []
-    hourJd = []
-    sunset = []
-    sunrise = []
+    
+    # sunrise, sunset, solar noon and sunlight duration of every day of the year
+    sunEvents = lb_sunEvents.annual(latitude, longitude, timeZone, year)
     
     try:
-        # run sunCalc function
-        day = []
-        month = []
-        hour = []
+        HOYS = _HOYorAnalysisPeriod
+        dates = [lb_preparation.hour2Date(hoy, True) for hoy in HOYS]
+        isAnalysisPeriod = False
+    except:
+        HOYS, months, days = lb_preparation.getHOYsBasedOnPeriod(_HOYorAnalysisPeriod, 1)
+        dates = [lb_preparation.hour2Date(hoy, True) for hoy in HOYS]
+        isAnalysisPeriod = True
+    
+    # isSunUpshift_, thanks to Cheney for this input.
+    # http://www.grasshopper3d.com/forum/topics/ladybug-sunrise-sunset?groupUrl=ladybug&commentId=2985220%3AComment%3A1519545&xg_source=msg_com_gr_forum
+    if isSunUpshift_ == None:
+        hourShift = 0
+    else: hourShift = abs(isSunUpshift_)
+    
+    for hoy, (day, month, hour) in zip(HOYS, dates):
+        month += 1
+        date.append(lb_preparation.hour2Date(hoy))
         
-        for hoy in _HOYorAnalysisPeriod:
-            d, m, t = lb_preparation.hour2Date(hoy, True)
-            day.append(d)
-            month.append(m + 1)
-            hour.append(t)
-            date.append(lb_preparation.hour2Date(hoy))
-        # hourJd function
-        for item in hour:
-            hourJd.append(item / 24)
-            
-        for i in range(0, len(_HOYorAnalysisPeriod)):
-            eqOfTime = sunCalcPreparation(hourJd[i], day[i], month[i], year_, readLocation(_location)[2])[0]
-            sunDeclin = sunCalcPreparation(hourJd[i], day[i], month[i], year_, readLocation(_location)[2])[1]
-            #function for sun data
-            dataSun = sunCalcSunData(hourJd[i], readLocation(_location)[0], readLocation(_location)[1],\
-            readLocation(_location)[2], eqOfTime, sunDeclin)
-            # output Sun
-            solarElevationCorrected.append(dataSun[0])
-            solarAzimut.append(dataSun[1])
-            sunVector.append(dataSun[2])
-            
-            ##Sunlight Duration per day (minutes)
-            eqOfTimeDuration = sunCalcPreparation(1, day[i], month[i], year_, readLocation(_location)[2])[0]
-            sunDeclinDuration = sunCalcPreparation(1, day[i], month[i], year_, readLocation(_location)[2])[1]
-            #function for sun data
-            dataSunDuration = sunCalcTimeData(day[i], month[i], readLocation(_location)[0], readLocation(_location)[1],\
-            readLocation(_location)[2], eqOfTimeDuration, sunDeclinDuration)
-            sunLightDuration.append(dataSunDuration[5])
-            
-            # logical conditions for hoursJd
-            if ((readLocation(_location)[0] > 66.4) and (dateToDOY(month[i], day[i]) < 79 or dateToDOY(month[i], day[i]) > 267)):
-                sunRisehourJd = 0.5
-                sunSethourJd = 0.5
-            elif ((readLocation(_location)[0] > 66.4) and (dateToDOY(month[i], day[i]) > 79 or dateToDOY(month[i], day[i]) < 267)):
-                sunRisehourJd = 0
-                sunSethourJd = 1
-                
-            elif ((readLocation(_location)[0] < -66.4) and (dateToDOY(month[i], day[i]) < 83 or dateToDOY(month[i], day[i]) > 263)):
-                sunRisehourJd = 0
-                sunSethourJd = 1
-            elif ((readLocation(_location)[0] <- 66.4) and (dateToDOY(month[i], day[i]) > 83 or dateToDOY(month[i], day[i]) < 263)):
-                sunRisehourJd = 0.5
-                sunSethourJd = 0.5
-                
-            elif (readLocation(_location)[0] <= 66.4) or (readLocation(_location)[0] >= -66.4):
-                sunRisehourJd = 0
-                sunSethourJd = 1
-                
-            # Sunrise
-            eqOfTimeRise = sunCalcPreparation(sunRisehourJd, day[i], month[i], year_, readLocation(_location)[2])[0]
-            sunDeclinRise = sunCalcPreparation(sunRisehourJd, day[i], month[i], year_, readLocation(_location)[2])[1]
-            
-            dataSunRise = sunCalcTimeData(day[i], month[i], readLocation(_location)[0], readLocation(_location)[1],\
-            readLocation(_location)[2], eqOfTimeRise, sunDeclinRise)
-            sunRiseTime.append(dataSunRise[0])
-            sunrise.append(dataSunRise[3])
-            
-            
-            # Sunset
-            eqOfTimeSet = sunCalcPreparation(sunSethourJd, day[i], month[i], year_, readLocation(_location)[2])[0]
-            sunDeclinSet = sunCalcPreparation(sunSethourJd, day[i], month[i], year_, readLocation(_location)[2])[1]
-            
-            dataSunSet = sunCalcTimeData(day[i], month[i], readLocation(_location)[0], readLocation(_location)[1],\
-            readLocation(_location)[2], eqOfTimeSet, sunDeclinSet)
-            sunSetTime.append(dataSunSet[1])
-            sunset.append(dataSunSet[4])
-            
-            if sunRiseTime[i] == "down":
-                officialSunriseSunset.append(sunRiseTime[i] + " , " + "down")
-            else:
-                officialSunriseSunset.append(sunRiseTime[i] + " , " + sunSetTime[i])
-            
-            # solarNoon
-            solarNoon.append(dataSunSet[2])
+        eqOfTime, sunDeclin = lb_sunEvents.noaaParameters(hour / 24, day, month, year, timeZone)
+        #function for sun data
+        dataSun = sunCalcSunData(hour / 24, latitude, longitude, timeZone, eqOfTime, sunDeclin)
+        # output Sun
+        solarElevationCorrected.append(dataSun[0])
+        solarAzimut.append(dataSun[1])
+        sunVector.append(dataSun[2])
         
+        dayIndex = sunEvents.dayIndex(month, day)
+        ##Sunlight Duration per day (minutes)
+        if not isAnalysisPeriod:
+            sunLightDuration.append(sunEvents.dayLengths[dayIndex])
         
+        # Sunrise
+        sunRiseTime = sunEvents.sunriseStates[dayIndex]
+        if sunRiseTime == None:
+            sunrise = sunEvents.sunrises[dayIndex]
+            if sunrise*24 <= 0: sunRiseTime = "up"
+            else: sunRiseTime = JDtoTime(sunrise)
         
-        #generate isSunUp list
-        # isSunUpshift_, thanks to Cheney for this input.
-        # http://www.grasshopper3d.com/forum/topics/ladybug-sunrise-sunset?groupUrl=ladybug&commentId=2985220%3AComment%3A1519545&xg_source=msg_com_gr_forum
-        if isSunUpshift_ == None:
-            hourShift = 0
-        else: hourShift = abs(isSunUpshift_)
+        # Sunset
+        sunSetTime = sunEvents.sunsetStates[dayIndex]
+        if sunSetTime == None:
+            sunset = sunEvents.sunsets[dayIndex]
+            if sunset*24 >= 24: sunSetTime = "up"
+            else: sunSetTime = JDtoTime(sunset)
         
-        for i in range (0, len(hour)):
-            if sunrise[i] == 9999 or sunset[i] == 9999:
-                sunUp = 0
-                isSunUp.append(sunUp)
-            elif sunrise[i] == 99 or sunset[i] == 99:
-                if (24 - hourShift) >= hour[i] > hourShift:
-                    sunUp = 1
-                    isSunUp.append(sunUp)
-                else: isSunUp.append(0)
-            elif hour[i]-hourShift <= (24*sunrise[i]) or hour[i]+hourShift >= (24*sunset[i]):
-                sunUp = 0
-                isSunUp.append(sunUp)
-            else:
-                sunUp = 1
-                isSunUp.append(sunUp)
-         
-        if isSunUpAltitude_:
-            for i in range (0, len(isSunUp)):
-                v = solarElevationCorrected[i]
-                if isSunUpAltitude_.find('v') != (-1) and isSunUp[i] != 0:
-                    variable = re.compile('(v)')
-                    conditional_statement = variable.sub( str(v), isSunUpAltitude_)
-                    if (eval(conditional_statement)):
-                        isSunUp[i] = 1
-                    else: isSunUp[i] = 0
-         
-                
-    except:
-        HOYS, months, days = lb_preparation.getHOYsBasedOnPeriod(_HOYorAnalysisPeriod, 1)
-        day = []
-        month = []
-        hour = []
-        for hoy in HOYS:
-            d, m, t = lb_preparation.hour2Date(hoy, True)
-            day.append(d)
-            month.append(m+1)
-            hour.append(t)
-            date.append(lb_preparation.hour2Date(hoy))
-            
-        # hourJd function
-        for item in hour:
-            hourJd.append(item / 24)
+        if sunRiseTime == "down":
+            officialSunriseSunset.append(sunRiseTime + " , " + "down")
+        else:
+            officialSunriseSunset.append(sunRiseTime + " , " + sunSetTime)
         
-        for i in range(0, len(HOYS)):
-            eqOfTime = sunCalcPreparation(hourJd[i], day[i], month[i], year_, readLocation(_location)[2])[0]
-            sunDeclin = sunCalcPreparation(hourJd[i], day[i], month[i], year_, readLocation(_location)[2])[1]
-            #function for sun data
-            dataSun = sunCalcSunData(hourJd[i], readLocation(_location)[0], readLocation(_location)[1],\
-            readLocation(_location)[2], eqOfTime, sunDeclin)
-            # output Sun
-            solarElevationCorrected.append(dataSun[0])
-            solarAzimut.append(dataSun[1])
-            sunVector.append(dataSun[2])
-            
-            # logical conditions for hoursJd
-            if ((readLocation(_location)[0] > 66.4) and (dateToDOY(month[i], day[i]) < 79 or dateToDOY(month[i], day[i]) > 267)):
-                sunRisehourJd = 0.5
-                sunSethourJd = 0.5
-            elif ((readLocation(_location)[0] > 66.4) and (dateToDOY(month[i], day[i]) > 79 or dateToDOY(month[i], day[i]) < 267)):
-                sunRisehourJd = 0
-                sunSethourJd = 1
-                
-            elif ((readLocation(_location)[0] < -66.4) and (dateToDOY(month[i], day[i]) < 83 or dateToDOY(month[i], day[i]) > 263)):
-                sunRisehourJd = 0
-                sunSethourJd = 1
-            elif ((readLocation(_location)[0] <- 66.4) and (dateToDOY(month[i], day[i]) > 83 or dateToDOY(month[i], day[i]) < 263)):
-                sunRisehourJd = 0.5
-                sunSethourJd = 0.5
-                
-            elif (readLocation(_location)[0] <= 66.4) or (readLocation(_location)[0] >= -66.4):
-                sunRisehourJd = 0
-                sunSethourJd = 1
-                
-            # Sunrise
-            eqOfTimeRise = sunCalcPreparation(sunRisehourJd, day[i], month[i], year_, readLocation(_location)[2])[0]
-            sunDeclinRise = sunCalcPreparation(sunRisehourJd, day[i], month[i], year_, readLocation(_location)[2])[1]
-            
-            dataSunRise = sunCalcTimeData(day[i], month[i], readLocation(_location)[0], readLocation(_location)[1],\
-            readLocation(_location)[2], eqOfTimeRise, sunDeclinRise)
-            sunRiseTime.append(dataSunRise[0])
-            sunrise.append(dataSunRise[3])
-            
-            # Sunset
-            eqOfTimeSet = sunCalcPreparation(sunSethourJd, day[i], month[i], year_, readLocation(_location)[2])[0]
-            sunDeclinSet = sunCalcPreparation(sunSethourJd, day[i], month[i], year_, readLocation(_location)[2])[1]
-            
-            dataSunSet = sunCalcTimeData(day[i], month[i], readLocation(_location)[0], readLocation(_location)[1],\
-            readLocation(_location)[2], eqOfTimeSet, sunDeclinSet)
-            sunSetTime.append(dataSunSet[1])
-            sunset.append(dataSunSet[4])
-            
-            if sunRiseTime[i] == "down":
-                officialSunriseSunset.append(sunRiseTime[i] + " , " + "down")
-            else:
-                officialSunriseSunset.append(sunRiseTime[i] + " , " + sunSetTime[i])
-            
-            # solarNoon
-            solarNoon.append(dataSunSet[2])
-            
-        #generate isSunUp list
-        if isSunUpshift_ == None:
-            hourShift = 0
-        else: hourShift = abs(isSunUpshift_)
+        # solarNoon
+        solarNoon.append(JDtoTime(sunEvents.solarNoons[dayIndex]))
         
-        for i in range (0, len(hour)):
-            if sunrise[i] == 9999 or sunset[i] == 9999:
-                sunUp = 0
-                isSunUp.append(sunUp)
-            elif sunrise[i] == 99 or sunset[i] == 99:
-                if (24 - hourShift) >= hour[i] > hourShift:
-                    sunUp = 1
-                    isSunUp.append(sunUp)
-                else: isSunUp.append(0)
-            elif hour[i]-hourShift <= (24*sunrise[i]) or hour[i]+hourShift >= (24*sunset[i]):
-                sunUp = 0
-                isSunUp.append(sunUp)
-            else:
-                sunUp = 1
-                isSunUp.append(sunUp)
-                
-        if isSunUpAltitude_:
-            for i in range (0, len(isSunUp)):
-                v = solarElevationCorrected[i]
-                if isSunUpAltitude_.find('v') != (-1) and isSunUp[i] != 0:
-                    variable = re.compile('(v)')
-                    conditional_statement = variable.sub( str(v), isSunUpAltitude_)
-                    if (eval(conditional_statement)):
-                        isSunUp[i] = 1
-                    else: isSunUp[i] = 0
-                    
+        #generate isSunUp list
+        isSunUp.append(sunEvents.isSunUp(dayIndex, hour, hourShift))
+    
+    if isSunUpAltitude_:
+        for i in range (0, len(isSunUp)):
+            v = solarElevationCorrected[i]
+            if isSunUpAltitude_.find('v') != (-1) and isSunUp[i] != 0:
+                variable = re.compile('(v)')
+                conditional_statement = variable.sub( str(v), isSunUpAltitude_)
+                if (eval(conditional_statement)):
+                    isSunUp[i] = 1
+                else: isSunUp[i] = 0
+    
     return officialSunriseSunset, solarElevationCorrected, solarAzimut, solarNoon, isSunUp, sunVector, date, sunLightDuration
 #import the classes
 initCheck = False
@@ -594,6 +297,7 @@ if sc.sticky.has_key('ladybug_release'):
         w = gh.GH_RuntimeMessageLevel.Warning
         ghenv.Component.AddRuntimeMessage(w, warning)
     lb_preparation = sc.sticky["ladybug_Preparation"]()
+    lb_sunEvents = sc.sticky["ladybug_SunEvents"]
 else:
     initCheck = False
     print "You should first let the Ladybug fly..."
@@ -126,12 +126,12 @@ def main(location, directNormal, diffuseHorizontal, analysisPeriod, header, srfA
     stAnnualHour = lb_preparation.date2Hour(stMonth, stDay, stHour)
     endAnnualHour = lb_preparation.date2Hour(endMonth, endDay, endHour)
     HOYS = range(stAnnualHour,endAnnualHour+1)
-    for hour in HOYS:
-        d, m, t = lb_preparation.hour2Date(hour-1, True)
-        lb_sunpath.solInitOutput(m+1, d, t+0.5)
-        altitude = lb_sunpath.solAlt
+    # sun positions at the middle of each hour
+    days, months, hours = sc.sticky["ladybug_Calendar"].get().hoys2Dates([hour-1 for hour in HOYS])
+    sunPositionTable = sc.sticky["ladybug_SunPositions"].fromDates(float(lat), float(lngt), float(timeZone), [m+1 for m in months], days, [t+0.5 for t in hours])
+    for count, altitude in enumerate(sunPositionTable.altitudes):
         if altitude > 0:
-            sunVec = lb_sunpath.sunReverseVectorCalc()
+            sunVec = rc.Geometry.Vector3d(*sunPositionTable.vectors[count])
             sunVectors.append(sunVec)
         else: sunVectors.append(None)
     
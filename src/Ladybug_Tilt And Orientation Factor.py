@@ -276,6 +276,9 @@ def main(latitude, longitude, timeZone, locationName, years, months, days, hours
     meshPtStepU = 80/(len(srfAzimuthTOFList)-1)
     meshPtStepV = 45/(len(srfTiltTOFList)-1)
     
+    # sun positions are the same for every tilt and azimuth so calculate them once
+    sunZenithDs, sunAzimuthDs, sunAltitudeDs = lb_photovoltaics.sunPositions(latitude, longitude, timeZone, [years[hoy-1] for hoy in HOYs], [months[hoy-1] for hoy in HOYs], [days[hoy-1] for hoy in HOYs], [hours[hoy-1]-1 for hoy in HOYs])
+    
     meshPts = []
     meshLiftedPts = []
     totalRadiationPerYearL = []
@@ -283,7 +286,7 @@ def main(latitude, longitude, timeZone, locationName, years, months, days, hours
         for k,srfAzimuthTOF in enumerate(srfAzimuthTOFList):
             totalRadiationPerYear = 0
             for g,hoy in enumerate(HOYs):
-                sunZenithD, sunAzimuthD, sunAltitudeD = lb_photovoltaics.NRELsunPosition(latitude, longitude, timeZone, years[hoy-1], months[hoy-1], days[hoy-1], hours[hoy-1]-1)
+                sunZenithD, sunAzimuthD, sunAltitudeD = sunZenithDs[g], sunAzimuthDs[g], sunAltitudeDs[g]
                 Epoa, Eb, Ed_sky, Eground, AOI_R = lb_photovoltaics.POAirradiance(sunZenithD, sunAzimuthD, srfTiltTOF, srfAzimuthTOF, directNormalRadiation[hoy-1], diffuseHorizontalRadiation[hoy-1], albedoL[hoy-1])
                 totalRadiationPerYear += Epoa  # in Wh/m2
             totalRadiationPerYearL.append(totalRadiationPerYear)
@@ -412,8 +415,9 @@ def main(latitude, longitude, timeZone, locationName, years, months, days, hours
     
     # totalRadiationPerYear of the inputted (analysed) surface
     totalRadiationPerYear = 0
+    sunZenithDs, sunAzimuthDs, sunAltitudeDs = lb_photovoltaics.sunPositions(latitude, longitude, timeZone, years[:len(HOYs)], months[:len(HOYs)], days[:len(HOYs)], [hour-1 for hour in hours[:len(HOYs)]])
     for i,hoy in enumerate(HOYs):
-        sunZenithD, sunAzimuthD, sunAltitudeD = lb_photovoltaics.NRELsunPosition(latitude, longitude, timeZone, years[i], months[i], days[i], hours[i]-1)
+        sunZenithD, sunAzimuthD, sunAltitudeD = sunZenithDs[i], sunAzimuthDs[i], sunAltitudeDs[i]
         Epoa, Eb, Ed_sky, Eground, AOI_R = lb_photovoltaics.POAirradiance(sunZenithD, sunAzimuthD, srfTiltD, srfAzimuthD, directNormalRadiation[i], diffuseHorizontalRadiation[i], albedoL[i])
         totalRadiationPerYear += Epoa  # in Wh/m2
     
@@ -91,66 +91,35 @@ import math
 
 
 def checkConditionalStatement(annualHourlyData, conditionalStatement):
-        lb_preparation = sc.sticky["ladybug_Preparation"]()
-        indexList, listInfo = lb_preparation.separateList(annualHourlyData, lb_preparation.strToBeFound)
-        
-        letters = [chr(i) for i in xrange(ord('a'), ord('z')+1)]
-        # remove 'and' and 'or' from conditional statements
-        csCleaned = conditionalStatement.replace('and', '',20000)
-        csCleaned = csCleaned.replace('or', '',20000)
+        lb_conditionalStatement = sc.sticky["ladybug_ConditionalStatement"]
+        dataCollections = sc.sticky["ladybug_DataCollection"].fromHeaderLists(annualHourlyData)
+        listInfo = [data.header() for data in dataCollections]
         
-        # find the number of the lists that have assigned conditional statements
-        listNum = []
-        for count, let in enumerate(letters):
-            if csCleaned.find(let)!= -1: listNum.append(count)
-        
-        # check if all the conditions are actually applicable
-        for num in listNum:
-            if num>len(listInfo) - 1:
-                warning = 'A conditional statement is assigned for list number ' + `num + 1` + '  which is not existed!\n' + \
-                          'Please remove the letter "' + letters[num] + '" from the statements to solve this problem!\n' + \
-                          'Number of lists are ' + `len(listInfo)` + '. Please fix this issue and try again.'
-                          
-                print warning
-                ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, warning)
-                return -1, -1
+        # parse the statement once and check if all the conditions are actually applicable
+        try:
+            statement = lb_conditionalStatement(conditionalStatement)
+            statement.validate(len(listInfo))
+        except ValueError, e:
+            warning = 'There is an error in the conditional statement:\n' + str(e)
+            print warning
+            ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, warning)
+            return -1, -1
         
-        selList = [[]] * len(listInfo)
-        for i in range(len(listInfo)):
-            selList[i] = annualHourlyData[indexList[i]+7:indexList[i+1]]
-            if listInfo[i][4]!='Hourly' or listInfo[i][5]!=(1,1,1) or  listInfo[i][6]!=(12,31,24) or len(selList[i])!=8760:
+        for i, data in enumerate(dataCollections):
+            if data.frequency!='Hourly' or not data.isAnnual or len(data)!=8760:
                 warning = 'At least one of the input data lists is not a valis ladybug hourly data! Please fix this issue and try again!\n List number = '+ `i+1`
                 print warning
                 ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, warning)
                 return -1, -1
         
-        # replace the right list in the conditional statement
-        statement = conditionalStatement.split(' ')
-        finalStatement = 'pattern = '
+        # replace the letters with the name of the data in the title
         titleStatement = '...                         ...                         ...\n' +\
-                         'Conditional Selection Applied:\n'
-        
-        for statemntPart in statement:
-            statementCopy = str.Copy(statemntPart)
-            if statemntPart!='and' and statemntPart!='or':
-                for num in listNum:
-                    toBeReplacedWith = 'selList[this][HOY]'.replace('this', `num`)
-                    titleToBeReplacedWith = listInfo[num][2]
-                    statemntPart = statemntPart.replace(letters[num], toBeReplacedWith, 20000)
-                    statementCopy = statementCopy.replace(letters[num], titleToBeReplacedWith, 20000)
-                    if statementCopy.find(letters[num])!=-1: break
-                    
-                titleStatement = titleStatement + ' ' + statementCopy
-            else:
-                titleStatement = titleStatement + '\n' + statementCopy 
-            finalStatement = finalStatement + ' ' + statemntPart
+                         'Conditional Selection Applied:\n ' + \
+                         statement.toString([info[2] for info in listInfo], multiline = True)
         
-        # check for the pattern
-        patternList = []
+        # check for the pattern over all the hours at once
         try:
-            for HOY in range(8760):
-                exec(finalStatement)
-                patternList.append(pattern)
+            patternList = statement.evaluate(dataCollections)
         except Exception,e:
             warning = 'There is an error in the conditional statement:\n' + `e`
             print warning
@@ -56,7 +56,7 @@ from Grasshopper import DataTree
 from Grasshopper.Kernel.Data import GH_Path
 
 
-def getHourlySky(daylightMtxDict, HOY):
+def getHourlySky(skyMtx, HOY):
     # for presentation
     lb_preparation = sc.sticky["ladybug_Preparation"]()
     HOY.sort()
@@ -67,71 +67,20 @@ def getHourlySky(daylightMtxDict, HOY):
         endDate = lb_preparation.hour2Date(HOY[-1], 1)
         analysisP = ((stDate[1]+1, stDate[0], stDate[2]-1),(endDate[1]+1, endDate[0], endDate[2]-1))
     
-    hourlyMtx = []
-    for patchNumber in daylightMtxDict.keys():
-        cumulativeDifValue = 0
-        cumulativeDirValue = 0
-        # adding upp the values
-        try:
-            for hoy in HOY:
-                difValue, dirValue = daylightMtxDict[patchNumber][hoy]
-                cumulativeDifValue += difValue
-                cumulativeDirValue += dirValue 
-        except Exception, e:
-            warning = 'One of the HOYs is less than 1 or greater than 8760.'
-            print warning
-            ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, warning)
-        
-        hourlyMtx.append([cumulativeDifValue/1000, cumulativeDirValue/1000])
+    # adding up the values of all the hours in one pass for each patch
+    skyValues, invalidHOYs = skyMtx.cumulateHours(HOY)
+    if invalidHOYs:
+        warning = 'One of the HOYs is less than 1 or greater than 8760.'
+        print warning
+        ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, warning)
+    
+    hourlyMtx = [[difValue/1000, dirValue/1000] for difValue, dirValue in skyValues]
     
     return hourlyMtx, analysisP
 
-def getCumulativeSky(daylightMtxDict, runningPeriod):
-    
-    lb_preparation = sc.sticky["ladybug_Preparation"]()
-    
-    def selectHourlyData(dataList, analysisPeriod):
-        # read analysis period
-        stMonth, stDay, stHour, endMonth, endDay, endHour = lb_preparation.readRunPeriod(analysisPeriod, False)
-        
-        selHourlyData =[];
-        
-        # select data
-        stAnnualHour = lb_preparation.date2Hour(stMonth, stDay, stHour)
-        endAnnualHour = lb_preparation.date2Hour(endMonth, endDay, endHour)
-        
-        # check it goes from the end of the year to the start of the year
-        if stAnnualHour < endAnnualHour:
-            for i, item in enumerate(dataList[stAnnualHour-1:endAnnualHour+1]):
-                if stHour-1 <= (i + stHour - 1)%24 <= endHour-1: selHourlyData.append(item)
-            type = True
-        else:
-            for i, item in enumerate(dataList[stAnnualHour-1:]):
-                if stHour-1 <= (i + stHour - 1)%24 <= endHour-1: selHourlyData.append(item)
-            for i, item in enumerate(dataList[:endAnnualHour + 1]):
-                if stHour-1 <= i %24 <= endHour-1: selHourlyData.append(item)
-            type = False
-        
-        return selHourlyData
-    
-    HOYS = selectHourlyData(range(8760), runningPeriod)
-    
-    hourlyMtx = []
-    for patchNumber in daylightMtxDict.keys():
-        cumulativeDifValue = 0
-        cumulativeDirValue = 0
-        # adding upp the values
-        try:
-            for HOY in HOYS:
-                difValue, dirValue = daylightMtxDict[patchNumber][HOY + 1]
-                cumulativeDifValue += difValue
-                cumulativeDirValue += dirValue 
-        except Exception, e:
-            print `e`
-            
-        hourlyMtx.append([cumulativeDifValue/1000, cumulativeDirValue/1000])
-    
-    return hourlyMtx
+def getCumulativeSky(skyMtx, runningPeriod):
+    # the period is cumulated from the running totals of the sky matrix
+    return [[difValue/1000, dirValue/1000] for difValue, dirValue in skyMtx.cumulatePeriod(runningPeriod)]
 
 def prepareLBList(skyMtxLists, analysisPeriod, locName, unit, removeDiffuse, removeDirect):
     lb_preparation = sc.sticky["ladybug_Preparation"]()
@@ -186,10 +135,10 @@ def isLadybugFlying():
 
 skyMtxLists = []
 if _cumulativeSkyMtx and HOY_ and isLadybugFlying:
-    skyMtxLists, _analysisPeriod_ = getHourlySky(_cumulativeSkyMtx.d, HOY_)
+    skyMtxLists, _analysisPeriod_ = getHourlySky(_cumulativeSkyMtx, HOY_)
     unit = 'kWh/m2'
 elif _cumulativeSkyMtx and isLadybugFlying:
-    skyMtxLists = getCumulativeSky(_cumulativeSkyMtx.d, _analysisPeriod_)
+    skyMtxLists = getCumulativeSky(_cumulativeSkyMtx, _analysisPeriod_)
     unit = 'kWh/m2'
 
 selectedSkyMtx = []
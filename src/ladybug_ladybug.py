@@ -61,8 +61,16 @@ import os
 import System.Threading.Tasks as tasks
 import System
 import time
-from itertools import chain
+from itertools import chain, izip, islice, imap, repeat, compress
 import datetime
+import operator
+import array
+import struct
+import hashlib
+import re
+import collections
+import bisect
+import heapq
 
 try:
     System.Net.ServicePointManager.SecurityProtocol = System.Net.SecurityProtocolType.Tls12
@@ -469,72 +477,31 @@ class Preparation(object):
             if component!=None:
                 component.AddRuntimeMessage(w, "Day " + `day` + " is changed to 1.")
             day = 1
-        if month == 2 and day > 28:
+        numOfDays = Calendar.get().numOfDaysEachMonth[int(month)-1] if 1 <= month <= 12 else 31
+        if day > numOfDays:
             if component!=None:
-                msg = "Feb. has 28 days. The date is corrected by Ladybug."
+                if month == 2: msg = "Feb. has 28 days. The date is corrected by Ladybug."
+                else: msg = self.monthList[month-1] + " has " + `numOfDays` + " days. The date is corrected by Ladybug."
                 component.AddRuntimeMessage(w, msg)
-            day = 28
-            
-        elif (month == 4 or month == 6 or month == 9 or month == 11) and day > 30:
-            if component!=None:
-                msg = self.monthList[month-1] + " has 30 days. The date is corrected by Ladybug."
-                component.AddRuntimeMessage(w, msg)
-            day = 30
-            
-        elif day > 31:
-            if component!=None:
-                msg = self.monthList[month-1] + " has 31 days. The date is corrected by Ladybug."
-                component.AddRuntimeMessage(w, msg)
-            day = 31
+            day = numOfDays
         
         return day
     
     def hour2Date(self, hour, alternate = False):
-        numOfDays = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334, 365]
-        numOfHours = [24 * numOfDay for numOfDay in numOfDays]
-        #print hour/24
-        if hour%8760==0 and not alternate: return `31`+ ' ' + 'DEC' + ' 24:00'
-        elif hour%8760==0: return 31, 11, 24
-    
-        for h in range(len(numOfHours)-1):
-            if hour <= numOfHours[h+1]: month = self.monthList[h]; break
-        try: month
-        except: month = self.monthList[h] # for the last hour of the year
-    
-        if (hour)%24 == 0:
-            day = int((hour - numOfHours[h]) / 24)
-            time = `24` + ':00'
-            hour = 24
-        else:
-            day = int((hour - numOfHours[h]) / 24) + 1
-            minutes = `int(round((hour - math.floor(hour)) * 60))`
-            if len(minutes) == 1: minutes = '0' + minutes
-            time = `int(hour%24)` + ':' + minutes
-        if alternate:
-            time = hour%24
-            if time == 0: time = 24
-            month = self.monthList.index(month)
-            return day, month, time
-            
-        return (`day` + ' ' + month + ' ' + time)
+        return Calendar.get().hour2Date(hour, alternate)
     
     def tupleStr2Tuple(self, str):
         strSplit = str[1:-1].split(',')
         return (int(strSplit[0]), int(strSplit[1]), int(strSplit[2]))
     
     def date2Hour(self, month, day, hour):
-        # fix the end day
-        numOfDays = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
-        # dd = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-        JD = numOfDays[int(month)-1] + int(day)
-        return (JD - 1) * 24 + hour
+        return Calendar.get().date2Hour(month, day, hour)
     
     def getHour(self, JD, hour):
         return (JD - 1) * 24 + hour
     
     def getJD(self, month, day):
-        numOfDays = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
-        return numOfDays[int(month)-1] + int(day)
+        return Calendar.get().getJD(month, day)
         
     def getCenPt(self, cenPt):
         if cenPt is None:
@@ -546,42 +513,11 @@ class Preparation(object):
                 except: return rc.Geometry.Point3d.Origin
     
     def selectHourlyData(self, hourlyData, analysisPeriod):
-        # separate data
-        indexList, listInfo = self.separateList(hourlyData, self.strToBeFound)
-    
-        #separate lists of lists
-        separatedLists = []
-        for i in range(len(indexList)-1):
-            selList = []
-            [selList.append(float(x)) for x in hourlyData[indexList[i]+7:indexList[i+1]]]
-            separatedLists.append(selList)
-    
-        # read analysis period
-        stMonth, stDay, stHour, endMonth, endDay, endHour = self.readRunPeriod(analysisPeriod)
-        
-        selHourlyData =[];
-        
-        for l in range(len(separatedLists)):
-            [selHourlyData.append(item) for item in listInfo[l][:4]]
-            selHourlyData.append('Hourly')
-            selHourlyData.append((stMonth, stDay, stHour))
-            selHourlyData.append((endMonth, endDay, endHour))
-            # select data
-            stAnnualHour = self.date2Hour(stMonth, stDay, stHour)
-            endAnnualHour = self.date2Hour(endMonth, endDay, endHour)
-            
-            # check it goes from the end of the year to the start of the year
-            if stAnnualHour < endAnnualHour:
-                for i, item in enumerate(separatedLists[l][stAnnualHour-1:endAnnualHour]):
-                    if stHour-1 <= (i + stHour - 1)%24 <= endHour-1: selHourlyData.append(item)
-                type = True
-            else:
-                for i, item in enumerate(separatedLists[l][stAnnualHour-1:]):
-                    if stHour-1 <= (i + stHour - 1)%24 <= endHour-1: selHourlyData.append(item)
-                
-                for i, item in enumerate(separatedLists[l][:endAnnualHour]):
-                    if stHour-1 <= i %24 <= endHour-1: selHourlyData.append(item)
-                type = False
+        # separate data. each data is parsed once into a DataCollection
+        selHourlyData = []
+        for collection in DataCollection.fromHeaderLists(hourlyData):
+            if collection.timestep == 1: collection.frequency = 'Hourly'
+            selHourlyData.extend(collection.periodSlice(analysisPeriod).toHeaderList())
         
         return selHourlyData
     
@@ -595,6 +531,8 @@ class Preparation(object):
         if timeStep != 1: hours = rs.frange(hours[0], hours[-1] + 1 - 1/timeStep, 1/timeStep)
         
         HOYS = []
+        # a set to check for the duplicates instead of searching the list
+        addedHOYs = set()
         
         for monthCount, m in enumerate(months):
             # just a single day
@@ -623,7 +561,9 @@ class Preparation(object):
                     m  = self.checkMonth(int(m))
                     d = self.checkDay(int(d), m)
                     HOY = self.date2Hour(m, d, h)
-                    if HOY not in HOYS: HOYS.append(int(HOY))
+                    if HOY not in addedHOYs:
+                        HOYS.append(int(HOY))
+                        addedHOYs.add(int(HOY))
         
         return HOYS
     
@@ -955,47 +895,209 @@ class Preparation(object):
         
     
     strToBeFound = 'key:location/dataType/units/frequency/startsAt/endsAt'
-    
-    def epwDataReader(self, epw_file, location = 'Somewhere!'):
+
+    # (field index, data type, units) for all the numerical fields of an epw file
+    # field 5 is the data source and uncertainty flags and is not numerical
+    epwFields = [(0, 'Year', 'Year'), (1, 'Month', 'Month'), (2, 'Day', 'Day'),
+                 (3, 'Hour', 'Hour'), (4, 'Minute', 'Minute'),
+                 (6, 'Dry Bulb Temperature', 'C'), (7, 'Dew Point Temperature', 'C'),
+                 (8, 'Relative Humidity', '%'), (9, 'Barometric Pressure', 'Pa'),
+                 (10, 'Extraterrestrial Horizontal Radiation', 'Wh/m2'),
+                 (11, 'Extraterrestrial Direct Normal Radiation', 'Wh/m2'),
+                 (12, 'Horizontal Infrared Radiation Intensity', 'Wh/m2'),
+                 (13, 'Global Horizontal Radiation', 'Wh/m2'), (14, 'Direct Normal Radiation', 'Wh/m2'),
+                 (15, 'Diffuse Horizontal Radiation', 'Wh/m2'), (16, 'Global Horizontal Illuminance', 'lux'),
+                 (17, 'Direct Normal Illuminance', 'lux'), (18, 'Diffuse Horizontal Illuminance', 'lux'),
+                 (19, 'Zenith Luminance', 'Cd/m2'), (20, 'Wind Direction', 'degrees'),
+                 (21, 'Wind Speed', 'm/s'), (22, 'Total Cloud Cover', 'tenth'),
+                 (23, 'Opaque Cloud Cover', 'tenth'), (24, 'Visibility', 'km'),
+                 (25, 'Ceiling Height', 'm'), (26, 'Present Weather Observation', 'code'),
+                 (27, 'Present Weather Codes', 'code'), (28, 'Precipitable Water', 'mm'),
+                 (29, 'Aerosol Optical Depth', 'thousandths'), (30, 'Snow Depth', 'cm'),
+                 (31, 'Days Since Last Snowfall', 'days'), (32, 'Albedo', 'fraction'),
+                 (33, 'Liquid Precipitation Depth', 'mm'), (34, 'Liquid Precipitation Quantity', 'hr')]
+
+    # how the records of sub-hourly files are reduced to hourly values. wind direction is
+    # an angle and is taken at the end of the hour, precipitation is added up and the other
+    # fields are averaged
+    epwHourlyMethods = {20: 'last', 33: 'sum', 34: 'sum'}
+
+    def epwColumnReader(self, epw_file, fieldIds = None, useCache = True):
+        """Read the numerical fields of an epw file as array('d') columns.
+
+        Returns the 8 header lines and a dictionary of {field index: column}. The file
+        is parsed once per machine: parsed files are stored in the weather cache under
+        Ladybug's default folder and later calls only load the requested fields.
+        """
+        if fieldIds is not None:
+            numericalIds = [field[0] for field in self.epwFields]
+            invalidIds = [fieldId for fieldId in fieldIds if fieldId not in numericalIds]
+            if invalidIds:
+                raise KeyError('Fields %s are not numerical fields of epw files.' % invalidIds)
+
+        if useCache:
+            try:
+                weatherCache = WeatherCache()
+                cached = weatherCache.load(epw_file, fieldIds)
+                if cached: return cached
+            except (IOError, OSError, KeyError):
+                # cache folder is not available. just parse the file
+                weatherCache = None
+        else:
+            weatherCache = None
+
+        headerLines, columns = self.parseEpwColumns(epw_file)
+
+        if weatherCache:
+            try: weatherCache.store(epw_file, headerLines, columns)
+            except (IOError, OSError): pass
+
+        if fieldIds is not None:
+            columns = dict((fieldId, columns[fieldId]) for fieldId in fieldIds)
+
+        return headerLines, columns
+
+    def parseEpwColumns(self, epw_file):
+        """Parse all the numerical fields of an epw file in a single pass.
+
+        Each row is tokenized once and the values are stored in compact array('d')
+        columns. Values that can't be converted to a number (e.g. quoted weather codes)
+        are stored as NaN.
+        """
+        fieldIds = [field[0] for field in self.epwFields]
+        columns = dict((fieldId, array.array('d')) for fieldId in fieldIds)
+        appends = [columns[fieldId].append for fieldId in fieldIds]
+        getFields = operator.itemgetter(*fieldIds)
+        nan = float('nan')
+
+        def toFloat(value):
+            try: return float(value)
+            except ValueError: return nan
+
+        headerLines = []
+        with open(epw_file, "r") as epwfile:
+            for lnum in range(8):
+                headerLines.append(epwfile.readline())
+            for line in epwfile:
+                values = getFields(line.split(','))
+                try:
+                    values = map(float, values)
+                except ValueError:
+                    if not line.strip(): continue
+                    values = map(toFloat, values)
+                for append, value in izip(appends, values):
+                    append(value)
+
+        return headerLines, columns
+
+    def epwFieldInfo(self, fieldId):
+        """Return data type and units of a numerical epw field."""
+        for field in self.epwFields:
+            if field[0] == fieldId: return field[1:]
+        raise ValueError("%s is not a numerical epw field." % str(fieldId))
+
+    def epwTimestep(self, headerLines):
+        """Number of records per hour from the DATA PERIODS line of an epw header."""
+        for line in headerLines:
+            if line.upper().startswith('DATA PERIODS'):
+                try: return max(1, int(line.split(',')[2]))
+                except (IndexError, ValueError): break
+        return 1
+
+    def epwColumn2HeaderList(self, column, fieldId, location = 'Somewhere!'):
+        """Convert a column of epwColumnReader to Ladybug's list with header."""
+        dataType, units = self.epwFieldInfo(fieldId)
+
+        return [self.strToBeFound, location, dataType, units, 'Hourly', (1, 1, 1), (12, 31, 24)] + column.tolist()
+
+    def epwDataCollections(self, epw_file, location = 'Somewhere!', fieldIds = None):
+        """Read epw fields as DataCollections in the timestep of the file.
+
+        Sub-hourly and leap year files are returned as they are. Use resample or
+        toAnnualHourly of each collection to get to the 8760 hourly grid.
+        """
+        headerLines, columns = self.epwColumnReader(epw_file, fieldIds)
+        timestep = self.epwTimestep(headerLines)
+        if fieldIds is None: fieldIds = sorted(columns.keys())
+
+        collections = []
+        for fieldId in fieldIds:
+            dataType, units = self.epwFieldInfo(fieldId)
+            collections.append(DataCollection(columns[fieldId], location, dataType, units, timestep))
+        return collections
+
+    def epwHourlyReader(self, epw_file, fieldIds, method = 'mean', dropLeapDay = True):
+        """Stream an epw file of any timestep into hourly array('d') columns.
+
+        Records are reduced to hourly values while the file is read so memory for each
+        field doesn't grow with the timestep of the file.
+        Args:
+            method: mean, sum, min, max or last. Use a dictionary of {field index: method}
+                to use different methods for different fields (e.g. epwHourlyMethods).
+            dropLeapDay: Remove the 24 hours of Feb 29th from leap year files so the
+                results fit Ladybug's 8760 hourly lists.
+        Returns:
+            headerLines, timestep and a dictionary of {field index: hourly column}
+        """
+        fieldIds = list(fieldIds)
+        if isinstance(method, dict):
+            methods = [method.get(fieldId, 'mean') for fieldId in fieldIds]
+        else:
+            methods = [method] * len(fieldIds)
+        reducers = [DataCollection.reducers[m] for m in methods]
+        isMean = [m == 'mean' for m in methods]
+
+        columns = dict((fieldId, array.array('d')) for fieldId in fieldIds)
+        appends = [columns[fieldId].append for fieldId in fieldIds]
+        getFields = operator.itemgetter(*fieldIds)
+        if len(fieldIds) == 1: getFields = lambda values, get = getFields: (get(values),)
+        nan = float('nan')
+
+        def toFloat(value):
+            try: return float(value)
+            except ValueError: return nan
+
+        headerLines = []
+        with open(epw_file, "r") as epwfile:
+            for lnum in range(8):
+                headerLines.append(epwfile.readline())
+            timestep = self.epwTimestep(headerLines)
+
+            hourValues = None; count = 0
+            for line in epwfile:
+                values = getFields(line.split(','))
+                try:
+                    values = map(float, values)
+                except ValueError:
+                    if not line.strip(): continue
+                    values = map(toFloat, values)
+
+                if count == 0: hourValues = values
+                else: hourValues = [r(a, b) for r, a, b in izip(reducers, hourValues, values)]
+                count += 1
+
+                if count == timestep:
+                    for append, value, mean in izip(appends, hourValues, isMean):
+                        append(value / timestep if mean else value)
+                    count = 0
+
+        if dropLeapDay:
+            for fieldId in fieldIds:
+                if len(columns[fieldId]) == 8784: del columns[fieldId][1416:1440]
+
+        return headerLines, timestep, columns
+
+    def epwDataReader(self, epw_file, location = 'Somewhere!', extraFields = []):
         # weather data
-        modelYear = [self.strToBeFound, location, 'Year', 'Year', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        dbTemp = [self.strToBeFound, location, 'Dry Bulb Temperature', 'C', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        dewPoint = [self.strToBeFound, location, 'Dew Point Temperature', 'C', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        RH = [self.strToBeFound, location, 'Relative Humidity', '%', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        windSpeed = [self.strToBeFound, location, 'Wind Speed', 'm/s', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        windDir = [self.strToBeFound, location, 'Wind Direction', 'degrees', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        dirRad = [self.strToBeFound, location, 'Direct Normal Radiation', 'Wh/m2', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        difRad = [self.strToBeFound, location, 'Diffuse Horizontal Radiation', 'Wh/m2', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        glbRad = [self.strToBeFound, location, 'Global Horizontal Radiation', 'Wh/m2', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        infRad = [self.strToBeFound, location, 'Horizontal Infrared Radiation Intensity', 'Wh/m2', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        dirIll = [self.strToBeFound, location, 'Direct Normal Illuminance', 'lux', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        difIll = [self.strToBeFound, location, 'Diffuse Horizontal Illuminance', 'lux', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        glbIll = [self.strToBeFound, location, 'Global Horizontal Illuminance', 'lux', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        cloudCov = [self.strToBeFound, location, 'Total Cloud Cover', 'tenth', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        visibility = [self.strToBeFound, location, 'Visibility', 'km', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        barPress = [self.strToBeFound, location, 'Barometric Pressure', 'Pa', 'Hourly', (1, 1, 1), (12, 31, 24)];
-        epwfile = open(epw_file,"r")
-        lnum = 1 # line number
-        for line in epwfile:
-            if lnum > 8:
-                modelYear.append(float(line.split(',')[0]))
-                dbTemp.append(float(line.split(',')[6]))
-                dewPoint.append(float(line.split(',')[7]))
-                RH.append(float(line.split(',')[8]))
-                barPress.append(float(line.split(',')[9]))
-                windSpeed.append(float(line.split(',')[21]))
-                windDir.append(float(line.split(',')[20]))
-                dirRad.append(float(line.split(',')[14]))
-                difRad.append(float(line.split(',')[15]))
-                glbRad.append(float(line.split(',')[13]))
-                infRad.append(float(line.split(',')[12]))
-                dirIll.append(float(line.split(',')[17]))
-                difIll.append(float(line.split(',')[18]))
-                glbIll.append(float(line.split(',')[16]))
-                cloudCov.append(float(line.split(',')[22]))
-            lnum += 1
-        epwfile.close()
-        return dbTemp, dewPoint, RH, windSpeed, windDir, dirRad, difRad, glbRad, dirIll, difIll, glbIll, cloudCov, infRad, barPress, modelYear
+        # dbTemp, dewPoint, RH, windSpeed, windDir, dirRad, difRad, glbRad,
+        # dirIll, difIll, glbIll, cloudCov, infRad, barPress, modelYear
+        fieldIds = [6, 7, 8, 21, 20, 14, 15, 13, 17, 18, 16, 22, 12, 9, 0] + list(extraFields)
+
+        # sub-hourly and leap year files are brought to Ladybug's hourly grid while they are read
+        uniqueIds = sorted(set(fieldIds))
+        columns = self.epwHourlyReader(epw_file, uniqueIds, self.epwHourlyMethods)[2]
+
+        return tuple(self.epwColumn2HeaderList(columns[fieldId], fieldId, location) for fieldId in fieldIds)
     
     ##### Start of Gencumulative Sky
     def removeBlank(self, str):
@@ -1018,80 +1120,44 @@ class Preparation(object):
         if not os.path.isfile(copyFullpath): shutil.copyfile(inputFile, copyFullpath)
         return copyFullpath
         
-    def genCumSkyStr(self, runningPeriod, subWorkingDir, workingDir, newLocName, lat, lngt, timeZone):
-        # read running period
-        stMonth, stDay, stHour, endMonth, endDay, endHour = self.readRunPeriod(runningPeriod)
-        
-        # sun modes: +s1 is "smeared sun" approach, and +s2 use "binned sun" approach
-        # read this paper for more information:
-        # http://plea-arch.net/PLEA/ConferenceResources/PLEA2004/Proceedings/p1153final.pdf
-        sunModes = ['+s1']
-        batchStr = workingDir[0:2] + "\ncd " + subWorkingDir + "\n"
-        for sunMode in sunModes:
-            calFileName = subWorkingDir + "\\" + newLocName + '_' + sunMode[-1] + '.cal'
-            reportFileName = subWorkingDir + "\\" + newLocName + '_' + sunMode[-1] + '_report.txt' 
-            newLine = workingDir + "\GenCumulativeSky " + sunMode + \
-                " -a " + lat + \
-                " -o " + `-1 * float(lngt)` + \
-                " -m " + `-15* float(timeZone)` + \
-                " -p -E -time " + `stHour` + " " + `endHour` + \
-                " -date " + `stMonth` + " " + `stDay` + \
-                " " + `endMonth` + " " + `endDay` + \
-                " " + subWorkingDir + "\\" + newLocName + '.epw' + \
-                " 1> " + calFileName + \
-                " 2> " + reportFileName + "\n"
-            batchStr = batchStr + newLine
-        batchStr = batchStr + 'cd\\'
-        return batchStr
-    
-    def readCalFile(self, calFileName):
-        # this functions comes from trial and error
-        # Even though I figured out how to read it for GenCummulativeSky,
-        # I still don't underestand the structure of a cal file 100%
-        try:
-            calRes = open(calFileName, "r")
-            lines = calRes.readlines()
-            segNum = [30, 30, 24, 24, 18, 12, 6, 1]
-            strConv = [0.0435, 0.0416, 0.0474, 0.0407, 0.0429, 0.0445, 0.0455, 0.0344] #steradians conversion
-            result = []
-            for rowNum in range(7):
-                countLine = 0
-                for l in range(len(lines)):
-                    if lines[l][:4] == 'row'+`rowNum`:
-                        for ll in range(l+1,l+1+segNum[rowNum]):
-                            result.append (strConv[rowNum] * float(lines[ll][0:-2]))
-            for l in range(len(lines)):
-                if lines[l][:4] == 'row7':
-                    result.append(strConv[7] * float(lines[l][15:-5]))
-                calRes.close()
-            return result
-        except:
-            print "There is an error in the result file" #+ \
-                    #"\nCheck the report file at " + reportFileName + \
-                    #"\n\nEmail me at (sadeghipour@gmail.com) if you couldn't solve the problem."
-            return -1
+    def genCumulativeSky(self, epwFile, runningPeriod, skyDensity = 1):
+        """Cumulative sky of a run period calculated from the weather file.
+        
+        This replaces the older GenCumulativeSky workflow with no batch file, executable or
+        .cal file. Only the hours of the period are calculated with SkyMatrix.fromWeatherData
+        (Perez all-weather sky) and each patch is added up in one pass.
+        
+        Args:
+            epwFile: Path to the epw file.
+            runningPeriod: Analysis period ((stMonth, stDay, stHour), (endMonth, endDay, endHour)).
+            skyDensity: 1 for a Tregenza (145 patches) and 2 for a Reinhart (577 patches) sky.
+        Returns:
+            selectedSkyMtx: Total, diffuse and direct radiation (kWh/m2) of each patch with
+                Ladybug headers, the same as the output of the selectSkyMtx component.
+            sunUpHours: Number of hours of the period when the sun is up.
+        """
+        locName, lat, lngt, timeZone, elev, locationStr = self.epwLocation(epwFile)
+        # hourly values of the year for sub-hourly and leap year files
+        columns = self.epwHourlyReader(epwFile, [14, 15])[2]
+        
+        indices = Calendar.get().periodIndices(runningPeriod)
+        skyMatrix = SkyMatrix.fromWeatherData(float(lat), float(lngt), float(timeZone), columns[14], columns[15],
+                                              skyDensity, locName, [index + 1 for index in indices])
+        
+        sunUpMask = SunEvents.annual(float(lat), float(lngt), float(timeZone)).sunUpHours()
+        sunUpHours = sum(sunUpMask[index] for index in indices)
+        
+        stMonth, stDay, stHour, endMonth, endDay, endHour = self.readRunPeriod(runningPeriod, False)
+        selectedSkyMtx = []
+        for name, patchValues in (("Total", [imap(operator.add, diffuse, direct) for diffuse, direct in izip(skyMatrix.diffuse, skyMatrix.direct)]),
+                                  ("Diffuse", skyMatrix.diffuse), ("Direct", skyMatrix.direct)):
+            selectedSkyMtx.extend([self.strToBeFound, locName, "Sky Patches' " + name + " Radiation", 'kWh/m2', 'NA',
+                                   (stMonth, stDay, stHour), (endMonth, endDay, endHour)])
+            # the hours out of the period are zero
+            selectedSkyMtx.extend(sum(values) / 1000 for values in patchValues)
+        
+        return selectedSkyMtx, sunUpHours
     
-    def printReportFile(self, reportFileName):
-        try:
-            reportFile = open(reportFileName, "r")
-            SUH = []; lineCount = 0
-            for line in reportFile:
-                if lineCount == 0:
-                    print line[:-1] + "."
-                    for ch in line:
-                        try: num = int(ch); SUH.append(num)
-                        except: pass
-                    break
-            #sunUpHours = 0; numCount = 0
-            #for num in SUH:
-            #    sunUpHours = sunUpHours + num * (10 ** (len(SUH) - numCount -1))
-            #    numCount += 1
-            #reportFile.close()
-            #return sunUpHours 
-        except:
-            print "There is no report file!!"
-            return -1
-            
     #### End of Gencumulative Sky
     
     def generateSkyGeo(self, cenPt, skyType, scale):
@@ -1477,6 +1543,1751 @@ class Preparation(object):
     def fahrenheitToCelsius(self, F):
         return (5/9)*(F-32)
 
+class Calendar(object):
+    """
+    Precomputed calendar tables for converting dates to hours of the year and back.
+    
+    A table is made once for each timestep and leap year combination and is shared
+    by all the components (use Calendar.get). It holds the month, day and hour of every
+    timestep of the year so converting an hour of the year to a date, or finding the
+    timesteps of an analysis period, is a lookup instead of a calculation.
+    
+    Hours follow Ladybug's convention: hour 1 is the end of the first hour of Jan 1st
+    and hour 24 is the last hour of a day.
+    
+    Args:
+        timestep: Number of timesteps per hour.
+        isLeapYear: Set to True to include Feb 29th.
+    """
+    monthList = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+    tables = {}
+    
+    def __init__(self, timestep = 1, isLeapYear = False):
+        self.timestep = int(timestep)
+        self.isLeapYear = bool(isLeapYear)
+        self.numOfDaysEachMonth = [31, 29 if self.isLeapYear else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+        self.numOfDays = [0]
+        for days in self.numOfDaysEachMonth: self.numOfDays.append(self.numOfDays[-1] + days)
+        self.numOfHours = [24 * numOfDay for numOfDay in self.numOfDays]
+        # first day of each month without the end of the year, same as the old date2Hour
+        self.monthStartDays = self.numOfDays[:12]
+        self.daysInYear = self.numOfDays[-1]
+        self.hoursInYear = 24 * self.daysInYear
+        self.numOfSteps = self.hoursInYear * self.timestep
+        
+        # month (0-11) and day (1-31) of each day of the year (0-based)
+        self.monthOfDoy = array.array('b')
+        self.dayOfDoy = array.array('b')
+        for month, days in enumerate(self.numOfDaysEachMonth):
+            self.monthOfDoy.extend([month] * days)
+            self.dayOfDoy.extend(xrange(1, days + 1))
+        
+        # month (1-12), day, hour and hour of the year of each timestep
+        stepsPerDay = 24 * self.timestep
+        self.months = array.array('b')
+        self.days = array.array('b')
+        for month, day in izip(self.monthOfDoy, self.dayOfDoy):
+            self.months.extend([month + 1] * stepsPerDay)
+            self.days.extend([day] * stepsPerDay)
+        self.hours = array.array('d', [(step + 1) / float(self.timestep) for step in xrange(stepsPerDay)]) * self.daysInYear
+        self.hoys = array.array('d', [(step + 1) / float(self.timestep) for step in xrange(self.numOfSteps)])
+        # indices of the analysis periods that are already requested
+        self.periodCache = {}
+    
+    @classmethod
+    def get(cls, timestep = 1, isLeapYear = False):
+        """Shared calendar table for the timestep."""
+        key = (int(timestep), bool(isLeapYear))
+        try:
+            return cls.tables[key]
+        except KeyError:
+            cls.tables[key] = cls(*key)
+            return cls.tables[key]
+    
+    def daysInMonth(self, month):
+        return self.numOfDaysEachMonth[int(month) - 1]
+    
+    def checkDay(self, day, month):
+        """Limit the day to the number of days of the month."""
+        if day < 1: return 1
+        return min(day, self.daysInMonth(month))
+    
+    def getJD(self, month, day):
+        return self.monthStartDays[int(month) - 1] + int(day)
+    
+    def date2Hour(self, month, day, hour):
+        return (self.monthStartDays[int(month) - 1] + int(day) - 1) * 24 + hour
+    
+    def date2Index(self, month, day, hour):
+        """Index of the timestep that ends at this date and hour."""
+        return int(round(self.date2Hour(month, day, hour) * self.timestep)) - 1
+    
+    def hour2Date(self, hour, alternate = False):
+        """Convert an hour of the year to a date.
+        
+        Returns:
+            A string like '21 JUN 12:00' or (day, month (0-11), hour) if alternate is True.
+        """
+        if hour % self.hoursInYear == 0 and not alternate: return '31 DEC 24:00'
+        elif hour % self.hoursInYear == 0: return 31, 11, 24
+        
+        if hour <= 0: monthIndex = 0
+        elif hour > self.hoursInYear: monthIndex = 11
+        else: monthIndex = self.monthOfDoy[int(math.ceil(hour / 24.0)) - 1]
+        month = self.monthList[monthIndex]
+        
+        if hour % 24 == 0:
+            day = int((hour - self.numOfHours[monthIndex]) / 24)
+            time = '24:00'
+            hour = 24
+        else:
+            day = int((hour - self.numOfHours[monthIndex]) / 24) + 1
+            minutes = `int(round((hour - math.floor(hour)) * 60))`
+            if len(minutes) == 1: minutes = '0' + minutes
+            time = `int(hour % 24)` + ':' + minutes
+        if alternate:
+            time = hour % 24
+            if time == 0: time = 24
+            return day, monthIndex, time
+        
+        return `day` + ' ' + month + ' ' + time
+    
+    def hoys2Dates(self, HOYs):
+        """Convert hours of the year to dates, the same as hour2Date with alternate set to True.
+        
+        Returns:
+            Three lists for days, months (0-11) and hours.
+        """
+        days = []; months = []; hours = []
+        hoursInYear = self.hoursInYear
+        for HOY in HOYs:
+            if 0 < HOY < hoursInYear and HOY % 24 != 0:
+                doy = int(math.ceil(HOY / 24.0)) - 1
+                monthIndex = self.monthOfDoy[doy]
+                days.append(int((HOY - self.numOfHours[monthIndex]) / 24) + 1)
+                months.append(monthIndex)
+                hours.append(HOY % 24)
+            else:
+                day, monthIndex, hour = self.hour2Date(HOY, True)
+                days.append(day); months.append(monthIndex); hours.append(hour)
+        return days, months, hours
+    
+    maxCachedPeriods = 128
+    
+    def periodKey(self, analysisPeriod):
+        if not analysisPeriod or analysisPeriod[0] == None:
+            analysisPeriod = ((1, 1, 1), (12, 31, 24))
+        (stMonth, stDay, stHour), (endMonth, endDay, endHour) = analysisPeriod
+        return int(stMonth), int(stDay), int(stHour), int(endMonth), int(endDay), int(endHour)
+    
+    def periodIndices(self, analysisPeriod, sort = True):
+        """Indices of the timesteps of an analysis period.
+        
+        The period includes the hours between the start and end hour of each day from the
+        start date to the end date and can go from the end of the year to the start of the
+        year. Indices are built in a single pass over the period and cached so the same
+        period is only built once. The returned array is shared and shouldn't be changed.
+        
+        Args:
+            analysisPeriod: ((stMonth, stDay, stHour), (endMonth, endDay, endHour)).
+            sort: Set to False to get the indices of a period that goes over the end of the
+                year in the order of the period (December before January).
+        Returns:
+            An array('i') of timestep indices.
+        """
+        key = self.periodKey(analysisPeriod), bool(sort)
+        try:
+            return self.periodCache[key]
+        except KeyError:
+            if len(self.periodCache) >= self.maxCachedPeriods: self.periodCache.clear()
+            indices = self.periodCache[key] = self.buildPeriodIndices(*key)
+            return indices
+    
+    def buildPeriodIndices(self, period, sort):
+        stMonth, stDay, stHour, endMonth, endDay, endHour = period
+        stAnnualHour = self.date2Hour(stMonth, stDay, stHour)
+        endAnnualHour = self.date2Hour(endMonth, endDay, endHour)
+        
+        def hoursOfDay(first, last):
+            return [hour for hour in xrange(first, last) if stHour - 1 <= hour % 24 <= endHour - 1]
+        
+        if stAnnualHour < endAnnualHour:
+            hours = hoursOfDay(stAnnualHour - 1, endAnnualHour)
+        elif sort:
+            hours = hoursOfDay(0, endAnnualHour) + hoursOfDay(stAnnualHour - 1, self.hoursInYear)
+        else:
+            hours = hoursOfDay(stAnnualHour - 1, self.hoursInYear) + hoursOfDay(0, endAnnualHour)
+        
+        timestep = self.timestep
+        if timestep == 1: return array.array('i', hours)
+        indices = array.array('i')
+        for hour in hours: indices.extend(xrange(hour * timestep, (hour + 1) * timestep))
+        return indices
+    
+    def periodRuns(self, analysisPeriod):
+        """The timesteps of an analysis period as runs of consecutive timesteps.
+        
+        A period with all the hours of each day is a single run (or two if it goes over the
+        end of the year) and a period with a daily time window has one run per day. Sums over
+        a period can then be found from running totals in one step per run.
+        
+        Returns:
+            A list of (start, stop) index pairs. stop is not included in the run.
+        """
+        key = self.periodKey(analysisPeriod), 'runs'
+        try:
+            return self.periodCache[key]
+        except KeyError:
+            runs = []
+            indices = self.periodIndices(analysisPeriod)
+            if len(indices):
+                start = previous = indices[0]
+                for index in islice(indices, 1, None):
+                    if index != previous + 1:
+                        runs.append((start, previous + 1))
+                        start = index
+                    previous = index
+                runs.append((start, previous + 1))
+            if len(self.periodCache) >= self.maxCachedPeriods: self.periodCache.clear()
+            self.periodCache[key] = runs
+            return runs
+    
+    def periodPattern(self, analysisPeriod):
+        """A True/False value for each timestep of the year, True for the timesteps of the period."""
+        pattern = [False] * self.numOfSteps
+        for index in self.periodIndices(analysisPeriod): pattern[index] = True
+        return pattern
+    
+    def gather(self, analysisPeriod, dataLists, sort = False):
+        """Select the values of an analysis period from several annual data lists.
+        
+        The indices of the period are found once and applied to all the lists.
+        
+        Args:
+            analysisPeriod: ((stMonth, stDay, stHour), (endMonth, endDay, endHour)).
+            dataLists: Annual data lists (lists, arrays or DataCollections) without header.
+            sort: Set to True to get the values of a period that goes over the end of the
+                year in the order of the year (January before December).
+        Returns:
+            A list of the selected values for each data list.
+        """
+        indices = self.periodIndices(analysisPeriod, sort)
+        if not len(indices): return [[] for dataList in dataLists]
+        getter = operator.itemgetter(*indices)
+        selected = []
+        for dataList in dataLists:
+            if isinstance(dataList, DataCollection): dataList = dataList.values
+            values = getter(dataList)
+            selected.append(list(values) if len(indices) > 1 else [values])
+        return selected
+
+
+class FileCache(object):
+    """
+    Folder of binary entries that are addressed by a key and shared between processes.
+    
+    An entry is written to a temporary file first and renamed so a partial entry is never
+    visible. An entry that can't be read is removed so it will be calculated again. Least
+    recently used entries are removed once the folder grows beyond maxSize bytes.
+    Subclasses set the extension of their entries and write and read them with writeEntry
+    and readEntry.
+    """
+    extension = '.lbc'
+    
+    # content hash of the files that are already checked by (path, size, modification time)
+    fileHashes = {}
+    
+    def __init__(self, cacheFolder, maxSize):
+        if not os.path.isdir(cacheFolder): os.makedirs(cacheFolder)
+        self.cacheFolder = cacheFolder
+        self.maxSize = maxSize
+    
+    def fileHash(self, epw_file):
+        stat = os.stat(epw_file)
+        statKey = (os.path.abspath(epw_file), stat.st_size, stat.st_mtime)
+        if statKey not in self.fileHashes:
+            md5 = hashlib.md5()
+            with open(epw_file, "rb") as inf:
+                for chunk in iter(lambda: inf.read(1048576), ''):
+                    md5.update(chunk)
+            self.fileHashes[statKey] = md5.hexdigest()
+        return self.fileHashes[statKey]
+    
+    def entryPath(self, key):
+        return os.path.join(self.cacheFolder, key + self.extension)
+    
+    def readEntry(self, key, reader):
+        """Return reader(file) for the entry of the key or None if there is no valid entry.
+        
+        reader should raise ValueError, EOFError or struct.error for an entry that is not
+        valid. Other exceptions are raised and the entry is kept.
+        """
+        path = self.entryPath(key)
+        if not os.path.isfile(path): return None
+        
+        try:
+            with open(path, "rb") as inf:
+                result = reader(inf)
+        except (ValueError, EOFError, struct.error):
+            # partial or corrupted entry. remove it so it will be calculated again
+            try: os.remove(path)
+            except OSError: pass
+            return None
+        
+        # mark the entry as recently used
+        os.utime(path, None)
+        return result
+    
+    def writeEntry(self, key, writer):
+        """Write the entry of the key with writer(file) and evict the old entries if needed."""
+        path = self.entryPath(key)
+        
+        # write to a temporary file first so other processes never read a partial entry
+        tempPath = '%s.%d.tmp' % (path, os.getpid())
+        with open(tempPath, "wb") as outf:
+            writer(outf)
+        
+        try:
+            os.rename(tempPath, path)
+        except OSError:
+            # the same entry is already written by another process
+            os.remove(tempPath)
+        
+        self.evict(keep = path)
+    
+    def evict(self, keep = None):
+        """Remove the least recently used entries until the cache fits in maxSize."""
+        entries = []
+        for f in os.listdir(self.cacheFolder):
+            if not f.endswith(self.extension): continue
+            fullPath = os.path.join(self.cacheFolder, f)
+            entries.append((os.path.getmtime(fullPath), os.path.getsize(fullPath), fullPath))
+        
+        totalSize = sum(entry[1] for entry in entries)
+        for modifiedTime, size, fullPath in sorted(entries):
+            if totalSize <= self.maxSize: break
+            if fullPath == keep: continue
+            try:
+                os.remove(fullPath)
+                totalSize -= size
+            except OSError:
+                pass
+    
+    def clear(self):
+        for f in os.listdir(self.cacheFolder):
+            if f.endswith(self.extension): os.remove(os.path.join(self.cacheFolder, f))
+
+
+class WeatherCache(FileCache):
+    """
+    Persistent cache of parsed epw files under Ladybug's default folder.
+    
+    Entries are keyed by the md5 hash of the weather file content so a copied or renamed
+    file is still found while an edited file is always parsed again. Each entry is a flat
+    little-endian binary file that can be memory-mapped: a small header followed by one
+    contiguous float64 block per epw field, so a single field can be read without touching
+    the rest of the file.
+    """
+    magic = 'LBWC'
+    version = 1
+    extension = '.lbw'
+    # magic, version, number of rows, number of fields, length of epw header in bytes
+    headerFormat = '<4sIIII'
+    
+    def __init__(self, cacheFolder = None, maxSize = 256 * 1024 * 1024):
+        if cacheFolder is None:
+            cacheFolder = os.path.join(sc.sticky["Ladybug_DefaultFolder"], "weatherCache")
+        FileCache.__init__(self, cacheFolder, maxSize)
+    
+    def readHeader(self, inf):
+        """Read the header of a cache entry and return the information to locate the fields."""
+        magic, version, numOfRows, numOfFields, headerLength = \
+            struct.unpack(self.headerFormat, inf.read(struct.calcsize(self.headerFormat)))
+        if magic != self.magic or version != self.version:
+            raise ValueError("Not a valid Ladybug weather cache file.")
+        fieldIds = struct.unpack('<%dI' % numOfFields, inf.read(4 * numOfFields))
+        headerLines = inf.read(headerLength).decode('utf-8').splitlines(True)
+        dataOffset = inf.tell()
+        dataOffset += (-dataOffset) % 8
+        return numOfRows, fieldIds, headerLines, dataOffset
+    
+    def load(self, epw_file, fieldIds = None):
+        """Return (headerLines, {field index: array('d')}) or None if the file is not cached."""
+        def readColumns(inf):
+            numOfRows, storedIds, headerLines, dataOffset = self.readHeader(inf)
+            ids = storedIds if fieldIds is None else fieldIds
+            missingIds = [fieldId for fieldId in ids if fieldId not in storedIds]
+            if missingIds:
+                # a valid entry that doesn't have the fields. leave it in the cache
+                raise KeyError('Fields %s are not in the weather cache.' % missingIds)
+            columns = {}
+            for fieldId in ids:
+                inf.seek(dataOffset + 8 * numOfRows * storedIds.index(fieldId))
+                column = array.array('d')
+                column.fromfile(inf, numOfRows)
+                if sys.byteorder == 'big': column.byteswap()
+                columns[fieldId] = column
+            return headerLines, columns
+        
+        return self.readEntry(self.fileHash(epw_file), readColumns)
+    
+    def store(self, epw_file, headerLines, columns):
+        """Write parsed columns to the cache and evict the old entries if needed."""
+        fieldIds = sorted(columns.keys())
+        numOfRows = len(columns[fieldIds[0]])
+        headerText = ''.join(headerLines).encode('utf-8')
+        
+        def writeColumns(outf):
+            outf.write(struct.pack(self.headerFormat, self.magic, self.version,
+                                   numOfRows, len(fieldIds), len(headerText)))
+            outf.write(struct.pack('<%dI' % len(fieldIds), *fieldIds))
+            outf.write(headerText)
+            outf.write('\0' * ((-outf.tell()) % 8))
+            for fieldId in fieldIds:
+                column = columns[fieldId]
+                if sys.byteorder == 'big':
+                    column = array.array('d', column); column.byteswap()
+                column.tofile(outf)
+        
+        self.writeEntry(self.fileHash(epw_file), writeColumns)
+
+
+class WeatherArchive(object):
+    """
+    Memory-mapped archive of many weather files.
+    
+    The archive packs the hourly data of several stations into a single binary file with
+    the shape station x field x hour (little-endian float32) and a location table that
+    carries the epwLocation header fields of each station. Data is read straight from the
+    mapped file so one field can be sliced or reduced across all the stations without
+    loading the whole archive or creating lists for every station.
+    
+    Usage:
+        archive = WeatherArchive(archivePath)
+        archive.build(epwFiles)
+        dbTemp = archive.fieldView(6)
+        annualMean = archive.fieldStatistics(6, 'mean')
+    """
+    magic = 'LBWA'
+    version = 1
+    # magic, version, number of stations, number of fields, number of hours, location table length
+    headerFormat = '<4sIIIII'
+    
+    def __init__(self, archivePath):
+        self.archivePath = archivePath
+        self.dataMap = None
+        self.archiveFile = None
+    
+    def build(self, epwFiles, fieldIds = None):
+        """Pack epw files into the archive.
+        
+        Sub-hourly and leap year files are resampled to 8760 hourly values. Returns the
+        list of files that are skipped because they can't be read.
+        """
+        lb_preparation = Preparation()
+        if fieldIds is None: fieldIds = [field[0] for field in lb_preparation.epwFields]
+        fieldIds = list(fieldIds)
+        self.close()
+        
+        locations = []
+        skippedFiles = []
+        numOfHours = None
+        tempPath = '%s.%d.tmp' % (self.archivePath, os.getpid())
+        with open(tempPath, "wb") as outf:
+            # reserve the space for the header. the location table is written at the end
+            headerSize = struct.calcsize(self.headerFormat) + 4 * len(fieldIds)
+            outf.write('\0' * (headerSize + (-headerSize) % 8))
+            
+            for epwFile in epwFiles:
+                try:
+                    # stream the file into hourly values. this also skips the weather cache
+                    # so thousands of files won't flush the files that are in use
+                    columns = lb_preparation.epwHourlyReader(epwFile, fieldIds, lb_preparation.epwHourlyMethods)[2]
+                    location = lb_preparation.epwLocation(epwFile)[:5]
+                except Exception, e:
+                    skippedFiles.append(epwFile)
+                    continue
+                
+                if numOfHours is None: numOfHours = len(columns[fieldIds[0]])
+                if len(columns[fieldIds[0]]) != numOfHours:
+                    skippedFiles.append(epwFile)
+                    continue
+                
+                for fieldId in fieldIds:
+                    column = array.array('f', columns[fieldId])
+                    if sys.byteorder == 'big': column.byteswap()
+                    column.tofile(outf)
+                locations.append((epwFile,) + tuple(location))
+            
+            # location table
+            locationTable = '\n'.join('\t'.join(str(item) for item in location) for location in locations)
+            locationTable = locationTable.encode('utf-8')
+            outf.write(locationTable)
+            
+            outf.seek(0)
+            outf.write(struct.pack(self.headerFormat, self.magic, self.version, len(locations),
+                                   len(fieldIds), numOfHours or 0, len(locationTable)))
+            outf.write(struct.pack('<%dI' % len(fieldIds), *fieldIds))
+        
+        if os.path.isfile(self.archivePath): os.remove(self.archivePath)
+        os.rename(tempPath, self.archivePath)
+        return skippedFiles
+    
+    def open(self):
+        if self.dataMap is not None: return
+        self.archiveFile = open(self.archivePath, "rb")
+        header = self.archiveFile.read(struct.calcsize(self.headerFormat))
+        magic, version, self.numOfStations, numOfFields, self.numOfHours, tableLength = \
+            struct.unpack(self.headerFormat, header)
+        if magic != self.magic or version != self.version:
+            self.close()
+            raise ValueError("%s is not a valid Ladybug weather archive." % self.archivePath)
+        self.fieldIds = list(struct.unpack('<%dI' % numOfFields, self.archiveFile.read(4 * numOfFields)))
+        
+        headerSize = self.archiveFile.tell()
+        self.dataOffset = headerSize + (-headerSize) % 8
+        self.stationSize = 4 * numOfFields * self.numOfHours
+        
+        self.archiveFile.seek(self.dataOffset + self.numOfStations * self.stationSize)
+        self.locations = []
+        for line in self.archiveFile.read(tableLength).decode('utf-8').split('\n'):
+            if not line: continue
+            epwFile, locName, lat, lngt, timeZone, elev = line.split('\t')
+            self.locations.append((epwFile, locName, float(lat), float(lngt), float(timeZone), float(elev)))
+        
+        try:
+            import mmap
+            self.dataMap = mmap.mmap(self.archiveFile.fileno(), 0, access = mmap.ACCESS_READ)
+        except Exception:
+            # no memory mapping available. read blocks from the file instead
+            self.dataMap = False
+    
+    def close(self):
+        if self.dataMap: self.dataMap.close()
+        if self.archiveFile: self.archiveFile.close()
+        self.dataMap = None
+        self.archiveFile = None
+    
+    def readBlock(self, offset, count):
+        """Read count float32 values starting at offset as an array('f')."""
+        values = array.array('f')
+        if self.dataMap:
+            values.fromstring(self.dataMap[offset:offset + 4 * count])
+        else:
+            self.archiveFile.seek(offset)
+            values.fromfile(self.archiveFile, count)
+        if sys.byteorder == 'big': values.byteswap()
+        return values
+    
+    def blockOffset(self, station, fieldId, hour = 0):
+        return self.dataOffset + station * self.stationSize + \
+            4 * (self.fieldIds.index(fieldId) * self.numOfHours + hour)
+    
+    def stationData(self, station, fieldId, stHour = 0, endHour = None):
+        """Values of one field for one station between two 0-based hours as an array('f')."""
+        self.open()
+        if endHour is None: endHour = self.numOfHours
+        return self.readBlock(self.blockOffset(station, fieldId, stHour), endHour - stHour)
+    
+    def hourData(self, fieldId, hour):
+        """Values of one field at one hour for all the stations as an array('f')."""
+        self.open()
+        values = array.array('f')
+        for station in xrange(self.numOfStations):
+            offset = self.blockOffset(station, fieldId, hour)
+            if self.dataMap: values.append(struct.unpack_from('<f', self.dataMap, offset)[0])
+            else: values.extend(self.readBlock(offset, 1))
+        return values
+    
+    def fieldView(self, fieldId):
+        """A lazy view of one field across all the stations. Nothing is read until indexed."""
+        self.open()
+        return WeatherArchiveField(self, fieldId)
+    
+    def fieldStatistics(self, fieldId, method = 'mean', stHour = 0, endHour = None):
+        """Reduce one field across all the stations for each hour.
+        
+        method can be mean, sum, min or max. Only one station is in memory at a time.
+        """
+        self.open()
+        reducers = {'sum': operator.add, 'mean': operator.add, 'min': min, 'max': max}
+        if method not in reducers:
+            raise ValueError("method should be one of %s." % ', '.join(sorted(reducers)))
+        reducer = reducers[method]
+        
+        result = None
+        for station in xrange(self.numOfStations):
+            values = self.stationData(station, fieldId, stHour, endHour)
+            if result is None: result = array.array('d', values)
+            else: result = array.array('d', map(reducer, result, values))
+        
+        if result is None: return array.array('d')
+        if method == 'mean':
+            result = array.array('d', [value / self.numOfStations for value in result])
+        return result
+    
+    def stationStatistics(self, fieldId, stHour = 0, endHour = None):
+        """Mean, minimum and maximum of one field for each station."""
+        self.open()
+        statistics = []
+        for station in xrange(self.numOfStations):
+            values = self.stationData(station, fieldId, stHour, endHour)
+            statistics.append((sum(values) / len(values), min(values), max(values)))
+        return statistics
+
+
+class WeatherArchiveField(object):
+    """One field of a WeatherArchive across all the stations. Use WeatherArchive.fieldView."""
+    def __init__(self, archive, fieldId):
+        self.archive = archive
+        self.fieldId = fieldId
+    
+    def __len__(self):
+        return self.archive.numOfStations
+    
+    def __getitem__(self, station):
+        if station < 0: station += len(self)
+        if not 0 <= station < len(self): raise IndexError("station index out of range")
+        return self.archive.stationData(station, self.fieldId)
+    
+    def __iter__(self):
+        for station in xrange(len(self)):
+            yield self[station]
+    
+    def atHour(self, hour):
+        return self.archive.hourData(self.fieldId, hour)
+
+
+class HourlyResultStore(object):
+    """
+    Memory-mapped point x hour results of a study.
+    
+    Annual hourly results of dense grids don't fit in lists of floats. The store writes them
+    to a little-endian float32 file in tiles of tileHours hours. Each tile has the values of
+    all the points one point after the other, so a tile is written from a block of hours, an
+    hour is read from a single tile and a point is one short read in each tile. The reducers
+    go through the file one tile at a time.
+    
+    Usage:
+        store = HourlyResultStore(storePath)
+        store.create(len(testPts), HOYs)
+        for blockHOYs, blockValues in intersectionMtx.hourlyIrradiance(skyMatrix, HOYs):
+            store.writeHours(blockValues)
+        store.finish()
+        annualRadiation = store.pointStatistics('sum')
+        sunnyHours = store.thresholdHours(300)
+    """
+    magic = 'LBHR'
+    version = 1
+    # magic, version, number of points, number of hours, hours in each tile
+    headerFormat = '<4sIIII'
+    
+    def __init__(self, storePath):
+        self.storePath = storePath
+        self.dataMap = None
+        self.storeFile = None
+        self.outFile = None
+    
+    def create(self, numOfPoints, HOYs, tileHours = 24):
+        """Start writing a new store for a number of points and a list of hours of the year."""
+        self.close()
+        self.numOfPoints = numOfPoints
+        self.HOYs = list(HOYs)
+        self.numOfHours = len(self.HOYs)
+        self.tileHours = tileHours
+        
+        # write to a temporary file so the store is never read half written
+        self.tempPath = '%s.%d.tmp' % (self.storePath, os.getpid())
+        self.outFile = open(self.tempPath, "wb")
+        self.outFile.write(struct.pack(self.headerFormat, self.magic, self.version,
+                                       numOfPoints, self.numOfHours, tileHours))
+        self.outFile.write(struct.pack('<%df' % self.numOfHours, *self.HOYs))
+        self.outFile.write('\0' * ((-self.outFile.tell()) % 8))
+        self.pending = [[] for point in xrange(numOfPoints)]
+        self.pendingHours = 0
+        self.writtenHours = 0
+    
+    def writeHours(self, blockValues):
+        """Add the next hours to the store. blockValues has a list of hourly values for each point."""
+        if self.outFile is None: raise ValueError("Use create to start the store before writing to it.")
+        if len(blockValues) != self.numOfPoints:
+            raise ValueError("There are %d lists of values for %d points." % (len(blockValues), self.numOfPoints))
+        if not blockValues: return
+        for pending, values in izip(self.pending, blockValues): pending.extend(values)
+        self.pendingHours += len(blockValues[0])
+        while self.pendingHours >= self.tileHours: self.writeTile(self.tileHours)
+    
+    def writeTile(self, numOfHours):
+        tile = array.array('f')
+        for pending in self.pending:
+            tile.extend(pending[:numOfHours])
+            del pending[:numOfHours]
+        if sys.byteorder == 'big': tile.byteswap()
+        tile.tofile(self.outFile)
+        self.pendingHours -= numOfHours
+        self.writtenHours += numOfHours
+    
+    def finish(self):
+        """Write the last tile and move the store to its path."""
+        if self.pendingHours: self.writeTile(self.pendingHours)
+        self.outFile.close()
+        self.outFile = None
+        if self.writtenHours != self.numOfHours:
+            os.remove(self.tempPath)
+            raise ValueError("%d hours are written for a store of %d hours." % (self.writtenHours, self.numOfHours))
+        if os.path.isfile(self.storePath): os.remove(self.storePath)
+        os.rename(self.tempPath, self.storePath)
+    
+    def open(self):
+        if self.dataMap is not None: return
+        self.storeFile = open(self.storePath, "rb")
+        header = self.storeFile.read(struct.calcsize(self.headerFormat))
+        magic, version, self.numOfPoints, self.numOfHours, self.tileHours = struct.unpack(self.headerFormat, header)
+        if magic != self.magic or version != self.version:
+            self.close()
+            raise ValueError("%s is not a valid Ladybug result store." % self.storePath)
+        self.HOYs = list(struct.unpack('<%df' % self.numOfHours, self.storeFile.read(4 * self.numOfHours)))
+        self.hourIndices = dict((HOY, index) for index, HOY in enumerate(self.HOYs))
+        headerSize = self.storeFile.tell()
+        self.dataOffset = headerSize + (-headerSize) % 8
+        
+        try:
+            import mmap
+            self.dataMap = mmap.mmap(self.storeFile.fileno(), 0, access = mmap.ACCESS_READ)
+        except Exception:
+            # no memory mapping available. read blocks from the file instead
+            self.dataMap = False
+    
+    def close(self):
+        if self.dataMap: self.dataMap.close()
+        if self.storeFile: self.storeFile.close()
+        if self.outFile:
+            # the store isn't finished
+            self.outFile.close()
+            os.remove(self.tempPath)
+        self.dataMap = None
+        self.storeFile = None
+        self.outFile = None
+    
+    def readBlock(self, offset, count):
+        """Read count float32 values starting at offset as an array('f')."""
+        values = array.array('f')
+        if self.dataMap:
+            values.fromstring(self.dataMap[offset:offset + 4 * count])
+        else:
+            self.storeFile.seek(offset)
+            values.fromfile(self.storeFile, count)
+        if sys.byteorder == 'big': values.byteswap()
+        return values
+    
+    def tileRanges(self):
+        """(offset, first hour, number of hours) of each tile."""
+        for firstHour in xrange(0, self.numOfHours, self.tileHours):
+            yield self.dataOffset + 4 * self.numOfPoints * firstHour, firstHour, min(self.tileHours, self.numOfHours - firstHour)
+    
+    def tiles(self):
+        """The first hour, number of hours and values of each tile."""
+        self.open()
+        for offset, firstHour, numOfHours in self.tileRanges():
+            yield firstHour, numOfHours, self.readBlock(offset, self.numOfPoints * numOfHours)
+    
+    def pointData(self, point):
+        """Values of all the hours for one point as an array('f')."""
+        self.open()
+        if not 0 <= point < self.numOfPoints: raise IndexError("point index out of range")
+        values = array.array('f')
+        for offset, firstHour, numOfHours in self.tileRanges():
+            values.extend(self.readBlock(offset + 4 * point * numOfHours, numOfHours))
+        return values
+    
+    def hourData(self, HOY):
+        """Values of all the points for one hour of the year as an array('f')."""
+        self.open()
+        if HOY not in self.hourIndices: raise ValueError("Hour %s is not in the store." % HOY)
+        index = self.hourIndices[HOY]
+        firstHour = index - index % self.tileHours
+        numOfHours = min(self.tileHours, self.numOfHours - firstHour)
+        tile = self.readBlock(self.dataOffset + 4 * self.numOfPoints * firstHour, self.numOfPoints * numOfHours)
+        return tile[index - firstHour::numOfHours]
+    
+    def pointChunks(self, chunkSize = 1024):
+        """Yield the first point and a list of all the hourly values of each point for chunks of points."""
+        self.open()
+        for firstPoint in xrange(0, self.numOfPoints, chunkSize):
+            numOfPoints = min(chunkSize, self.numOfPoints - firstPoint)
+            chunk = [array.array('f') for point in xrange(numOfPoints)]
+            for offset, firstHour, numOfHours in self.tileRanges():
+                values = self.readBlock(offset + 4 * firstPoint * numOfHours, numOfPoints * numOfHours)
+                for point, pointValues in enumerate(chunk):
+                    pointValues.extend(values[point * numOfHours:(point + 1) * numOfHours])
+            yield firstPoint, chunk
+    
+    def pointStatistics(self, method = 'mean'):
+        """Reduce the hours of each point. method can be mean, sum, min or max."""
+        reducers = {'sum': sum, 'mean': sum, 'min': min, 'max': max}
+        combiners = {'sum': operator.add, 'mean': operator.add, 'min': min, 'max': max}
+        if method not in reducers:
+            raise ValueError("method should be one of %s." % ', '.join(sorted(reducers)))
+        reducer = reducers[method]; combiner = combiners[method]
+        
+        result = None
+        for firstHour, numOfHours, tile in self.tiles():
+            tileResult = [reducer(tile[point * numOfHours:(point + 1) * numOfHours]) for point in xrange(self.numOfPoints)]
+            result = tileResult if result is None else map(combiner, result, tileResult)
+        
+        if result is None: return array.array('d', [0] * self.numOfPoints)
+        if method == 'mean': result = [value / self.numOfHours for value in result]
+        return array.array('d', result)
+    
+    def hourStatistics(self, method = 'mean'):
+        """Reduce the points of each hour. method can be mean, sum, min or max."""
+        reducers = {'sum': sum, 'mean': sum, 'min': min, 'max': max}
+        if method not in reducers:
+            raise ValueError("method should be one of %s." % ', '.join(sorted(reducers)))
+        reducer = reducers[method]
+        
+        result = array.array('d')
+        if not self.numOfPoints: return result
+        for firstHour, numOfHours, tile in self.tiles():
+            result.extend(reducer(tile[hour::numOfHours]) for hour in xrange(numOfHours))
+        if method == 'mean': result = array.array('d', [value / self.numOfPoints for value in result])
+        return result
+    
+    def thresholdHours(self, threshold, above = True):
+        """Number of hours that each point is above (or below) a threshold."""
+        # the comparison of the threshold with each value runs in filter
+        compare = float(threshold).__lt__ if above else float(threshold).__gt__
+        result = array.array('l', [0] * self.numOfPoints)
+        for firstHour, numOfHours, tile in self.tiles():
+            for point in xrange(self.numOfPoints):
+                result[point] += len(filter(compare, tile[point * numOfHours:(point + 1) * numOfHours]))
+        return result
+    
+    def percentile(self, percent, chunkSize = 1024):
+        """Percentile (0-100) of the hourly values of each point with linear interpolation."""
+        if not 0 <= percent <= 100: raise ValueError("percent should be between 0 and 100.")
+        result = array.array('d')
+        rank = (self.numOfHours - 1) * percent / 100.0
+        lower = int(rank); fraction = rank - lower
+        for firstPoint, chunk in self.pointChunks(chunkSize):
+            for values in chunk:
+                if not values:
+                    result.append(0); continue
+                values = sorted(values)
+                if fraction: result.append(values[lower] + (values[lower + 1] - values[lower]) * fraction)
+                else: result.append(values[lower])
+        return result
+
+
+class DataCollection(object):
+    """
+    A data stream with its header and the values in a contiguous array('d').
+    
+    Unlike Ladybug's lists with header the collection knows its timestep so sub-hourly
+    and leap year data can be carried around and only brought to the 8760 hourly grid
+    when a component needs it. Collections are parsed once from Ladybug's lists with
+    header (fromHeaderLists) and converted back only at the component boundary
+    (toHeaderList). Slicing a continuous period returns a view that shares the values
+    with the original collection instead of copying them.
+    
+    Args:
+        values: List or array of the values.
+        location: Name of the location.
+        dataType: Type of the data (e.g. Dry Bulb Temperature).
+        units: Units of the data.
+        timestep: Number of values per hour.
+        isLeapYear: Set to True if the data includes Feb 29th. Default is to set it
+            based on the number of the values.
+        analysisPeriod: Start and end of the data as ((month, day, hour), (month, day, hour)).
+        frequency: Frequency label of the header. Default is set based on the timestep.
+    """
+    reducers = {'mean': operator.add, 'sum': operator.add, 'min': min, 'max': max, 'last': lambda a, b: b}
+    
+    def __init__(self, values, location = 'Somewhere!', dataType = 'Unknown Data', units = 'Unknown Units', timestep = 1, isLeapYear = None, analysisPeriod = None, frequency = None):
+        if isinstance(values, array.array) and values.typecode == 'd':
+            self.buffer = values
+        else:
+            self.buffer = array.array('d', values)
+        # a collection can be a view on part of another collection's buffer
+        self.bufferStart = 0
+        self.bufferEnd = len(self.buffer)
+        self.location = location
+        self.dataType = dataType
+        self.units = units
+        self.timestep = int(timestep)
+        if isLeapYear is None: isLeapYear = len(self.buffer) == 8784 * self.timestep
+        self.isLeapYear = isLeapYear
+        if not analysisPeriod: analysisPeriod = ((1, 1, 1), (12, 31, 24))
+        self.analysisPeriod = tuple(analysisPeriod)
+        if frequency is None:
+            frequency = 'Hourly' if self.timestep == 1 else 'Timestep %d' % self.timestep
+        self.frequency = frequency
+    
+    @staticmethod
+    def fromHeaderLists(inputList):
+        """Create collections from a list with one or more Ladybug headers.
+        
+        The input is scanned for the headers once and the values of each data are
+        converted to floats once. A list without any header is returned as a single
+        collection.
+        """
+        if not isinstance(inputList, list): inputList = list(inputList)
+        key = Preparation.strToBeFound
+        indexList = []
+        index = -1
+        while True:
+            try: index = inputList.index(key, index + 1)
+            except ValueError: break
+            indexList.append(index)
+        
+        if not indexList:
+            return [DataCollection(inputList, 'somewhere', 'someData', 'someUnits',
+                                   frequency = 'someTimeStep')]
+        
+        indexList.append(len(inputList))
+        collections = []
+        for st, end in izip(indexList[:-1], indexList[1:]):
+            location, dataType, units, frequency, stDate, endDate = inputList[st + 1:st + 7]
+            if frequency == 'Hourly':
+                timestep = 1
+            elif str(frequency).startswith('Timestep'):
+                timestep = int(frequency.split(' ')[-1])
+            else:
+                timestep = 1
+            collections.append(DataCollection(array.array('d', map(float, inputList[st + 7:end])),
+                                              location, dataType, units, timestep, None,
+                                              (stDate, endDate), frequency))
+        return collections
+    
+    def __len__(self):
+        return self.bufferEnd - self.bufferStart
+    
+    def __iter__(self):
+        return islice(self.buffer, self.bufferStart, self.bufferEnd)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.values[index]
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self): raise IndexError("DataCollection index out of range")
+        return self.buffer[self.bufferStart + index]
+    
+    @property
+    def values(self):
+        """Values as an array('d'). This is a copy only if the collection is a partial view."""
+        if self.bufferStart == 0 and self.bufferEnd == len(self.buffer): return self.buffer
+        return self.buffer[self.bufferStart:self.bufferEnd]
+    
+    @property
+    def isAnnual(self):
+        return self.analysisPeriod == ((1, 1, 1), (12, 31, 24))
+    
+    def header(self):
+        """Ladybug's 7 item header for this data."""
+        return [Preparation.strToBeFound, self.location, self.dataType, self.units,
+                self.frequency, self.analysisPeriod[0], self.analysisPeriod[1]]
+    
+    def toHeaderList(self):
+        """Ladybug's list with header that can be passed to the other components."""
+        return self.header() + self.values.tolist()
+    
+    def duplicate(self, values, timestep = None, isLeapYear = None, analysisPeriod = None):
+        if timestep is None: timestep = self.timestep
+        if isLeapYear is None: isLeapYear = self.isLeapYear
+        if analysisPeriod is None: analysisPeriod = self.analysisPeriod
+        frequency = self.frequency if timestep == self.timestep else None
+        return DataCollection(values, self.location, self.dataType, self.units, timestep,
+                              isLeapYear, analysisPeriod, frequency)
+    
+    def view(self, start, end, analysisPeriod = None):
+        """A collection that shares the values between start and end index with this one."""
+        start = max(0, min(start, len(self))); end = max(start, min(end, len(self)))
+        view = self.duplicate(self.buffer, analysisPeriod = analysisPeriod)
+        view.bufferStart = self.bufferStart + start
+        view.bufferEnd = self.bufferStart + end
+        return view
+    
+    def periodSlice(self, analysisPeriod):
+        """Select the data of an analysis period from annual data.
+        
+        Periods that cover whole days without wrapping around the end of the year are
+        returned as views on the same values. Other periods are gathered into a new array
+        using the indices of the period from the shared Calendar.
+        """
+        calendar = Calendar.get(self.timestep, self.isLeapYear)
+        period = calendar.periodKey(analysisPeriod)
+        stMonth, stDay, stHour, endMonth, endDay, endHour = period
+        period = ((stMonth, stDay, stHour), (endMonth, endDay, endHour))
+        stAnnualHour = calendar.date2Hour(stMonth, stDay, stHour)
+        endAnnualHour = calendar.date2Hour(endMonth, endDay, endHour)
+        timestep = self.timestep
+        
+        if stAnnualHour < endAnnualHour and stHour == 1 and endHour == 24:
+            return self.view((stAnnualHour - 1) * timestep, endAnnualHour * timestep, period)
+        
+        indices = calendar.periodIndices(period, sort = False)
+        if len(self) < calendar.numOfSteps:
+            indices = [index for index in indices if index < len(self)]
+        if not len(indices): return self.duplicate(array.array('d'), analysisPeriod = period)
+        
+        buffer = self.buffer if self.bufferStart == 0 else self.values
+        values = operator.itemgetter(*indices)(buffer)
+        if len(indices) == 1: values = [values]
+        return self.duplicate(array.array('d', values), analysisPeriod = period)
+    
+    def resample(self, method = 'mean'):
+        """Resample sub-hourly values to hourly values.
+        
+        Args:
+            method: mean, sum, min, max or last.
+        """
+        if method not in self.reducers:
+            raise ValueError("method should be one of %s." % ', '.join(sorted(self.reducers)))
+        
+        timestep = self.timestep
+        if timestep == 1: return self.duplicate(array.array('d', self.values))
+        
+        values = self.values
+        count = len(values) // timestep
+        if method in ('mean', 'sum'):
+            hourly = array.array('d', (sum(values[i * timestep:(i + 1) * timestep]) for i in xrange(count)))
+            if method == 'mean':
+                hourly = array.array('d', (value / timestep for value in hourly))
+        else:
+            reducer = self.reducers[method]
+            hourly = array.array('d', (reduce(reducer, values[i * timestep:(i + 1) * timestep]) for i in xrange(count)))
+        
+        return self.duplicate(hourly, timestep = 1)
+    
+    def dropLeapDay(self):
+        """Remove Feb 29th from leap year data."""
+        if not self.isLeapYear: return self
+        values = array.array('d', self.values)
+        del values[1416 * self.timestep:1440 * self.timestep]
+        return self.duplicate(values, isLeapYear = False)
+    
+    def toAnnualHourly(self, method = 'mean'):
+        """Resample to 8760 hourly values that Ladybug components expect."""
+        return self.resample(method).dropLeapDay()
+
+
+def nanDivide(x, y):
+    """Division of a conditional statement. Division by zero is NaN instead of an error."""
+    try: return x / float(y)
+    except ZeroDivisionError: return float('nan')
+
+
+def nanModulo(x, y):
+    """Modulo of a conditional statement. Modulo by zero is NaN instead of an error."""
+    try: return x % y
+    except ZeroDivisionError: return float('nan')
+
+
+class ConditionalStatement(object):
+    """
+    Conditional statements such as "a > 25 and b < 60" evaluated over whole data lists.
+    
+    The statement is parsed once into a small syntax tree and validated. It is then
+    evaluated column by column instead of running exec for each hour, and user text is
+    never executed. Letters a to z refer to the data lists in the order they are
+    connected. Supported syntax: numbers, True, False, + - * / %, comparisons (< <= > >=
+    == !=, including chained comparisons such as 20 < a < 30), not, and, or and brackets.
+    
+    Usage:
+        statement = ConditionalStatement("a > 25 and b < 60")
+        statement.validate(numOfLists = 2)
+        pattern = statement.evaluate([dryBulbTemperature, relativeHumidity])
+    """
+    letters = [chr(i) for i in xrange(ord('a'), ord('z') + 1)]
+    tokenPattern = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(<=|>=|==|!=|<>|[<>()+\-*/%]))")
+    comparisons = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+                   '==': operator.eq, '!=': operator.ne, '<>': operator.ne}
+    
+    def __init__(self, statement):
+        self.statement = str(statement).strip()
+        self.tokens = self.tokenize(self.statement)
+        self.position = 0
+        self.variables = set()
+        self.tree = self.parseOr()
+        if self.position != len(self.tokens):
+            raise ValueError("Unexpected '%s' in the conditional statement." % self.tokenText(self.tokens[self.position]))
+        self.variables = sorted(self.variables)
+    
+    # parsing
+    def tokenize(self, statement):
+        tokens = []
+        position = 0
+        statement = statement.rstrip()
+        while position < len(statement):
+            match = self.tokenPattern.match(statement, position)
+            if not match or match.end() == position:
+                raise ValueError("Invalid character '%s' in the conditional statement." % statement[position:].strip()[0])
+            number, name, symbol = match.groups()
+            if number is not None:
+                tokens.append(('num', float(number)))
+            elif name is not None:
+                lowerName = name.lower()
+                if lowerName in ('and', 'or', 'not'): tokens.append(('op', lowerName))
+                elif name in ('True', 'False'): tokens.append(('bool', name == 'True'))
+                elif lowerName in self.letters: tokens.append(('var', self.letters.index(lowerName)))
+                else: raise ValueError("'%s' is not valid in a conditional statement. Use the letters a to z for the data lists." % name)
+            else:
+                tokens.append(('op', symbol))
+            position = match.end()
+        if not tokens: raise ValueError("The conditional statement is empty.")
+        return tokens
+    
+    def peek(self):
+        if self.position < len(self.tokens): return self.tokens[self.position]
+        return (None, None)
+    
+    def take(self, value = None):
+        token = self.peek()
+        if token[0] is None:
+            raise ValueError("The conditional statement is not complete.")
+        if value is not None and token[1] != value:
+            raise ValueError("Expected '%s' but found '%s' in the conditional statement." % (value, self.tokenText(token)))
+        self.position += 1
+        return token
+    
+    def parseOr(self):
+        nodes = [self.parseAnd()]
+        while self.peek() == ('op', 'or'):
+            self.take(); nodes.append(self.parseAnd())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+    
+    def parseAnd(self):
+        nodes = [self.parseNot()]
+        while self.peek() == ('op', 'and'):
+            self.take(); nodes.append(self.parseNot())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+    
+    def parseNot(self):
+        if self.peek() == ('op', 'not'):
+            self.take()
+            return ('not', self.parseNot())
+        return self.parseComparison()
+    
+    def parseComparison(self):
+        first = self.parseSum()
+        comparisons = []
+        while self.peek()[0] == 'op' and self.peek()[1] in self.comparisons:
+            op = self.take()[1]
+            comparisons.append((op, self.parseSum()))
+        return first if not comparisons else ('cmp', first, comparisons)
+    
+    def parseSum(self):
+        node = self.parseProduct()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('+', '-'):
+            op = self.take()[1]
+            node = ('bin', op, node, self.parseProduct())
+        return node
+    
+    def parseProduct(self):
+        node = self.parseUnary()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('*', '/', '%'):
+            op = self.take()[1]
+            node = ('bin', op, node, self.parseUnary())
+        return node
+    
+    def parseUnary(self):
+        if self.peek() == ('op', '-'):
+            self.take()
+            return ('neg', self.parseUnary())
+        if self.peek() == ('op', '+'):
+            self.take()
+            return self.parseUnary()
+        return self.parseAtom()
+    
+    def parseAtom(self):
+        kind, value = self.take()
+        if kind == 'num' or kind == 'bool':
+            return ('const', value)
+        if kind == 'var':
+            self.variables.add(value)
+            return ('var', value)
+        if (kind, value) == ('op', '('):
+            node = self.parseOr()
+            self.take(')')
+            return node
+        raise ValueError("Unexpected '%s' in the conditional statement." % self.tokenText((kind, value)))
+    
+    def tokenText(self, token, names = None):
+        kind, value = token
+        if kind == 'var': return names[value] if names and value < len(names) else self.letters[value]
+        if kind == 'num': return ('%f' % value).rstrip('0').rstrip('.')
+        return str(value)
+    
+    # validation and evaluation
+    def validate(self, numOfLists):
+        """Make sure all the letters in the statement refer to a connected list."""
+        for num in self.variables:
+            if num > numOfLists - 1:
+                raise ValueError('A conditional statement is assigned for list number ' + `num + 1` + '  which is not existed!\n' + \
+                                 'Please remove the letter "' + self.letters[num] + '" from the statements to solve this problem!\n' + \
+                                 'Number of lists are ' + `numOfLists` + '. Please fix this issue and try again.')
+    
+    def evaluate(self, dataLists, length = None):
+        """Evaluate the statement for all the items of the data lists.
+        
+        Args:
+            dataLists: A list of equal length data lists (lists, arrays or DataCollections).
+                The first list is "a", the second one is "b" and so on.
+            length: Length of the result if the statement doesn't use any of the lists.
+        Returns:
+            A list of True/False values, one for each item of the data lists.
+        """
+        self.validate(len(dataLists))
+        columns = {}
+        for num in self.variables:
+            column = dataLists[num]
+            if isinstance(column, DataCollection): column = column.values
+            elif not isinstance(column, (list, array.array)): column = list(column)
+            columns[num] = column
+        
+        lengths = set(len(column) for column in columns.values())
+        if len(lengths) > 1:
+            raise ValueError("The data lists in the conditional statement don't have the same length.")
+        if lengths: length = lengths.pop()
+        elif length is None: length = len(dataLists[0]) if dataLists else 1
+        
+        result = self.evaluateNode(self.tree, columns)
+        if isinstance(result, list): return [bool(item) for item in result]
+        return [bool(result)] * length
+    
+    def apply(self, func, left, right):
+        leftIsList = isinstance(left, (list, array.array))
+        rightIsList = isinstance(right, (list, array.array))
+        if leftIsList and rightIsList: return list(imap(func, left, right))
+        if leftIsList: return list(imap(func, left, repeat(right)))
+        if rightIsList: return list(imap(func, repeat(left), right))
+        return func(left, right)
+    
+    def truth(self, value):
+        if isinstance(value, (list, array.array)): return map(bool, value)
+        return bool(value)
+    
+    def evaluateNode(self, node, columns):
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        if kind == 'var':
+            return columns[node[1]]
+        if kind == 'neg':
+            value = self.evaluateNode(node[1], columns)
+            if isinstance(value, (list, array.array)): return map(operator.neg, value)
+            return -value
+        if kind == 'not':
+            value = self.truth(self.evaluateNode(node[1], columns))
+            if isinstance(value, list): return map(operator.not_, value)
+            return not value
+        if kind in ('and', 'or'):
+            func = operator.and_ if kind == 'and' else operator.or_
+            result = self.truth(self.evaluateNode(node[1][0], columns))
+            for child in node[1][1:]:
+                result = self.apply(func, result, self.truth(self.evaluateNode(child, columns)))
+            return result
+        if kind == 'cmp':
+            left = self.evaluateNode(node[1], columns)
+            result = True
+            for op, rightNode in node[2]:
+                right = self.evaluateNode(rightNode, columns)
+                result = self.apply(operator.and_, result, self.apply(self.comparisons[op], left, right))
+                left = right
+            return result
+        if kind == 'bin':
+            left = self.evaluateNode(node[2], columns)
+            right = self.evaluateNode(node[3], columns)
+            return self.apply(self.binaryOperators[node[1]], left, right)
+        raise ValueError("Unknown node in the conditional statement.")
+    
+    binaryOperators = {'+': operator.add, '-': operator.sub, '*': operator.mul,
+                       '/': nanDivide, '%': nanModulo}
+    
+    def toString(self, names = None, multiline = False):
+        """The statement with the letters replaced by the names of the data lists."""
+        parts = []
+        for token in self.tokens:
+            if multiline and token[1] in ('and', 'or'): parts.append('\n' + token[1])
+            else: parts.append(self.tokenText(token, names))
+        return ' '.join(parts).replace(' \n', '\n').replace('( ', '(').replace(' )', ')')
+    
+    @classmethod
+    def filterDataLists(cls, conditionalStatement, annualHourlyDataLists, annualHourlyDataListsEpwNames, weatherPerHourDataSubLists, addZero):
+        """Filter the weather data of a component with its conditionalStatement_ and annualHourlyData_ inputs.
+        
+        Args:
+            conditionalStatement: The statement or None.
+            annualHourlyDataLists: The data lists of the letters in the statement.
+            annualHourlyDataListsEpwNames: Names of the data lists for the printed statement.
+            weatherPerHourDataSubLists: The lists that are filtered.
+            addZero: Set the values of the hours that don't meet the statement to 0 instead of
+                skipping them.
+        Returns:
+            validConditionalStatement: True if the data could be filtered.
+            weatherPerHourDataConditionalStatementSubLists: The filtered lists.
+            conditionalStatementForFinalPrint: The statement with the names of the data lists.
+            printMsg: "ok" or the warning for the component.
+        """
+        if conditionalStatement == None and len(annualHourlyDataLists) > 0: # conditionalStatement_ not inputted, annualHourlyData_ inputted
+            return False, None, None, "Please supply \"conditionalStatement_\" for inputted \"annualHourlyData_\" data."
+        elif conditionalStatement == None:  # conditionalStatement_ not inputted, annualHourlyData_ not inputted
+            conditionalStatement = "True"
+        elif annualHourlyDataLists == []:  # conditionalStatement_ inputted, annualHourlyData_ not
+            return False, None, None, "Please supply \"annualHourlyData_\" data for inputted \"conditionalStatement_\"."
+        
+        try:
+            statement = cls(conditionalStatement)
+        except ValueError, e:
+            return False, None, None, "Your \"conditionalStatement_\" is incorrect (%s). Please provide a valid conditional statement, such as \"a>25 and b<80\" (without the quotation marks)" % e
+        
+        # finalPrint conditonal statements for "printOutput" function
+        if conditionalStatement != "True":
+            conditionalStatementForFinalPrint = statement.toString(annualHourlyDataListsEpwNames)
+        else:
+            conditionalStatementForFinalPrint = "No condition"
+        
+        if len(statement.variables) > 0 and statement.variables[-1] >= len(annualHourlyDataLists):
+            return False, None, None, "The number of a,b,c... variables you supplied in \"conditionalStatement_\" is larger than the number of \"annualHourlyData_\" lists you inputted. Please make the numbers of these two equal or less."
+        
+        try:
+            length = len(weatherPerHourDataSubLists[0])
+            pattern = statement.evaluate(annualHourlyDataLists, length)[:length]
+            if len(pattern) != length:
+                raise ValueError("annualHourlyData_ and weather data don't have the same length.")
+            if addZero == True:  # add 0 if conditionalStatement == False
+                weatherPerHourDataConditionalStatementSubLists = [[value if selected else 0 for value, selected in izip(dataList, pattern)] for dataList in weatherPerHourDataSubLists]
+            else:  # skip the value
+                weatherPerHourDataConditionalStatementSubLists = [list(compress(dataList, pattern)) for dataList in weatherPerHourDataSubLists]
+        except Exception, e:
+            return False, None, None, "Your \"conditionalStatement_\" is incorrect. Please provide a valid conditional statement in Python, such as \"a>25 and b<80\" (without the quotation marks)"
+        
+        if len(weatherPerHourDataConditionalStatementSubLists[0]) == 0:
+            return False, None, None, "No \"annualHourlyData_\" coresponds to \"conditionalStatement_\". Please edit your \"conditionalStatement_\""
+        return True, weatherPerHourDataConditionalStatementSubLists, conditionalStatementForFinalPrint, "ok"
+
+
+class SunPositions(object):
+    """
+    Sun positions for many hours of the year calculated in one pass.
+    
+    It uses the same NOAA formulas as Sunpath.solInitOutput, in the same order, so the
+    results are identical to calling solInitOutput for each hour. It doesn't need Rhino
+    and doesn't change the state of a Sunpath so the tables can be shared between
+    components.
+    
+    Args:
+        latitude: Latitude of the location in degrees.
+        longitude: Longitude of the location in degrees.
+        timeZone: Time zone of the location.
+        months: List of months (1-12).
+        days: List of days.
+        hours: List of hours (0-24).
+        northAngle: Angle to north in radians. It is only used for the sun vectors.
+        solarTime: Set to True if the hours are in solar time.
+    
+    Attributes:
+        altitudes, azimuths, declinations: array('d') in radians.
+        equationOfTime: array('d') in minutes.
+        solarTimes: array('d') in hours.
+        vectors: List of (x, y, z) unit vectors pointing from the center to the sun (the same
+            as Sunpath.sunReverseVectorCalc). The vectors of Sunpath.sunPosPt are reversed.
+    """
+    year = 2018
+    
+    def __init__(self, latitude, longitude, timeZone, months, days, hours, northAngle = 0, solarTime = False):
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.timeZone = timeZone
+        self.northAngle = northAngle
+        self.solarTime = solarTime
+        self.months = array.array('d', months)
+        self.days = array.array('d', days)
+        self.hours = array.array('d', hours)
+        self.calculate()
+    
+    # process-wide cache of the calculated tables, least recently used tables are removed first
+    tableCache = collections.OrderedDict()
+    maxCachedTables = 24
+    cacheStats = {'hits': 0, 'misses': 0}
+    
+    @classmethod
+    def cached(cls, key, builder):
+        """Return the table of the key from the cache or build and cache it."""
+        try:
+            table = cls.tableCache.pop(key)
+            cls.cacheStats['hits'] += 1
+        except KeyError:
+            table = builder()
+            cls.cacheStats['misses'] += 1
+            while len(cls.tableCache) >= cls.maxCachedTables:
+                cls.tableCache.popitem(last = False)
+        cls.tableCache[key] = table
+        return table
+    
+    @classmethod
+    def cacheInfo(cls):
+        """Hits, misses and size of the cache of sun position tables."""
+        return {'hits': cls.cacheStats['hits'], 'misses': cls.cacheStats['misses'],
+                'size': len(cls.tableCache), 'maxSize': cls.maxCachedTables}
+    
+    @classmethod
+    def clearCache(cls):
+        cls.tableCache.clear()
+        cls.cacheStats['hits'] = cls.cacheStats['misses'] = 0
+    
+    @staticmethod
+    def siteKey(latitude, longitude, timeZone, northAngle, solarTime):
+        return (round(float(latitude), 6), round(float(longitude), 6), round(float(timeZone), 6),
+                round(float(northAngle), 9), bool(solarTime))
+    
+    @classmethod
+    def annual(cls, latitude, longitude, timeZone, northAngle = 0, timestep = 1, solarTime = False):
+        """Sun positions for every timestep of the year, shared through the cache.
+        
+        Index i of the table is the sun position at HOY (i + 1) / timestep.
+        """
+        timestep = int(timestep)
+        key = ('annual', timestep) + cls.siteKey(latitude, longitude, timeZone, northAngle, solarTime)
+        def builder():
+            calendar = Calendar.get(timestep)
+            days, months, hours = calendar.hoys2Dates(calendar.hoys)
+            return cls(latitude, longitude, timeZone, [month + 1 for month in months], days, hours, northAngle, solarTime)
+        return cls.cached(key, builder)
+    
+    @classmethod
+    def fromDates(cls, latitude, longitude, timeZone, months, days, hours, northAngle = 0, solarTime = False):
+        """Sun positions for lists of months, days and hours, shared through the cache."""
+        key = ('dates', tuple(months), tuple(days), tuple(hours)) + cls.siteKey(latitude, longitude, timeZone, northAngle, solarTime)
+        return cls.cached(key, lambda: cls(latitude, longitude, timeZone, months, days, hours, northAngle, solarTime))
+    
+    @classmethod
+    def fromHOYs(cls, latitude, longitude, timeZone, HOYs, northAngle = 0, solarTime = False, timestep = 1):
+        """Sun positions for hours of the year. Dates are found the same way as Preparation.hour2Date.
+        
+        If all the hours are on the timesteps of the year and the annual table is already
+        cached, or the hours are a large part of the year, the positions are taken from the
+        cached annual table. Otherwise they are calculated for the hours.
+        """
+        timestep = int(timestep)
+        numOfSteps = Calendar.get(timestep).numOfSteps
+        annualKey = ('annual', timestep) + cls.siteKey(latitude, longitude, timeZone, northAngle, solarTime)
+        if annualKey in cls.tableCache or 8 * len(HOYs) >= numOfSteps:
+            indices = []
+            for HOY in HOYs:
+                step = HOY * timestep
+                if not 0 <= step <= numOfSteps or abs(step - round(step)) > 1e-9: break
+                # HOY 0 is the same as the last hour of the year
+                indices.append(int(round(step)) - 1 if HOY else numOfSteps - 1)
+            else:
+                return cls.annual(latitude, longitude, timeZone, northAngle, timestep, solarTime).select(indices)
+        
+        days, months, hours = Calendar.get().hoys2Dates(HOYs)
+        return cls(latitude, longitude, timeZone, [month + 1 for month in months], days, hours, northAngle, solarTime)
+    
+    def select(self, indices):
+        """A new table with the positions of the indices."""
+        table = SunPositions.__new__(SunPositions)
+        table.__dict__.update(self.__dict__)
+        for name in ('months', 'days', 'hours', 'altitudes', 'azimuths', 'declinations', 'equationOfTime', 'solarTimes'):
+            values = getattr(self, name)
+            setattr(table, name, array.array('d', [values[index] for index in indices]))
+        table.vectors = [self.vectors[index] for index in indices]
+        return table
+    
+    def __len__(self):
+        return len(self.altitudes)
+    
+    def calculate(self):
+        sin = math.sin; cos = math.cos; radians = math.radians; degrees = math.degrees
+        floor = math.floor; acos = math.acos; asin = math.asin; tan = math.tan
+        pi = math.pi
+        solLat = math.radians(self.latitude)
+        sLongtitude = math.radians(self.longitude)
+        timeZone = self.timeZone
+        solarTime = self.solarTime
+        year = self.year
+        sinLat = sin(solLat); cosLat = cos(solLat)
+        
+        altitudes = array.array('d'); azimuths = array.array('d')
+        declinations = array.array('d'); equationOfTime = array.array('d')
+        solarTimes = array.array('d')
+        
+        for month, day, time in izip(self.months, self.days, self.hours):
+            a = 1 if (month < 3) else 0
+            y = year + 4800 - a
+            m = month + 12*a - 3
+            julianDay = day + floor((153*m + 2)/5.0) + 59
+            julianDay += (time - timeZone)/24.0  + 365*y + floor(y/4.0) \
+                - floor(y/100.0) + floor(y/400.0) - 32045.5 - 59
+            
+            julianCentury = (julianDay - 2451545) / 36525.0
+            geomMeanLongSun = (280.46646 + julianCentury * (36000.76983 + julianCentury*0.0003032)) % 360
+            geomMeanAnomSun = 357.52911 + julianCentury*(35999.05029 - 0.0001537*julianCentury)
+            eccentOrbit = 0.016708634 - julianCentury*(0.000042037 + 0.0000001267*julianCentury)
+            sunEqOfCtr = sin(radians(geomMeanAnomSun))*(1.914602 - julianCentury*(0.004817+0.000014*julianCentury)) + \
+                sin(radians(2*geomMeanAnomSun))*(0.019993-0.000101*julianCentury) + \
+                sin(radians(3*geomMeanAnomSun))*0.000289
+            sunTrueLong = geomMeanLongSun + sunEqOfCtr
+            sunAppLong = sunTrueLong - 0.00569 - 0.00478*sin(radians(125.04-1934.136*julianCentury))
+            meanObliqEcliptic = 23 + (26 + ((21.448 - julianCentury*(46.815 + \
+                julianCentury*(0.00059 - julianCentury*0.001813))))/60.0)/60.0
+            obliqueCorr = meanObliqEcliptic + 0.00256*cos(radians(125.04 - 1934.136*julianCentury))
+            solDec = asin(sin(radians(obliqueCorr))*sin(radians(sunAppLong)))
+            
+            varY = tan(radians(obliqueCorr/2.0))*tan(radians(obliqueCorr/2.0))
+            eqOfTime = 4*degrees(varY*sin(2*radians(geomMeanLongSun)) \
+                - 2*eccentOrbit*sin(radians(geomMeanAnomSun)) \
+                + 4*eccentOrbit*varY*sin(radians(geomMeanAnomSun))*cos(2*radians(geomMeanLongSun)) \
+                - 0.5*(varY**2)*sin(4*radians(geomMeanLongSun)) \
+                - 1.25*(eccentOrbit**2)*sin(2*radians(geomMeanAnomSun)))
+            if solarTime == False:
+                solTime = ((time*60 + eqOfTime + 4*degrees(sLongtitude) - 60*timeZone) % 1440)/60.0
+            else: solTime = time
+            
+            hourAngle = (solTime*15 + 180) if (solTime*15 < 0) else (solTime*15 - 180)
+            zenith = acos(sinLat*sin(solDec) + cosLat*cos(solDec)*cos(radians(hourAngle)))
+            
+            if hourAngle == 0.0 or hourAngle == -180.0 or hourAngle == 180.0:
+                if solDec < solLat: solAz = pi
+                else: solAz = 0.0
+            else:
+                solAz = ((acos(((sinLat*cos(zenith)) - sin(solDec))/(cosLat*sin(zenith))) + pi) % (2*pi)) \
+                    if (hourAngle > 0) else \
+                    ((3*pi - acos(((sinLat*cos(zenith)) - sin(solDec))/(cosLat*sin(zenith)))) % (2*pi))
+            
+            altitudes.append((pi/2) - zenith)
+            azimuths.append(solAz)
+            declinations.append(solDec)
+            equationOfTime.append(eqOfTime)
+            solarTimes.append(solTime)
+        
+        self.altitudes = altitudes
+        self.azimuths = azimuths
+        self.declinations = declinations
+        self.equationOfTime = equationOfTime
+        self.solarTimes = solarTimes
+        
+        # rotate the north vector by the altitude around x and by the azimuth around z
+        northAngle = self.northAngle
+        self.vectors = []
+        for solAlt, solAz in izip(altitudes, azimuths):
+            angle = -(solAz - northAngle)
+            cosAlt = cos(solAlt)
+            self.vectors.append((-cosAlt * sin(angle), cosAlt * cos(angle), sin(solAlt)))
+    
+    def sunUpIndices(self, minAltitude = 0):
+        """Indices of the hours that the sun altitude (radians) is at least minAltitude."""
+        return [count for count, altitude in enumerate(self.altitudes) if altitude >= minAltitude]
+
+
+class SunEvents(object):
+    """
+    Sunrise, sunset, solar noon, day length and twilight times for every day of the year.
+    
+    It uses the NOAA equations of the SunriseSunset component (Astronomical Algorithms,
+    Jean Meeus) and calculates the whole year in one pass. Use SunEvents.annual to get a
+    table that is shared between components through the cache of SunPositions.
+    
+    Sunrise is calculated with the sun at the start of the day and sunset with the sun at
+    the end of the day. During the polar winter both are calculated with the sun at noon.
+    
+    Args:
+        latitude: Latitude of the location in degrees.
+        longitude: Longitude of the location in degrees.
+        timeZone: Time zone of the location.
+        year: Year of the calculation. Default is 2016.
+    
+    Attributes:
+        months, days: Date of each day of the year. Feb 29th is not included.
+        solarNoons: Solar noon of each day as a fraction of the day (0.5 is 12:00).
+        sunrises, sunsets: Sunrise and sunset as a fraction of the day or None if the sun
+            doesn't rise or set that day.
+        sunriseStates, sunsetStates: "up" or "down" for the days that the sun doesn't rise
+            or set, otherwise None.
+        dayLengths: Sunlight duration of each day in minutes.
+        civilDawns, civilDusks: Start and end of civil twilight as a fraction of the day or
+            None if the sun doesn't reach 6 degrees below the horizon.
+    """
+    sunriseZenith = 90.833
+    twilightZeniths = {'civil': 96, 'nautical': 102, 'astronomical': 108}
+    
+    def __init__(self, latitude, longitude, timeZone, year = 2016):
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.timeZone = timeZone
+        self.year = 2016 if year is None else year
+        calendar = Calendar.get()
+        self.months = [month + 1 for month in calendar.monthOfDoy]
+        self.days = list(calendar.dayOfDoy)
+        self.sunUpHoursCache = {}
+        self.calculate()
+    
+    @classmethod
+    def annual(cls, latitude, longitude, timeZone, year = 2016):
+        """Sun events of the year for the location, shared through the cache of SunPositions."""
+        if year is None: year = 2016
+        key = ('events', int(year)) + SunPositions.siteKey(latitude, longitude, timeZone, 0, False)
+        return SunPositions.cached(key, lambda: cls(latitude, longitude, timeZone, year))
+    
+    @staticmethod
+    def noaaParameters(dayFraction, day, month, year, timeZone):
+        """Equation of time (minutes) and sun declination (degrees) from NOAA's spreadsheet.
+        
+        dayFraction is the time of the day as a fraction of the day (0.5 is noon).
+        """
+        sin = math.sin; cos = math.cos; radians = math.radians; degrees = math.degrees
+        # Julian day from calendar day
+        if (month <= 2):
+            year -= 1
+            month += 12
+        A = math.floor(year/100)
+        B = 2 - A + math.floor(A/4)
+        
+        julianDay = (math.floor(365.25*(year + 4716)) + math.floor(30.6001*(month+1)) \
+            + day + B - 1524.5) - timeZone / 24 + dayFraction
+        julianCent = (julianDay - 2451545.0)/36525.0
+        
+        # geometric mean longitude and anomaly of the sun
+        L0 = 280.46646 + julianCent * (36000.76983 + 0.0003032 * julianCent)
+        while (L0 > 360.0):
+            L0 -= 360.0
+        while (L0 < 0.0):
+            L0 += 360.0
+        M = 357.52911 + julianCent * (35999.05029 - 0.0001537 * julianCent)
+        
+        # eccentricity of earth's orbit
+        e = 0.016708634 - julianCent * (0.000042037 + 0.0000001267 * julianCent)
+        
+        centreSun = sin(radians(M)) * (1.914602 - julianCent \
+            * (0.004817 + 0.000014 * julianCent)) + sin(radians(2 * M)) \
+            * (0.019993 - 0.000101 * julianCent) + sin(radians(3 * julianCent)) * 0.000289
+        sunTrueLong = L0 + centreSun
+        sunAppLong = sunTrueLong - 0.00569 - 0.00478 * sin(radians(125.04 - 1934.136 * julianCent))
+        meanObliqEcliptic = 23 + (26 + ((21.448 - julianCent \
+            * (46.815 + julianCent * (0.00059 - julianCent * 0.001813)))) / 60) / 60
+        obliqCorr = meanObliqEcliptic + 0.00256 * cos(radians(125.04 - 1934.136 * julianCent))
+        
+        sunDeclin = degrees(math.asin(sin(radians(obliqCorr)) * sin(radians(sunAppLong))))
+        
+        varY = math.tan(radians(obliqCorr / 2)) * math.tan(radians(obliqCorr / 2))
+        eqOfTime = 4 * degrees(varY * sin(2 * radians(L0)) \
+            - 2 * e * sin(radians(M)) + 4 * e * varY * sin(radians(M)) \
+            * cos(2 * radians(L0)) - 0.5 * varY * varY * sin(4 * radians(L0)) \
+            - 1.25 * e * e * sin(2 * radians(M)))
+        
+        return eqOfTime, sunDeclin
+    
+    def hourAngle(self, zenith, sunDeclin):
+        """Hour angle (degrees) that the sun reaches the zenith angle.
+        
+        Returns "up" or "down" if the sun stays above or below the zenith angle all day.
+        """
+        latitude = self.latitude
+        a = math.cos(math.radians(zenith)) \
+            / (math.cos(math.radians(latitude)) * math.cos(math.radians(sunDeclin))) \
+            - math.tan(math.radians(latitude)) * math.tan(math.radians(sunDeclin))
+        if a > 1: return "down"
+        elif a < -1: return "up"
+        return math.degrees(math.acos(a))
+    
+    def solarNoon(self, eqOfTime):
+        return (720 - 4 * self.longitude - eqOfTime + self.timeZone * 60) / 1440
+    
+    def calculate(self):
+        noaaParameters = self.noaaParameters
+        hourAngle = self.hourAngle
+        latitude = self.latitude
+        year = self.year; timeZone = self.timeZone
+        sunriseZenith = self.sunriseZenith
+        
+        self.riseParameters = riseParameters = []
+        self.setParameters = setParameters = []
+        self.dayLengths = dayLengths = []
+        for month, day in izip(self.months, self.days):
+            # the polar seasons use the day of the year of a leap year as in SunriseSunset
+            doy = math.floor((275 * month)/9) - math.floor((month + 9)/12) + day - 30
+            endOfDay = noaaParameters(1, day, month, year, timeZone)
+            if (latitude > 66.4 and (doy < 79 or doy > 267)) or \
+               (latitude < -66.4 and not (doy < 83 or doy > 263)):
+                # polar winter
+                riseParameters.append(noaaParameters(0.5, day, month, year, timeZone))
+                setParameters.append(riseParameters[-1])
+            else:
+                riseParameters.append(noaaParameters(0, day, month, year, timeZone))
+                setParameters.append(endOfDay)
+            
+            # sunlight duration
+            HA = hourAngle(sunriseZenith, endOfDay[1])
+            if HA == "down": dayLengths.append(0)
+            elif HA == "up": dayLengths.append(1440)
+            else: dayLengths.append(int(round(HA * 8, 1)))
+        
+        self.solarNoons = [self.solarNoon(eqOfTime) for eqOfTime, sunDeclin in setParameters]
+        self.sunrises, self.sunsets, self.sunriseStates, self.sunsetStates = self.eventTimes(sunriseZenith)
+        self.civilDawns, self.civilDusks = self.twilight('civil')
+    
+    def eventTimes(self, zenith):
+        """Times that the sun crosses the zenith angle in the morning and in the evening.
+        
+        Returns:
+            Lists of the morning and evening times as fractions of the day (None if the sun
+            doesn't cross the zenith angle) and lists of the morning and evening states ("up"
+            or "down" if the sun doesn't cross the zenith angle, otherwise None).
+        """
+        hourAngle = self.hourAngle; solarNoon = self.solarNoon
+        
+        def times(parameters, sign):
+            values = []; states = []
+            for eqOfTime, sunDeclin in parameters:
+                HA = hourAngle(zenith, sunDeclin)
+                if HA == "up" or HA == "down":
+                    values.append(None)
+                    states.append(HA)
+                else:
+                    values.append(solarNoon(eqOfTime) + sign * HA * 4 / 1440)
+                    states.append(None)
+            return values, states
+        
+        rises, riseStates = times(self.riseParameters, -1)
+        sets, setStates = times(self.setParameters, 1)
+        return rises, sets, riseStates, setStates
+    
+    def twilight(self, kind = 'civil'):
+        """Dawn and dusk times for "civil", "nautical" or "astronomical" twilight."""
+        dawns, dusks, dawnStates, duskStates = self.eventTimes(self.twilightZeniths[kind])
+        return dawns, dusks
+    
+    def dayIndex(self, month, day):
+        """Index of the date (month 1-12) in the lists of the table."""
+        return Calendar.get().getJD(month, day) - 1
+    
+    def isSunUp(self, dayIndex, hour, hourShift = 0):
+        """Return 1 if the sun is up at the hour (1-24) of the day, otherwise 0.
+        
+        hourShift is the number of hours after the sunrise and before the sunset to
+        exclude.
+        """
+        riseState = self.sunriseStates[dayIndex]; setState = self.sunsetStates[dayIndex]
+        if riseState == "down" or setState == "down":
+            return 0
+        elif riseState == "up" or setState == "up":
+            return 1 if (24 - hourShift) >= hour > hourShift else 0
+        elif hour - hourShift <= 24 * self.sunrises[dayIndex] or hour + hourShift >= 24 * self.sunsets[dayIndex]:
+            return 0
+        return 1
+    
+    def sunUpHours(self, hourShift = 0):
+        """Daylight mask for the 8760 hours of the year (1 if the sun is up, otherwise 0)."""
+        try:
+            return self.sunUpHoursCache[hourShift]
+        except KeyError:
+            isSunUp = self.isSunUp
+            mask = array.array('b', [isSunUp(dayIndex, hour, hourShift) for dayIndex in xrange(365) for hour in xrange(1, 25)])
+            self.sunUpHoursCache[hourShift] = mask
+            return mask
+
+
 class Sunpath(object):
     """
     The sun-path Class is a Python version of RADIANCE sun-path script by Greg Ward. RADIANCE source code can be accessed at:
@@ -1567,6 +3378,15 @@ class Sunpath(object):
                     ((3*math.pi - math.acos(((math.sin(self.solLat)*math.cos(self.zenith)) \
                     - math.sin(self.solDec))/(math.cos(self.solLat)*math.sin(self.zenith)))) % (2*math.pi))
     
+    def solInitFromTable(self, sunPositions, index):
+        """Set the sun position to one of the positions of a SunPositions table."""
+        self.time = sunPositions.hours[index]
+        self.solDec = sunPositions.declinations[index]
+        self.solTime = sunPositions.solarTimes[index]
+        self.solAlt = sunPositions.altitudes[index]
+        self.zenith = (math.pi/2) - self.solAlt
+        self.solAz = sunPositions.azimuths[index]
+    
     def sunReverseVectorCalc(self):
         basePoint = rc.Geometry.Point3d.Add(rc.Geometry.Point3d.Origin,rc.Geometry.Vector3f(0,1,0))
         basePoint = rc.Geometry.Point(basePoint)
@@ -1976,30 +3796,691 @@ class Sky:
         interpolation = max(0, min(1, (self.sun.zenith - math.pi/2 + 0.2) / 0.2))
         return interpolation * nightColor + (1 - interpolation) * dayColor
     
-    def calcFullSky(self, res):
+    # sample directions of each resolution and the horizon terms of each resolution and turbidity
+    sampleGrids = {}
+    horizonTerms = {}
+    
+    @classmethod
+    def sampleGrid(cls, res):
+        """Directions of the sky samples of a resolution in the vertex order of the sky meshes.
+        
+        Rows go from the horizon (i = 0) to the zenith (i = res) and each row has 4 * res
+        azimuths. Sample (i, j) is at index i * 4 * res + j.
+        
+        Returns:
+            A list of (x, y, z) unit vectors and a list of 1/cos(zenith) for the samples.
+        """
+        try:
+            return cls.sampleGrids[res]
+        except KeyError:
+            vectors = []; invCosZeniths = []
+            for i in range(res + 1):
+                zen = (res - i) / res * math.pi / 2
+                invCosZenith = 1 / math.cos(zen)
+                for j in range(4 * res):
+                    az = j / (4 * res) * 2 * math.pi
+                    vectors.append((math.sin(zen) * math.cos(az), math.sin(zen) * math.sin(az), math.cos(zen)))
+                    invCosZeniths.append(invCosZenith)
+            cls.sampleGrids[res] = vectors, invCosZeniths
+            return cls.sampleGrids[res]
+    
+    def sampleHorizonTerms(self, res):
+        """The (1 + A * exp(B / cos(zenith))) term of perez for Y, x and y at each sample.
+        
+        It only depends on the turbidity so it is calculated once for all the hours of a sky.
+        """
+        key = (res, self.turbidity)
+        try:
+            return self.horizonTerms[key]
+        except KeyError:
+            invCosZeniths = self.sampleGrid(res)[1]
+            terms = []
+            for coeffs in (self.coeffsY, self.coeffsx, self.coeffsy):
+                A = coeffs.A; B = coeffs.B
+                terms.append([1 + A * math.exp(B * invCosZenith) for invCosZenith in invCosZeniths])
+            if len(self.horizonTerms) > 64: self.horizonTerms.clear()
+            self.horizonTerms[key] = terms
+            return terms
+    
+    def calcSkyYxy(self, res):
+        """Yxy color of all the samples of the current sky in the vertex order of the sky meshes.
+        
+        This is the same as calling calcSkyColor for each sample but the terms that don't change
+        between the samples are only calculated once.
+        
+        Returns:
+            Three lists for Y, x and y.
+        """
+        vectors = self.sampleGrid(res)[0]
+        sunZenith = self.sun.zenith; sunAzimuth = self.sun.azimuth
+        sunX = math.sin(sunZenith) * math.cos(sunAzimuth)
+        sunY = math.sin(sunZenith) * math.sin(sunAzimuth)
+        sunZ = math.cos(sunZenith)
+        acos = math.acos; exp = math.exp
+        gammas = [acos(min(max(x * sunX + y * sunY + z * sunZ, -1.0), 1.0)) for x, y, z in vectors]
+        
+        Yxy = []
+        for zenithValue, coeffs, horizonTerms in izip((self.Yz, self.xz, self.yz), (self.coeffsY, self.coeffsx, self.coeffsy),
+                                                       self.sampleHorizonTerms(res)):
+            C = coeffs.C; D = coeffs.D; E = coeffs.E
+            factor = zenithValue / self.perez(0, sunZenith, coeffs)
+            Yxy.append([factor * horizonTerm * (1 + C * exp(D * gamma) + E * math.cos(gamma) ** 2)
+                        for horizonTerm, gamma in izip(horizonTerms, gammas)])
+        return Yxy
+    
+    @staticmethod
+    def XYZToColors(X, Y, Z):
+        """Convert lists of CIE XYZ values to colors with Grasshopper's Colour XYZ component.
+        
+        The component is called once with the whole lists instead of once for each color.
+        """
         import ghpythonlib.components as ghcomp
-        self.fullSky = []
-        self.fullSkyXYZ = []
-        for j in range(4*res):
-            az = j/(4*res) * 2*math.pi
-            for i in range(res+1):
-                zen = (res-i)/res * math.pi/2
-                color = self.YxyToXYZ(self.calcSkyColor(az, zen))
-                self.fullSkyXYZ.append(str(color.v[0]) + ", " + str(color.v[1]) + ", " + str(color.v[2]))
-                self.fullSky.append(ghcomp.ColourXYZ(1, *color.v))
+        colors = ghcomp.ColourXYZ(1, list(X), list(Y), list(Z))
+        # a single color isn't returned in a list
+        if len(X) == 1 and not isinstance(colors, list): colors = [colors]
+        return list(colors)
+    
+    def calcSkyXYZ(self, res):
+        """XYZ color of all the samples of the current sky in the vertex order of the sky meshes."""
+        Ys, xs, ys = self.calcSkyYxy(res)
+        X = [x / y * Y for Y, x, y in izip(Ys, xs, ys)]
+        Z = [(1 - x - y) / y * Y for Y, x, y in izip(Ys, xs, ys)]
+        return X, Ys, Z
+    
+    def calcSkyMeshColors(self, res):
+        """Colors and XYZ text of all the samples of the current sky in the vertex order of the sky meshes."""
+        Xs, Ys, Zs = self.calcSkyXYZ(res)
+        colors = self.XYZToColors(Xs, Ys, Zs)
+        colorsXYZ = [str(X) + ", " + str(Y) + ", " + str(Z) for X, Y, Z in izip(Xs, Ys, Zs)]
+        return colors, colorsXYZ
+    
+    def calcFullSky(self, res):
+        """Colors and XYZ text of the sky samples ordered by azimuth and then by zenith."""
+        colors, colorsXYZ = self.calcSkyMeshColors(res)
+        # from rows of azimuths to columns of zeniths
+        numOfAzimuths = 4 * res
+        self.fullSky = [colors[i * numOfAzimuths + j] for j in range(numOfAzimuths) for i in range(res + 1)]
+        self.fullSkyXYZ = [colorsXYZ[i * numOfAzimuths + j] for j in range(numOfAzimuths) for i in range(res + 1)]
         
         return self.fullSky, self.fullSkyXYZ
     
     def calcSkyAvg(self, res):
-        self.colorAvg = Vector([0, 0, 0])
+        """Average Yxy color of the sky without the zenith row of samples."""
+        numOfSamples = 4 * res * res
         fac = 1/(4 * res**2)
-        for j in range(4*res):
-            az = j/(4*res) * 2*math.pi
-            for i in range(res):
-                zen = (res-i)/res * math.pi/2
-                self.colorAvg = self.colorAvg + (self.calcSkyColor(az, zen) * fac)
+        self.colorAvg = Vector([sum(islice(values, numOfSamples)) * fac for values in self.calcSkyYxy(res)])
         
         return self.colorAvg
+    
+    def calcSkies(self, dates, year, timeZone, latitude, longitude, turbidity, res, average = False):
+        """Sky colors for many hours in one call.
+        
+        The sample directions and the terms that only depend on the turbidity are calculated
+        once for all the hours.
+        
+        Args:
+            dates: A list of (doy, hour). doy starts from 0 the same as createSky.
+            average: Set to True to get the average color of each sky instead of the colors
+                of all the samples.
+        Returns:
+            A list of (colors, colorsXYZ) for each date in the vertex order of the sky meshes
+            or a list of (color, Yxy) if average is True.
+        """
+        skies = []
+        for doy, hour in dates:
+            self.createSky(doy, year, hour, timeZone, latitude, longitude, turbidity)
+            if average:
+                Yxy = self.calcSkyAvg(res)
+                X, Y, Z = self.YxyToXYZ(Yxy).v
+                skies.append((self.XYZToColors([X], [Y], [Z])[0], Yxy.v))
+            else:
+                skies.append(self.calcSkyMeshColors(res))
+        return skies
+    
+    def calcAnnualSkies(self, year, timeZone, latitude, longitude, turbidity, res, average = False, HOYs = None):
+        """Sky colors of every hour of the year (or of the HOYs) for animations. See calcSkies."""
+        if HOYs is None: HOYs = range(1, 8761)
+        dates = [((HOY - 1) // 24, HOY - 24 * ((HOY - 1) // 24)) for HOY in HOYs]
+        return self.calcSkies(dates, year, timeZone, latitude, longitude, turbidity, res, average)
+
+class SkyPatches(object):
+    """
+    Patches of a Tregenza (density 1) or a Reinhart (density 2) sky in the order of Radiance's
+    gendaymtx. The ground patch is not included and the last patch is the zenith.
+    
+    Use SkyPatches.get to get the shared patches of a density.
+    
+    Attributes:
+        altitudes, azimuths: Altitude and azimuth of the center of each patch in radians. Azimuth
+            is measured clockwise from north.
+        solidAngles: Solid angle of each patch in steradians.
+        vectors: (x, y, z) unit vector from the center to each patch. x is east and y is north.
+        rows: Row of each patch. Row 0 is the horizon.
+        radiationFactors: Factor of each patch to convert the radiance to radiation. These are
+            the solid angles of the rows as used by GenCumulativeSkyMtx.
+    """
+    numOfPatchesInEachRow = {1: [30, 30, 24, 24, 18, 12, 6, 1],
+                             2: [60, 60, 60, 60, 48, 48, 48, 48, 36, 36, 24, 24, 12, 12, 1]}
+    
+    # first row is horizon and last row is the zenith
+    rowSolidAngles = {1 : [0.0435449227, 0.0416418006, 0.0473984151, 0.0406730411, 0.0428934136, 0.0445221864, 0.0455168385, 0.0344199465],
+                      2: [0.0113221971, 0.0111894547, 0.0109255262, 0.0105335058, 0.0125224872, 0.0117312774, 0.0108025291, 0.00974713106, 0.011436609, 0.00974295956, 0.0119026242, 0.00905126163, 0.0121875626, 0.00612971396, 0.00921483254]}
+    
+    patches = {}
+    
+    def __init__(self, density = 1):
+        if density not in (1, 2):
+            raise ValueError("Sky density should be 1 for a Tregenza or 2 for a Reinhart sky.")
+        self.density = density
+        
+        # patches in each row of a Tregenza sky without the zenith
+        tregenzaRows = [30, 30, 24, 24, 18, 12, 6]
+        alpha = (math.pi / 2) / (7 * density + .5)
+        self.altitudes = []; self.azimuths = []; self.solidAngles = []; self.rows = []
+        for row in range(7 * density):
+            numOfPatches = tregenzaRows[row // density] * density
+            solidAngle = 2 * math.pi * (math.sin(alpha * (row + 1)) - math.sin(alpha * row)) / numOfPatches
+            for count in range(numOfPatches):
+                self.altitudes.append(alpha * (row + .5))
+                self.azimuths.append(2 * math.pi * count / numOfPatches)
+                self.solidAngles.append(solidAngle)
+                self.rows.append(row)
+        
+        # zenith
+        self.altitudes.append(math.pi / 2)
+        self.azimuths.append(0.0)
+        self.solidAngles.append(2 * math.pi * (1 - math.cos(alpha * .5)))
+        self.rows.append(7 * density)
+        
+        self.vectors = [(math.sin(azimuth) * math.cos(altitude), math.cos(azimuth) * math.cos(altitude), math.sin(altitude))
+                        for altitude, azimuth in izip(self.altitudes, self.azimuths)]
+        self.radiationFactors = [self.rowSolidAngles[density][row] for row in self.rows]
+    
+    @classmethod
+    def get(cls, density = 1):
+        try:
+            return cls.patches[density]
+        except KeyError:
+            cls.patches[density] = cls(density)
+            return cls.patches[density]
+    
+    def __len__(self):
+        return len(self.altitudes)
+
+
+class SkyMatrix(object):
+    """
+    Hourly diffuse and direct radiation (Wh/m2) of each sky patch for the 8760 hours of a year.
+    
+    Use SkyMatrix.fromWeatherData to calculate the matrix from the direct normal and the
+    diffuse horizontal radiation of a weather file. It uses the Perez all-weather sky model
+    the same way as Radiance's gendaymtx (-O1) so no external program or temp file is needed.
+    
+    Args:
+        density: 1 for a Tregenza (145 patches) and 2 for a Reinhart (577 patches) sky.
+        diffuse, direct: Lists of the hourly values of each patch. Each list has 8760 values.
+        location: Name of the location.
+        lat, lngt, timeZone: Latitude, longitude and time zone as returned by epwLocation.
+    """
+    
+    # version of fromWeatherData and of how its weather data is read (epwHourlyReader). skies of
+    # different versions are kept apart in SkyMatrixCache so bump it whenever the results change
+    # 2: hourly values of sub-hourly and leap year files
+    algorithmVersion = 2
+    
+    # Perez et al. (1993) coefficients for a, b, c, d and e for each sky clearness category
+    perezCoefficients = (
+        (1.3525, -0.2576, -0.2690, -1.4366, -0.7670, 0.0007, 1.2734, -0.1233, 2.8000, 0.6004,
+         1.2375, 1.0000, 1.8734, 0.6297, 0.9738, 0.2809, 0.0356, -0.1246, -0.5718, 0.9938),
+        (-1.2219, -0.7730, 1.4148, 1.1016, -0.2054, 0.0367, -3.9128, 0.9156, 6.9750, 0.1774,
+         6.4477, -0.1239, -1.5798, -0.5081, -1.7812, 0.1080, 0.2624, 0.0672, -0.2190, -0.4285),
+        (-1.1000, -0.2515, 0.8952, 0.0156, 0.2782, -0.1812, -4.5000, 1.1766, 24.7219, -13.0812,
+         -37.7000, 34.8438, -5.0000, 1.5218, 3.9229, -2.6204, -0.0156, 0.1597, 0.4199, -0.5562),
+        (-0.5484, -0.6654, -0.2672, 0.7117, 0.7234, -0.6219, -5.6812, 2.6297, 33.3389, -18.3000,
+         -62.2500, 52.0781, -3.5000, 0.0016, 1.1477, 0.1062, 0.4659, -0.3296, -0.0876, -0.0329),
+        (-0.6000, -0.3566, -2.5000, 2.3250, 0.2937, 0.0496, -5.6812, 1.8415, 21.0000, -4.7656,
+         -21.5906, 7.2492, -3.5000, -0.1554, 1.4062, 0.3988, 0.0032, 0.0766, -0.0656, -0.1294),
+        (-1.0156, -0.3670, 1.0078, 1.4051, 0.2875, -0.5328, -3.8500, 3.3750, 14.0000, -0.9999,
+         -7.1406, 7.5469, -3.4000, -0.1078, -1.0750, 1.5702, -0.0672, 0.4016, 0.3017, -0.4844),
+        (-1.0000, 0.0211, 0.5025, -0.5119, -0.3000, 0.1922, 0.7023, -1.6317, 19.0000, -5.0000,
+         1.2438, -1.9094, -4.0000, 0.0250, 0.3844, 0.2656, 1.0468, -0.3788, -2.4517, 1.4656),
+        (-1.0500, 0.0289, 0.4260, 0.3590, -0.3250, 0.1156, 0.7781, 0.0025, 31.0625, -14.5000,
+         -46.1148, 55.3750, -7.2312, 0.4050, 13.3500, 0.6234, 1.5000, -0.6426, 1.8564, 0.5636))
+    
+    # upper limits of the sky clearness categories
+    skyClearnessLimits = (1.065, 1.230, 1.500, 1.950, 2.800, 4.500, 6.200)
+    
+    # gendaymtx's sky color weighted the same way GenCumulativeSkyMtx reads the colors
+    skyColorFactor = .265074126 * .960 + .670114631 * 1.004 + .064811243 * 1.118
+    
+    # number of patches that share the sun
+    numOfSunPatches = 4
+    
+    def __init__(self, density, diffuse, direct, location = "", lat = None, lngt = None, timeZone = None):
+        self.density = density
+        self.diffuse = diffuse
+        self.direct = direct
+        self.location = location
+        self.lat = lat
+        self.lngt = lngt
+        self.timeZone = timeZone
+        self._d = None
+        self._sums = None
+    
+    def ToString(self):
+        return 'AnnualDaylightMatrix::%s' % self.location
+    
+    @property
+    def d(self):
+        """The matrix as {patch: {HOY: [diffuse, direct]}} like the older versions of GenCumulativeSkyMtx.
+        
+        The dictionary is large and slow to go through. Use hourlyValues, cumulateHours and
+        cumulatePeriod to select skies.
+        """
+        if self._d is None:
+            self._d = dict((patch, dict((HOY, [difValue, dirValue]) for HOY, difValue, dirValue in izip(xrange(1, 8761), diffuse, direct)))
+                           for patch, (diffuse, direct) in enumerate(izip(self.diffuse, self.direct)))
+        return self._d
+    
+    def compare(self, other):
+        """Differences to another matrix of the same sky such as one read from gendaymtx files.
+        
+        Returns a dictionary with a (total, patch, hourly) tuple for "diffuse" and "direct":
+        the difference of the radiation of the year relative to the total, the largest
+        difference of the year of a patch relative to the largest patch and the largest
+        difference of an hour of a patch relative to the largest value of an hour.
+        """
+        if self.density != other.density:
+            raise ValueError('The sky matrices have different densities.')
+        differences = {}
+        for name in ('diffuse', 'direct'):
+            values = getattr(self, name); otherValues = getattr(other, name)
+            patchTotals = [sum(patchValues) for patchValues in values]
+            otherPatchTotals = [sum(patchValues) for patchValues in otherValues]
+            total = sum(patchTotals) or 1
+            largestPatch = max(patchTotals) or 1
+            largestHour = max(max(patchValues) for patchValues in values) or 1
+            hourlyDifference = max(max(imap(abs, imap(operator.sub, patchValues, otherPatchValues)))
+                                   for patchValues, otherPatchValues in izip(values, otherValues))
+            differences[name] = (abs(sum(patchTotals) - sum(otherPatchTotals)) / total,
+                                 max(abs(a - b) for a, b in izip(patchTotals, otherPatchTotals)) / largestPatch,
+                                 hourlyDifference / largestHour)
+        return differences
+    
+    @staticmethod
+    def runningTotals(values):
+        """Running totals of the values starting from 0 so sum(values[i:j]) == totals[j] - totals[i]."""
+        totals = array.array('d', [0])
+        total = 0.0
+        append = totals.append
+        for value in values:
+            total += value
+            append(total)
+        return totals
+    
+    @property
+    def sums(self):
+        """Running totals of the diffuse and direct values of each patch.
+        
+        They are calculated once for the matrix the first time a period is cumulated.
+        """
+        if self._sums is None:
+            runningTotals = self.runningTotals
+            self._sums = [(runningTotals(diffuse), runningTotals(direct)) for diffuse, direct in izip(self.diffuse, self.direct)]
+        return self._sums
+    
+    def hourlyValues(self, HOY):
+        """Diffuse and direct values (Wh) of each patch for a single hour of the year (1-8760)."""
+        index = int(HOY) - 1
+        if index != HOY - 1 or not 0 <= index < 8760:
+            raise ValueError('%s is not an hour of the year between 1 and 8760.' % HOY)
+        return [[diffuse[index], direct[index]] for diffuse, direct in izip(self.diffuse, self.direct)]
+    
+    def cumulateHours(self, HOYs):
+        """Sum of the diffuse and direct values (Wh) of each patch for a list of hours of the year.
+        
+        Hours that are not a whole number between 1 and 8760 are left out.
+        
+        Returns:
+            skyValues: A [diffuse, direct] pair for each patch.
+            invalidHOYs: The hours that are left out.
+        """
+        indices = []; invalidHOYs = []
+        for HOY in HOYs:
+            index = int(HOY) - 1
+            if index == HOY - 1 and 0 <= index < 8760: indices.append(index)
+            else: invalidHOYs.append(HOY)
+        
+        if not indices:
+            return [[0, 0] for patch in xrange(len(self.diffuse))], invalidHOYs
+        elif len(indices) == 1:
+            return self.hourlyValues(indices[0] + 1), invalidHOYs
+        
+        getter = operator.itemgetter(*indices)
+        skyValues = [[sum(getter(diffuse)), sum(getter(direct))] for diffuse, direct in izip(self.diffuse, self.direct)]
+        return skyValues, invalidHOYs
+    
+    def cumulatePeriod(self, analysisPeriod):
+        """Sum of the diffuse and direct values (Wh) of each patch for an analysis period.
+        
+        The sums are found from the running totals of each patch with one subtraction per
+        run of consecutive hours in the period (see Calendar.periodRuns).
+        
+        Returns:
+            A [diffuse, direct] pair for each patch.
+        """
+        runs = Calendar.get().periodRuns(analysisPeriod)
+        if not runs:
+            return [[0, 0] for patch in xrange(len(self.diffuse))]
+        elif len(runs) == 1:
+            (start, stop), = runs
+            return [[difSums[stop] - difSums[start], dirSums[stop] - dirSums[start]] for difSums, dirSums in self.sums]
+        starts = operator.itemgetter(*[start for start, stop in runs])
+        stops = operator.itemgetter(*[stop for start, stop in runs])
+        return [[sum(stops(difSums)) - sum(starts(difSums)), sum(stops(dirSums)) - sum(starts(dirSums))]
+                for difSums, dirSums in self.sums]
+    
+    @staticmethod
+    def readMtxHeader(mtxFile):
+        """Read the header of a Radiance matrix file and leave the file at the start of the data.
+        
+        Returns:
+            A dictionary of the header variables (NROWS, NCOLS, NCOMP, FORMAT, ...). It is empty
+            for the files of older versions of gendaymtx that have no header.
+        """
+        if not mtxFile.readline().startswith('#?RADIANCE'):
+            mtxFile.seek(0)
+            return {}
+        header = {}
+        for line in iter(mtxFile.readline, ''):
+            line = line.strip()
+            if not line: break
+            if '=' in line:
+                key, value = line.split('=', 1)
+                header[key.strip()] = value.strip()
+        return header
+    
+    @classmethod
+    def iterMtxRows(cls, filePath, chunkSize = 1 << 20):
+        """Read the rows of a Radiance matrix file one at a time.
+        
+        Ascii files are read in chunks of chunkSize bytes and the binary float and double
+        formats (gendaymtx -ff and -fd) are read straight into arrays so only one row is in
+        memory at a time. Values that can't be read (e.g. nan) are set to 0.
+        
+        Returns:
+            header: The header variables of the file.
+            rows: A generator of an array of the ncols x ncomp values of each row.
+        """
+        mtxFile = open(filePath, 'rb')
+        header = cls.readMtxHeader(mtxFile)
+        rowLength = int(header.get('NCOLS', 8760)) * int(header.get('NCOMP', 3))
+        dataFormat = header.get('FORMAT', 'ascii')
+        if dataFormat not in ('ascii', 'float', 'double'):
+            mtxFile.close()
+            raise ValueError('%s has an unsupported format: %s' % (filePath, dataFormat))
+        
+        def readBinary(typecode):
+            swap = (header.get('BIGENDIAN', '0') == '1') != (sys.byteorder == 'big')
+            while True:
+                values = array.array(typecode)
+                try: values.fromfile(mtxFile, rowLength)
+                except EOFError: break
+                if swap: values.byteswap()
+                yield values
+        
+        def toFloat(word):
+            try: return float(word)
+            except ValueError: return 0.0
+        
+        def readAscii():
+            values = array.array('f')
+            remainder = ''
+            while True:
+                chunk = mtxFile.read(chunkSize)
+                text = remainder + chunk
+                words = text.split()
+                # keep a number that is cut at the end of the chunk for the next chunk
+                remainder = words.pop() if chunk and words and not text[-1].isspace() else ''
+                try: values.fromlist(map(float, words))
+                except ValueError: values.fromlist(map(toFloat, words))
+                while len(values) >= rowLength:
+                    yield values[:rowLength]
+                    del values[:rowLength]
+                if not chunk: break
+        
+        def rows():
+            try:
+                if dataFormat == 'ascii': rowValues = readAscii()
+                else: rowValues = readBinary('f' if dataFormat == 'float' else 'd')
+                for values in rowValues: yield values
+            finally:
+                mtxFile.close()
+        
+        return header, rows()
+    
+    @classmethod
+    def fromMtxFiles(cls, diffuseFile, directFile, density = 1, location = "", lat = None, lngt = None, timeZone = None):
+        """Load the diffuse and direct sky matrices that are generated by Radiance's gendaymtx.
+        
+        The RGB values of each patch are weighted to radiance and converted to radiation
+        the same way as the older versions of GenCumulativeSkyMtx. The first row of the files
+        is the ground and is not loaded.
+        
+        Args:
+            diffuseFile, directFile: Paths to the outputs of gendaymtx -s and gendaymtx -d.
+            density: 1 for a Tregenza and 2 for a Reinhart sky.
+            location: Name of the location.
+            lat, lngt, timeZone: Latitude, longitude and time zone of the location.
+        """
+        radiationFactors = SkyPatches.get(density).radiationFactors
+        numOfPatches = len(radiationFactors)
+        
+        def loadRows(filePath):
+            header, rows = cls.iterMtxRows(filePath)
+            numOfComponents = int(header.get('NCOMP', 3))
+            next(rows, None) # ground
+            patchValues = []
+            for radiationFactor, values in izip(radiationFactors, rows):
+                if numOfComponents == 3:
+                    # weight R, G and B from the interleaved values
+                    r = .265074126 * radiationFactor; g = .670114631 * radiationFactor; b = .064811243 * radiationFactor
+                    rgb = iter(values)
+                    patchValues.append(array.array('f', [r * R + g * G + b * B for R, G, B in izip(rgb, rgb, rgb)]))
+                else:
+                    patchValues.append(array.array('f', imap(radiationFactor.__mul__, islice(values, 0, None, numOfComponents))))
+            rows.close()
+            if len(patchValues) != numOfPatches:
+                raise ValueError('%s has %d sky patches instead of %d.' % (filePath, len(patchValues), numOfPatches))
+            for values in patchValues:
+                if len(values) < 8760: values.extend(repeat(0, 8760 - len(values)))
+                else: del values[8760:]
+            return patchValues
+        
+        return cls(density, loadRows(diffuseFile), loadRows(directFile), location, lat, lngt, timeZone)
+    
+    @classmethod
+    def perezParameters(cls, sunZenith, skyClearness, skyBrightness):
+        """Coefficients a, b, c, d and e of the Perez sky luminance distribution."""
+        category = bisect.bisect_right(cls.skyClearnessLimits, skyClearness)
+        if 1.065 < skyClearness < 2.8 and skyBrightness < 0.2:
+            skyBrightness = 0.2
+        
+        x = cls.perezCoefficients[category]
+        parameters = [x[4*i] + x[4*i+1] * sunZenith + skyBrightness * (x[4*i+2] + x[4*i+3] * sunZenith) for i in range(5)]
+        if category == 0:
+            parameters[2] = math.exp(math.pow(skyBrightness * (x[8] + x[9] * sunZenith), x[10])) - x[11]
+            parameters[3] = -math.exp(skyBrightness * (x[12] + x[13] * sunZenith)) + x[14] + skyBrightness * x[15]
+        return parameters
+    
+    @classmethod
+    def fromWeatherData(cls, latitude, longitude, timeZone, directNormalRadiation, diffuseHorizontalRadiation,
+                        density = 1, location = "", HOYs = None):
+        """Calculate the sky matrix with the Perez all-weather sky model.
+        
+        Args:
+            latitude, longitude, timeZone: Location of the weather file.
+            directNormalRadiation, diffuseHorizontalRadiation: 8760 hourly values in Wh/m2.
+            density: 1 for a Tregenza and 2 for a Reinhart sky.
+            location: Name of the location.
+            HOYs: Optional list of hours (1-8760) to calculate. The other hours are zero so a year
+                can be calculated in parts.
+        """
+        sin = math.sin; cos = math.cos; exp = math.exp; acos = math.acos; pi = math.pi
+        
+        patches = SkyPatches.get(density)
+        numOfPatches = len(patches)
+        vectors = patches.vectors
+        radiationFactors = patches.radiationFactors
+        # cos, 1/cos and horizontal solid angle of the patches' zenith angles
+        cosZeniths = [vector[2] for vector in vectors]
+        invCosZeniths = [1 / cosZenith for cosZenith in cosZeniths]
+        horizontalSolidAngles = [cosZenith * solidAngle for cosZenith, solidAngle in izip(cosZeniths, patches.solidAngles)]
+        sunFactors = [radiationFactor / solidAngle for radiationFactor, solidAngle in izip(radiationFactors, patches.solidAngles)]
+        
+        diffuse = [array.array('f', [0]) * 8760 for patch in xrange(numOfPatches)]
+        direct = [array.array('f', [0]) * 8760 for patch in xrange(numOfPatches)]
+        
+        # solar position the same way as Radiance's sun.c
+        sLatitude = math.radians(float(latitude))
+        sinLat = sin(sLatitude); cosLat = cos(sLatitude)
+        longitudeTimeAdjustment = (float(longitude) - 15 * float(timeZone)) / 15
+        
+        if HOYs is None: HOYs = xrange(1, 8761)
+        for HOY in HOYs:
+            index = int(HOY) - 1
+            dirRad = directNormalRadiation[index]
+            difRad = diffuseHorizontalRadiation[index]
+            if dirRad <= 1e-4 and difRad <= 1e-4: continue
+            
+            julianDay = index // 24 + 1
+            sunDec = 0.4093 * sin((2 * pi / 368) * (julianDay - 81))
+            solarTime = index % 24 + .5 + 0.170 * sin((4 * pi / 373) * (julianDay - 80)) - \
+                0.129 * sin((2 * pi / 355) * (julianDay - 8)) + longitudeTimeAdjustment
+            hourAngle = solarTime * (pi / 12)
+            altitude = math.asin(sinLat * sin(sunDec) - cosLat * cos(sunDec) * cos(hourAngle))
+            azimuth = pi - math.atan2(cos(sunDec) * sin(hourAngle), -cosLat * sin(sunDec) - sinLat * cos(sunDec) * cos(hourAngle))
+            
+            if difRad > 1e-4:
+                # keep the sun above the horizon and the circumsolar region off the zenith
+                if altitude <= 0: sunZenith = pi / 2
+                elif altitude >= math.radians(87): sunZenith = math.radians(3)
+                else: sunZenith = pi / 2 - altitude
+                
+                airMass = 1.0 / (cos(sunZenith) + 0.15 * exp(math.log(93.885 - math.degrees(sunZenith)) * -1.253))
+                dayAngle = 2.0 * pi * (julianDay - 1) / 365
+                eccentricity = 1.00011 + 0.034221 * cos(dayAngle) + 0.00128 * sin(dayAngle) + \
+                    0.000719 * cos(2 * dayAngle) + 0.000077 * sin(2 * dayAngle)
+                skyBrightness = max(difRad * airMass / (1367 * eccentricity), 0.01)
+                zenithCubed = sunZenith ** 3
+                skyClearness = ((difRad + dirRad) / difRad + 1.041 * zenithCubed) / (1.0 + 1.041 * zenithCubed)
+                skyClearness = min(max(skyClearness, 1.0), 11.9)
+                a, b, c, d, e = cls.perezParameters(sunZenith, skyClearness, skyBrightness)
+                
+                # relative luminance of each patch
+                sunX = sin(azimuth) * sin(sunZenith); sunY = cos(azimuth) * sin(sunZenith); sunZ = cos(sunZenith)
+                luminances = []
+                for (x, y, z), invCosZenith in izip(vectors, invCosZeniths):
+                    cosGamma = min(max(x * sunX + y * sunY + z * sunZ, -1.0), 1.0)
+                    luminance = (1.0 + a * exp(b * invCosZenith)) * (1.0 + c * exp(d * acos(cosGamma)) + e * cosGamma * cosGamma)
+                    luminances.append(luminance if luminance > 0 else 0)
+                
+                # scale the luminances to the diffuse horizontal radiation
+                horizontalIlluminance = sum(imap(operator.mul, luminances, horizontalSolidAngles))
+                if horizontalIlluminance <= 1e-7:
+                    luminances = [1.0] * numOfPatches
+                    horizontalIlluminance = pi
+                factor = difRad / horizontalIlluminance * cls.skyColorFactor
+                for patch, luminance in enumerate(luminances):
+                    diffuse[patch][index] = luminance * factor * radiationFactors[patch]
+            
+            if dirRad > 1e-4:
+                # share the sun between the closest patches weighted by proximity
+                sunVector = (sin(azimuth) * cos(altitude), cos(azimuth) * cos(altitude), sin(altitude))
+                dotProducts = [x * sunVector[0] + y * sunVector[1] + z * sunVector[2] for x, y, z in vectors]
+                sunPatches = heapq.nlargest(cls.numOfSunPatches, xrange(numOfPatches), key = dotProducts.__getitem__)
+                weights = [1.0 / (1.002 - dotProducts[patch]) for patch in sunPatches]
+                totalWeight = sum(weights)
+                for patch, weight in izip(sunPatches, weights):
+                    direct[patch][index] += weight * dirRad / totalWeight * sunFactors[patch]
+        
+        return cls(density, diffuse, direct, location, latitude, longitude, timeZone)
+
+
+class SkyMatrixCache(FileCache):
+    """
+    Persistent store of the sky matrices that are calculated from epw files.
+    
+    Entries are addressed by the md5 hash of the weather file content, the sky density and
+    SkyMatrix.algorithmVersion so a sky is calculated once for each weather file no matter
+    where the file is or which project uses it, and an edited weather file, a different sky
+    or a sky of an older version of the calculation is never mixed up with the new result.
+    Each entry keeps the md5 hash of its values so a corrupted entry is removed instead of
+    loaded.
+    """
+    magic = 'LBSM'
+    version = 1
+    extension = '.lbs'
+    # magic, version, density, number of patches, number of hours, length of the location text, md5 of the values
+    headerFormat = '<4sIIIII16s'
+    
+    def __init__(self, cacheFolder = None, maxSize = 512 * 1024 * 1024):
+        if cacheFolder is None:
+            cacheFolder = os.path.join(sc.sticky["Ladybug_DefaultFolder"], "skyMatrixCache")
+        FileCache.__init__(self, cacheFolder, maxSize)
+    
+    def skyKey(self, epw_file, density):
+        """Address of the sky of a weather file in the store."""
+        keyText = '%s|%d|%d' % (self.fileHash(epw_file), int(density), SkyMatrix.algorithmVersion)
+        return hashlib.md5(keyText).hexdigest()
+    
+    def load(self, key):
+        """Return the stored SkyMatrix or None if there is no valid entry for the key."""
+        def readSky(inf):
+            magic, version, density, numOfPatches, numOfHours, locationLength, checksum = \
+                struct.unpack(self.headerFormat, inf.read(struct.calcsize(self.headerFormat)))
+            if magic != self.magic or version != self.version:
+                raise ValueError("Not a valid Ladybug sky matrix file.")
+            location, lat, lngt, timeZone = inf.read(locationLength).decode('utf-8').split('\t')
+            
+            md5 = hashlib.md5()
+            rows = []
+            for row in xrange(2 * numOfPatches):
+                values = array.array('f')
+                values.fromfile(inf, numOfHours)
+                md5.update(values.tostring())
+                if sys.byteorder == 'big': values.byteswap()
+                rows.append(values)
+            if inf.read(1) or md5.digest() != checksum:
+                raise ValueError("The sky matrix file is corrupted.")
+            
+            toFloat = lambda value: float(value) if value else None
+            return SkyMatrix(density, rows[:numOfPatches], rows[numOfPatches:], location,
+                             toFloat(lat), toFloat(lngt), toFloat(timeZone))
+        
+        return self.readEntry(key, readSky)
+    
+    def store(self, key, skyMatrix):
+        """Write a SkyMatrix to the store and evict the old entries if needed."""
+        rows = []
+        md5 = hashlib.md5()
+        for values in chain(skyMatrix.diffuse, skyMatrix.direct):
+            values = array.array('f', values)
+            if sys.byteorder == 'big': values.byteswap()
+            md5.update(values.tostring())
+            rows.append(values)
+        
+        locationText = '\t'.join('' if value is None else unicode(value) for value in
+            (skyMatrix.location, skyMatrix.lat, skyMatrix.lngt, skyMatrix.timeZone)).encode('utf-8')
+        
+        def writeSky(outf):
+            outf.write(struct.pack(self.headerFormat, self.magic, self.version, skyMatrix.density,
+                                   len(skyMatrix.diffuse), len(rows[0]), len(locationText), md5.digest()))
+            outf.write(locationText)
+            for values in rows: values.tofile(outf)
+        
+        self.writeEntry(key, writeSky)
+
 
 class MeshPreparation(object):
     
@@ -2170,8 +4651,814 @@ class MeshPreparation(object):
         
         return mesh
 
+class VisibilityMatrix(object):
+    """
+    Bit-packed visibility of rays from a set of points along a set of directions.
+    
+    Each row is a point and each column a direction. A set bit means the ray is not blocked.
+    Rows are stored in whole bytes so every row can be written on its own in parallel.
+    
+    Args:
+        numOfRows: Number of points.
+        numOfColumns: Number of directions.
+    """
+    
+    bitCounts = [bin(byte).count('1') for byte in range(256)]
+    
+    def __init__(self, numOfRows, numOfColumns):
+        self.numOfRows = numOfRows
+        self.numOfColumns = numOfColumns
+        self.rowBytes = (numOfColumns + 7) // 8
+        self.data = array.array('B', [0]) * (numOfRows * self.rowBytes)
+    
+    def set(self, row, column, visible = True):
+        index = row * self.rowBytes + (column >> 3)
+        if visible: self.data[index] |= 1 << (column & 7)
+        else: self.data[index] &= ~(1 << (column & 7)) & 255
+    
+    def get(self, row, column):
+        return (self.data[row * self.rowBytes + (column >> 3)] >> (column & 7)) & 1 == 1
+    
+    def row(self, row):
+        """List of True/False for all the directions of a point."""
+        get = self.get
+        return [get(row, column) for column in xrange(self.numOfColumns)]
+    
+    def rowCount(self, row):
+        """Number of visible directions of a point."""
+        start = row * self.rowBytes
+        bitCounts = self.bitCounts
+        return sum(bitCounts[byte] for byte in self.data[start:start + self.rowBytes])
+
+
+class IntersectionMatrix(object):
+    """
+    Sparse relation between the test points of a radiation study and the sky patches.
+    
+    Each row keeps only the patches that a point sees, with the weight of the patch
+    (the cosine of the angle between the patch and the point normal multiplied by the
+    transmittance of the context in between). The rows are stored one after the other in
+    compact arrays so the matrix of a large grid only takes a few bytes for each visible patch.
+    The radiation for a new sky is then one matrix-vector product.
+    
+    Args:
+        numOfPatches: Number of sky patches.
+        rows: A list of (patch numbers, weights) for each test point.
+        normals: Optional normals of the test points for the d view.
+        patchVectors: Optional vectors of the sky patches for the d view.
+    """
+    
+    def __init__(self, numOfPatches, rows = [], normals = None, patchVectors = None):
+        self.numOfPatches = numOfPatches
+        self.normals = normals
+        self.patchVectors = patchVectors
+        self._d = None
+        self.rowStarts = array.array('l', [0])
+        self.patches = array.array('H')
+        self.weights = array.array('f')
+        for patches, weights in rows:
+            self.patches.extend(patches)
+            self.weights.extend(weights)
+            self.rowStarts.append(len(self.patches))
+    
+    @property
+    def numOfPoints(self):
+        return len(self.rowStarts) - 1
+    
+    def row(self, row):
+        """The (patch number, weight) of the patches that a point sees."""
+        start = self.rowStarts[row]; end = self.rowStarts[row + 1]
+        return zip(self.patches[start:end], self.weights[start:end])
+    
+    def visiblePatchCount(self, row):
+        return self.rowStarts[row + 1] - self.rowStarts[row]
+    
+    @property
+    def d(self):
+        """The matrix as {point: {patch: {'isIntersect': transmittance, 'vecAngle': angle}}} like the
+        older versions of Radiation Analysis.
+        
+        isIntersect is 0 for the patches that the point doesn't see. The dictionary is large and
+        slow to go through. Use row and multiply instead.
+        """
+        if self._d is None:
+            if self.normals is None or self.patchVectors is None:
+                raise AttributeError('The d view needs the normals and the patch vectors of the study.')
+            VectorAngle = rc.Geometry.Vector3d.VectorAngle
+            self._d = {}
+            for row, normal in enumerate(self.normals):
+                visible = dict(self.row(row))
+                patchDict = {}
+                for patch, patchVector in enumerate(self.patchVectors):
+                    vecAngle = VectorAngle(patchVector, normal)
+                    # the weight is the cosine of the angle times the transmittance
+                    if patch in visible: isIntersect = round(visible[patch] / math.cos(vecAngle), 6)
+                    else: isIntersect = 0
+                    patchDict[patch] = {'isIntersect': isIntersect, 'vecAngle': vecAngle}
+                self._d[row] = patchDict
+        return self._d
+    
+    def multiply(self, skyValues):
+        """Radiation of each point for a list with the value of each sky patch."""
+        skyValues = list(skyValues)
+        products = map(operator.mul, map(skyValues.__getitem__, self.patches), self.weights)
+        rowStarts = self.rowStarts
+        return [sum(products[rowStarts[row]:rowStarts[row + 1]]) for row in xrange(len(rowStarts) - 1)]
+    
+    def hourlyIrradiance(self, skyMatrix, HOYs = None, blockSize = 168):
+        """Irradiance of each point for each hour with the matrix as daylight coefficients.
+        
+        The rays are only traced once for the radiation study and each hour is then a product
+        of the matrix and the total (diffuse + direct) values of the patches for that hour.
+        The hours are calculated in blocks so only one block of results is kept in memory.
+        
+        Args:
+            skyMatrix: A SkyMatrix with the same number of patches as the matrix.
+            HOYs: Hours of the year (1-8760). Default is all the hours of the year.
+            blockSize: Number of hours in each block.
+        Yields:
+            The hours of the block and a list for each point with the irradiance (Wh/m2)
+            of each hour of the block.
+        """
+        HOYs = range(1, 8761) if HOYs is None else list(HOYs)
+        if len(skyMatrix.diffuse) != self.numOfPatches:
+            raise ValueError('The sky matrix has %d patches but the intersection matrix is for %d patches.'
+                             % (len(skyMatrix.diffuse), self.numOfPatches))
+        indices = []
+        for HOY in HOYs:
+            index = int(HOY) - 1
+            if index != HOY - 1 or not 0 <= index < 8760:
+                raise ValueError('%s is not an hour of the year between 1 and 8760.' % HOY)
+            indices.append(index)
+        
+        def gather(indices):
+            if len(indices) == 1: return lambda values: (values[indices[0]],)
+            return operator.itemgetter(*indices)
+        
+        rowStarts = self.rowStarts; patches = self.patches; weights = self.weights
+        for blockStart in xrange(0, len(indices), blockSize):
+            blockIndices = indices[blockStart:blockStart + blockSize]
+            # total value of each patch for each hour of the block
+            getter = gather(blockIndices)
+            patchValues = [map(operator.add, getter(diffuse), getter(direct)) for diffuse, direct in izip(skyMatrix.diffuse, skyMatrix.direct)]
+            
+            # only the hours with sun need the product. the dark hours point at a zero after the values
+            litHours = [hour for hour, skyValues in enumerate(izip(*patchValues)) if any(skyValues)]
+            if len(litHours) < len(blockIndices):
+                litGetter = gather(litHours) if litHours else lambda values: ()
+                patchValues = [litGetter(values) for values in patchValues]
+                positions = [len(litHours)] * len(blockIndices)
+                for litCount, hour in enumerate(litHours): positions[hour] = litCount
+                expand = gather(positions)
+            else: expand = None
+            
+            blockValues = []
+            for row in xrange(len(rowStarts) - 1):
+                start = rowStarts[row]; end = rowStarts[row + 1]
+                rowWeights = weights[start:end]
+                hourlyValues = [sum(map(operator.mul, rowWeights, skyValues)) for skyValues in izip(*[patchValues[patch] for patch in patches[start:end]])]
+                if not hourlyValues: hourlyValues = [0.0] * len(litHours)
+                if expand: hourlyValues = list(expand(hourlyValues + [0.0]))
+                blockValues.append(hourlyValues)
+            yield HOYs[blockStart:blockStart + blockSize], blockValues
+
+
+class OcclusionBVH(object):
+    """
+    Bounding volume hierarchy over the triangles of context geometry for any-hit ray queries.
+    
+    The hierarchy is built once and every ray only tests the triangles of the boxes it passes
+    through instead of the whole mesh. The engine only uses math and plain lists so it
+    doesn't need RhinoCommon to answer queries; use OcclusionBVH.fromMeshes to build it from
+    Rhino meshes or pass the triangles directly.
+    
+    Args:
+        triangles: A list of triangles. Each triangle is three (x, y, z) points.
+        maxLeafSize: Maximum number of triangles in each leaf box.
+    """
+    
+    def __init__(self, triangles, maxLeafSize = 4):
+        self.numOfTriangles = len(triangles)
+        centroids = [((a[0] + b[0] + c[0]) / 3, (a[1] + b[1] + c[1]) / 3, (a[2] + b[2] + c[2]) / 3) for a, b, c in triangles]
+        
+        # flat lists of the nodes. a leaf has a count > 0 and an inner node has its two
+        # children at child and child + 1
+        self.bounds = []; self.child = []; self.start = []; self.count = []
+        order = []
+        
+        def addNode():
+            self.bounds.extend((0, 0, 0, 0, 0, 0)); self.child.append(0); self.start.append(0); self.count.append(0)
+            return len(self.child) - 1
+        
+        if triangles:
+            stack = [(addNode(), range(self.numOfTriangles))]
+            while stack:
+                node, indices = stack.pop()
+                points = [point for index in indices for point in triangles[index]]
+                b = 6 * node
+                for axis in range(3):
+                    values = [point[axis] for point in points]
+                    self.bounds[b + axis] = min(values); self.bounds[b + 3 + axis] = max(values)
+                
+                if len(indices) <= maxLeafSize:
+                    self.start[node] = len(order); self.count[node] = len(indices)
+                    order.extend(indices)
+                    continue
+                
+                # split at the median centroid along the longest side of the centroid bounds
+                extents = [max(centroids[index][axis] for index in indices) - min(centroids[index][axis] for index in indices) for axis in range(3)]
+                axis = extents.index(max(extents))
+                indices = sorted(indices, key = lambda index: centroids[index][axis])
+                middle = len(indices) // 2
+                left = addNode(); addNode()
+                self.child[node] = left
+                stack.append((left, indices[:middle]))
+                stack.append((left + 1, indices[middle:]))
+        
+        # first vertex and two edges of the triangles in the order of the leaves
+        self.triangles = []
+        for index in order:
+            a, b, c = triangles[index]
+            self.triangles.extend((a[0], a[1], a[2], b[0] - a[0], b[1] - a[1], b[2] - a[2], c[0] - a[0], c[1] - a[1], c[2] - a[2]))
+    
+    @classmethod
+    def fromMeshes(cls, meshes, maxLeafSize = 4):
+        """Build the hierarchy from Rhino meshes. Quad faces are split into two triangles."""
+        triangles = []
+        for mesh in meshes:
+            if mesh is None: continue
+            vertices = [(vertex.X, vertex.Y, vertex.Z) for vertex in mesh.Vertices]
+            for face in mesh.Faces:
+                triangles.append((vertices[face.A], vertices[face.B], vertices[face.C]))
+                if face.IsQuad: triangles.append((vertices[face.A], vertices[face.C], vertices[face.D]))
+        return cls(triangles, maxLeafSize)
+    
+    def isOccluded(self, point, vector, maxDistance = None):
+        """Check if a ray from point along vector hits any triangle.
+        
+        Args:
+            point, vector: Origin and direction of the ray. Any objects with X, Y and Z.
+            maxDistance: Only hits closer than this (in lengths of vector) count. The default
+                is no limit the same as Intersection.MeshRay.
+        """
+        return self.rayHits(point.X, point.Y, point.Z, vector.X, vector.Y, vector.Z,
+                            1e300 if maxDistance is None else maxDistance)
+    
+    def isSegmentOccluded(self, startPoint, endPoint):
+        """Check if the line between the points hits any triangle the same as Intersection.MeshLine."""
+        return self.rayHits(startPoint.X, startPoint.Y, startPoint.Z, endPoint.X - startPoint.X,
+                            endPoint.Y - startPoint.Y, endPoint.Z - startPoint.Z, 1.0)
+    
+    def occludedVectors(self, point, vectors):
+        """Check a batch of rays from the same point. Returns a list of True/False."""
+        rayHits = self.rayHits
+        x, y, z = point.X, point.Y, point.Z
+        return [rayHits(x, y, z, vector.X, vector.Y, vector.Z, 1e300) for vector in vectors]
+    
+    def rayHits(self, ox, oy, oz, dx, dy, dz, tMax):
+        if not self.numOfTriangles: return False
+        bounds = self.bounds; child = self.child; start = self.start; count = self.count
+        triangles = self.triangles
+        # a large number instead of infinity keeps 0 * inverse away from nan
+        ix = 1 / dx if dx else 1e300; iy = 1 / dy if dy else 1e300; iz = 1 / dz if dz else 1e300
+        stack = [0]
+        pop = stack.pop; push = stack.append
+        while stack:
+            node = pop()
+            b = 6 * node
+            t1 = (bounds[b] - ox) * ix; t2 = (bounds[b + 3] - ox) * ix
+            if t1 > t2: t1, t2 = t2, t1
+            near = t1; far = t2
+            t1 = (bounds[b + 1] - oy) * iy; t2 = (bounds[b + 4] - oy) * iy
+            if t1 > t2: t1, t2 = t2, t1
+            if t1 > near: near = t1
+            if t2 < far: far = t2
+            t1 = (bounds[b + 2] - oz) * iz; t2 = (bounds[b + 5] - oz) * iz
+            if t1 > t2: t1, t2 = t2, t1
+            if t1 > near: near = t1
+            if t2 < far: far = t2
+            if far < near or far < 0 or near > tMax: continue
+            
+            numOfTriangles = count[node]
+            if not numOfTriangles:
+                push(child[node]); push(child[node] + 1)
+                continue
+            
+            # Moller-Trumbore test of the triangles of the leaf
+            k = 9 * start[node]
+            for k in xrange(k, k + 9 * numOfTriangles, 9):
+                e1x, e1y, e1z, e2x, e2y, e2z = triangles[k + 3:k + 9]
+                px = dy * e2z - dz * e2y; py = dz * e2x - dx * e2z; pz = dx * e2y - dy * e2x
+                det = e1x * px + e1y * py + e1z * pz
+                if -1e-14 < det < 1e-14: continue
+                invDet = 1 / det
+                tx = ox - triangles[k]; ty = oy - triangles[k + 1]; tz = oz - triangles[k + 2]
+                u = (tx * px + ty * py + tz * pz) * invDet
+                if u < 0 or u > 1: continue
+                qx = ty * e1z - tz * e1y; qy = tz * e1x - tx * e1z; qz = tx * e1y - ty * e1x
+                v = (dx * qx + dy * qy + dz * qz) * invDet
+                if v < 0 or u + v > 1: continue
+                t = (e2x * qx + e2y * qy + e2z * qz) * invDet
+                if 0 <= t <= tMax: return True
+        return False
+    
+    @staticmethod
+    def rayPackets(origins, packetSize):
+        """Group the indices of the origins into packets of nearby points in Morton order."""
+        if not origins: return []
+        mins = [min(origin[axis] for origin in origins) for axis in range(3)]
+        size = max(max(origin[axis] for origin in origins) - mins[axis] for axis in range(3))
+        scale = 1023 / size if size else 0
+        
+        def mortonCode(index):
+            x, y, z = [int((origins[index][axis] - mins[axis]) * scale) for axis in range(3)]
+            code = 0
+            for bit in range(10):
+                code |= ((x >> bit) & 1) << (3 * bit) | ((y >> bit) & 1) << (3 * bit + 1) | ((z >> bit) & 1) << (3 * bit + 2)
+            return code
+        
+        order = sorted(range(len(origins)), key = mortonCode)
+        return [order[i:i + packetSize] for i in xrange(0, len(order), packetSize)]
+    
+    def visibilityMatrix(self, points, vectors, normals = None, packetSize = 64, parallel = False):
+        """Check the rays from every point along every vector in one call.
+        
+        Nearby points are traced together as a packet for each direction so the box tests share
+        the inverse direction and each triangle's direction terms are calculated once for the
+        whole packet instead of once for each ray.
+        
+        Args:
+            points: Origins of the rays. Any objects with X, Y and Z.
+            vectors: Directions of the rays. Any objects with X, Y and Z.
+            normals: Optional normal of each point. Rays that face away from the normal
+                aren't traced and are reported as not visible.
+            packetSize: Number of points in each packet.
+            parallel: Trace the packets in parallel.
+        Returns:
+            A VisibilityMatrix with a row for each point and a column for each vector.
+        """
+        matrix = VisibilityMatrix(len(points), len(vectors))
+        origins = [(point.X, point.Y, point.Z) for point in points]
+        directions = [(vector.X, vector.Y, vector.Z) for vector in vectors]
+        if normals: normals = [(normal.X, normal.Y, normal.Z) for normal in normals]
+        packets = self.rayPackets(origins, packetSize)
+        
+        def tracePacket(packetCount):
+            self.tracePacket([origins[row] for row in packets[packetCount]],
+                             directions, normals and [normals[row] for row in packets[packetCount]],
+                             packets[packetCount], matrix)
+        
+        if parallel: tasks.Parallel.ForEach(range(len(packets)), tracePacket)
+        else:
+            for packetCount in range(len(packets)): tracePacket(packetCount)
+        return matrix
+    
+    def tracePacket(self, origins, directions, normals, rows, matrix):
+        """Trace one packet of points along all the directions and set the rows of the matrix."""
+        numOfRays = len(origins)
+        bounds = self.bounds; child = self.child; start = self.start; count = self.count
+        triangles = self.triangles
+        ox = [origin[0] for origin in origins]; oy = [origin[1] for origin in origins]; oz = [origin[2] for origin in origins]
+        # the triangle tests are made relative to the center of the packet to keep the precision
+        # of models that are far from the origin
+        cx = sum(ox) / numOfRays; cy = sum(oy) / numOfRays; cz = sum(oz) / numOfRays
+        lx = [x - cx for x in ox]; ly = [y - cy for y in oy]; lz = [z - cz for z in oz]
+        # a box is missed by the whole packet if the ray from the middle of the packet misses
+        # the box grown by the half size of the packet
+        bx = (min(ox) + max(ox)) / 2; by = (min(oy) + max(oy)) / 2; bz = (min(oz) + max(oz)) / 2
+        hx = max(ox) - bx; hy = max(oy) - by; hz = max(oz) - bz
+        packetSpan = 2 * (hx + hy + hz)
+        if normals: normalLengths = [math.sqrt(nx * nx + ny * ny + nz * nz) for nx, ny, nz in normals]
+        
+        for column, (dx, dy, dz) in enumerate(directions):
+            if normals:
+                tolerance = -1e-6 * math.sqrt(dx * dx + dy * dy + dz * dz)
+                facing = [k for k in xrange(numOfRays) if normals[k][0] * dx + normals[k][1] * dy + normals[k][2] * dz > tolerance * normalLengths[k]]
+            else: facing = range(numOfRays)
+            
+            hit = [False] * numOfRays
+            numOfOpenRays = len(facing)
+            if self.numOfTriangles: stack = [(0, facing)]
+            else: stack = []
+            ix = 1 / dx if dx else 1e300; iy = 1 / dy if dy else 1e300; iz = 1 / dz if dz else 1e300
+            while stack and numOfOpenRays:
+                node, rays = stack.pop()
+                b = 6 * node
+                x0, y0, z0, x1, y1, z1 = bounds[b:b + 6]
+                t1 = (x0 - hx - bx) * ix; t2 = (x1 + hx - bx) * ix
+                if t1 > t2: t1, t2 = t2, t1
+                near = t1; far = t2
+                t1 = (y0 - hy - by) * iy; t2 = (y1 + hy - by) * iy
+                if t1 > t2: t1, t2 = t2, t1
+                if t1 > near: near = t1
+                if t2 < far: far = t2
+                t1 = (z0 - hz - bz) * iz; t2 = (z1 + hz - bz) * iz
+                if t1 > t2: t1, t2 = t2, t1
+                if t1 > near: near = t1
+                if t2 < far: far = t2
+                if far < near or far < 0: continue
+                
+                # test the rays one by one in the leaves and in the boxes smaller than the packet
+                numOfTriangles = count[node]
+                if not numOfTriangles and x1 - x0 + y1 - y0 + z1 - z0 > packetSpan:
+                    stack.append((child[node], rays)); stack.append((child[node] + 1, rays))
+                    continue
+                
+                passing = []
+                for k in rays:
+                    if hit[k]: continue
+                    t1 = (x0 - ox[k]) * ix; t2 = (x1 - ox[k]) * ix
+                    if t1 > t2: t1, t2 = t2, t1
+                    near = t1; far = t2
+                    t1 = (y0 - oy[k]) * iy; t2 = (y1 - oy[k]) * iy
+                    if t1 > t2: t1, t2 = t2, t1
+                    if t1 > near: near = t1
+                    if t2 < far: far = t2
+                    t1 = (z0 - oz[k]) * iz; t2 = (z1 - oz[k]) * iz
+                    if t1 > t2: t1, t2 = t2, t1
+                    if t1 > near: near = t1
+                    if t2 < far: far = t2
+                    if far >= near and far >= 0: passing.append(k)
+                if not passing: continue
+                
+                if not numOfTriangles:
+                    stack.append((child[node], passing)); stack.append((child[node] + 1, passing))
+                    continue
+                
+                # Moller-Trumbore with the terms of the triangle and the direction shared by the packet
+                k = 9 * start[node]
+                for k in xrange(k, k + 9 * numOfTriangles, 9):
+                    e1x, e1y, e1z, e2x, e2y, e2z = triangles[k + 3:k + 9]
+                    px = dy * e2z - dz * e2y; py = dz * e2x - dx * e2z; pz = dx * e2y - dy * e2x
+                    det = e1x * px + e1y * py + e1z * pz
+                    if -1e-14 < det < 1e-14: continue
+                    invDet = 1 / det
+                    sx = e1y * dz - e1z * dy; sy = e1z * dx - e1x * dz; sz = e1x * dy - e1y * dx
+                    nx = e1y * e2z - e1z * e2y; ny = e1z * e2x - e1x * e2z; nz = e1x * e2y - e1y * e2x
+                    wx = triangles[k] - cx; wy = triangles[k + 1] - cy; wz = triangles[k + 2] - cz
+                    uOffset = wx * px + wy * py + wz * pz
+                    vOffset = wx * sx + wy * sy + wz * sz
+                    tOffset = wx * nx + wy * ny + wz * nz
+                    for ray in passing:
+                        if hit[ray]: continue
+                        x = lx[ray]; y = ly[ray]; z = lz[ray]
+                        u = (x * px + y * py + z * pz - uOffset) * invDet
+                        if u < 0 or u > 1: continue
+                        v = (x * sx + y * sy + z * sz - vOffset) * invDet
+                        if v < 0 or u + v > 1: continue
+                        if (x * nx + y * ny + z * nz - tOffset) * invDet >= 0:
+                            hit[ray] = True
+                            numOfOpenRays -= 1
+            
+            for k in facing:
+                if not hit[k]: matrix.set(rows[k], column)
+
+
+class ShadowMap(object):
+    """
+    Depth map of the triangles of an OcclusionBVH seen from the sun for a set of test points.
+    
+    The map looks along the sun vector and its pixels hold the test points that fall in them.
+    Each triangle is rasterized over the pixels under its projection and its depth is calculated
+    at the test points of those pixels, so a point is shaded by the same triangles that would
+    block the ray to the sun. The size of the pixels only changes how many points are checked
+    against each triangle.
+    
+    Args:
+        occluder: An OcclusionBVH of the geometry that casts the shadows.
+        vector: The sun vector. Any object with X, Y and Z.
+        points: Test points. Any objects with X, Y and Z.
+        pixelSize: Size of the pixels in model units. The default is about one point per pixel.
+        normals: Optional normal of each point. Points that face away from the sun are shaded.
+    """
+    
+    def __init__(self, occluder, vector, points, pixelSize = None, normals = None):
+        self.occluder = occluder
+        self.numOfPoints = len(points)
+        length = math.sqrt(vector.X * vector.X + vector.Y * vector.Y + vector.Z * vector.Z)
+        sx = vector.X / length; sy = vector.Y / length; sz = vector.Z / length
+        # two axes across the sun vector for the map and the sun vector itself for the depth
+        horizontal = math.sqrt(sx * sx + sy * sy)
+        if horizontal < 1e-9: ux, uy, uz = 1, 0, 0
+        else: ux, uy, uz = sy / horizontal, -sx / horizontal, 0
+        vx = sy * uz - sz * uy; vy = sz * ux - sx * uz; vz = sx * uy - sy * ux
+        self.axes = (ux, uy, uz), (vx, vy, vz), (sx, sy, sz)
+        
+        self.shaded = [False] * self.numOfPoints
+        if normals:
+            for index, normal in enumerate(normals):
+                tolerance = -1e-6 * math.sqrt(normal.X * normal.X + normal.Y * normal.Y + normal.Z * normal.Z)
+                if normal.X * sx + normal.Y * sy + normal.Z * sz <= tolerance: self.shaded[index] = True
+        
+        # the map is calculated relative to the middle of the points to keep the precision of
+        # models that are far from the origin
+        numOfPoints = max(1, self.numOfPoints)
+        self.center = cx, cy, cz = (sum(point.X for point in points) / numOfPoints,
+                                    sum(point.Y for point in points) / numOfPoints,
+                                    sum(point.Z for point in points) / numOfPoints)
+        coordinates = [(point.X - cx, point.Y - cy, point.Z - cz) for point in points]
+        self.u = [x * ux + y * uy + z * uz for x, y, z in coordinates]
+        self.v = [x * vx + y * vy + z * vz for x, y, z in coordinates]
+        self.depth = [x * sx + y * sy + z * sz for x, y, z in coordinates]
+        
+        indices = [index for index in xrange(self.numOfPoints) if not self.shaded[index]]
+        self.extents = None
+        if indices:
+            u = [self.u[index] for index in indices]; v = [self.v[index] for index in indices]
+            self.extents = min(u), max(u), min(v), max(v), min(self.depth[index] for index in indices)
+            if not pixelSize:
+                area = (self.extents[1] - self.extents[0]) * (self.extents[3] - self.extents[2])
+                pixelSize = math.sqrt(area / len(indices)) or 1
+        self.pixelSize = pixelSize
+        
+        # each row of pixels keeps its points sorted along the row
+        self.rows = {}
+        for index in sorted(indices, key = self.u.__getitem__):
+            row = int(math.floor(self.v[index] / pixelSize))
+            if row not in self.rows: self.rows[row] = ([], [])
+            self.rows[row][0].append(self.u[index]); self.rows[row][1].append(index)
+    
+    def render(self):
+        """Rasterize the triangles and return the list of shaded True/False for the points."""
+        if self.extents is None: return self.shaded
+        occluder = self.occluder
+        bounds = occluder.bounds; child = occluder.child; start = occluder.start; count = occluder.count
+        triangles = occluder.triangles
+        (ux, uy, uz), (vx, vy, vz), (sx, sy, sz) = self.axes
+        aux = abs(ux); auy = abs(uy); auz = abs(uz); avx = abs(vx); avy = abs(vy); avz = abs(vz)
+        asx = abs(sx); asy = abs(sy); asz = abs(sz)
+        cx, cy, cz = self.center
+        minU, maxU, minV, maxV, minDepth = self.extents
+        pointU = self.u; pointV = self.v; pointDepth = self.depth
+        shaded = self.shaded; rows = self.rows; pixelSize = self.pixelSize
+        floor = math.floor; bisect_left = bisect.bisect_left; bisect_right = bisect.bisect_right
+        
+        stack = [0] if occluder.numOfTriangles else []
+        while stack:
+            node = stack.pop()
+            b = 6 * node
+            x0, y0, z0, x1, y1, z1 = bounds[b:b + 6]
+            # skip the boxes outside the points and the boxes behind all of them
+            hx = (x1 - x0) / 2; hy = (y1 - y0) / 2; hz = (z1 - z0) / 2
+            x = x0 + hx - cx; y = y0 + hy - cy; z = z0 + hz - cz
+            middle = x * ux + y * uy + z * uz; half = hx * aux + hy * auy + hz * auz
+            if middle + half < minU or middle - half > maxU: continue
+            middle = x * vx + y * vy + z * vz; half = hx * avx + hy * avy + hz * avz
+            if middle + half < minV or middle - half > maxV: continue
+            if x * sx + y * sy + z * sz + hx * asx + hy * asy + hz * asz < minDepth: continue
+            
+            if not count[node]:
+                stack.append(child[node]); stack.append(child[node] + 1)
+                continue
+            
+            k = 9 * start[node]
+            for k in xrange(k, k + 9 * count[node], 9):
+                ax = triangles[k] - cx; ay = triangles[k + 1] - cy; az = triangles[k + 2] - cz
+                e1x, e1y, e1z, e2x, e2y, e2z = triangles[k + 3:k + 9]
+                au = ax * ux + ay * uy + az * uz; av = ax * vx + ay * vy + az * vz; ad = ax * sx + ay * sy + az * sz
+                e1u = e1x * ux + e1y * uy + e1z * uz; e1v = e1x * vx + e1y * vy + e1z * vz; e1d = e1x * sx + e1y * sy + e1z * sz
+                e2u = e2x * ux + e2y * uy + e2z * uz; e2v = e2x * vx + e2y * vy + e2z * vz; e2d = e2x * sx + e2y * sy + e2z * sz
+                if max(ad, ad + e1d, ad + e2d) < minDepth: continue
+                # triangles that are seen edge on don't cast shadows the same as in the ray test
+                area = e1u * e2v - e1v * e2u
+                if -1e-14 < area < 1e-14: continue
+                invArea = 1 / area
+                
+                rowEnd = int(floor(max(av, av + e1v, av + e2v) / pixelSize))
+                low = min(au, au + e1u, au + e2u); high = max(au, au + e1u, au + e2u)
+                for row in xrange(int(floor(min(av, av + e1v, av + e2v) / pixelSize)), rowEnd + 1):
+                    if row not in rows: continue
+                    rowU, rowPoints = rows[row]
+                    for index in rowPoints[bisect_left(rowU, low):bisect_right(rowU, high)]:
+                        if shaded[index]: continue
+                        du = pointU[index] - au; dv = pointV[index] - av
+                        w1 = (du * e2v - dv * e2u) * invArea
+                        if w1 < 0 or w1 > 1: continue
+                        w2 = (e1u * dv - e1v * du) * invArea
+                        if w2 < 0 or w1 + w2 > 1: continue
+                        if ad + w1 * e1d + w2 * e2d >= pointDepth[index]: shaded[index] = True
+        
+        return shaded
+
+
+class ShadowMap(object):
+    """
+    Depth map of the triangles of an OcclusionBVH seen from the sun for a set of test points.
+    
+    The map looks along the sun vector and its pixels hold the test points that fall in them.
+    Each triangle is rasterized over the pixels under its projection and its depth is calculated
+    at the test points of those pixels, so a point is shaded by the same triangles that would
+    block the ray to the sun. The size of the pixels only changes how many points are checked
+    against each triangle.
+    
+    Args:
+        occluder: An OcclusionBVH of the geometry that casts the shadows.
+        vector: The sun vector. Any object with X, Y and Z.
+        points: Test points. Any objects with X, Y and Z.
+        pixelSize: Size of the pixels in model units. The default is about one point per pixel.
+        normals: Optional normal of each point. Points that face away from the sun are shaded.
+    """
+    
+    def __init__(self, occluder, vector, points, pixelSize = None, normals = None):
+        self.occluder = occluder
+        self.numOfPoints = len(points)
+        length = math.sqrt(vector.X * vector.X + vector.Y * vector.Y + vector.Z * vector.Z)
+        sx = vector.X / length; sy = vector.Y / length; sz = vector.Z / length
+        # two axes across the sun vector for the map and the sun vector itself for the depth
+        horizontal = math.sqrt(sx * sx + sy * sy)
+        if horizontal < 1e-9: ux, uy, uz = 1, 0, 0
+        else: ux, uy, uz = sy / horizontal, -sx / horizontal, 0
+        vx = sy * uz - sz * uy; vy = sz * ux - sx * uz; vz = sx * uy - sy * ux
+        self.axes = (ux, uy, uz), (vx, vy, vz), (sx, sy, sz)
+        
+        self.shaded = [False] * self.numOfPoints
+        if normals:
+            for index, normal in enumerate(normals):
+                if normal.X * sx + normal.Y * sy + normal.Z * sz <= -1e-6 * normal.Length: self.shaded[index] = True
+        
+        # the map is calculated relative to the middle of the points to keep the precision of
+        # models that are far from the origin
+        indices = [index for index in xrange(self.numOfPoints) if not self.shaded[index]]
+        self.center = cx, cy, cz = (sum(point.X for point in points) / max(1, self.numOfPoints),
+                                    sum(point.Y for point in points) / max(1, self.numOfPoints),
+                                    sum(point.Z for point in points) / max(1, self.numOfPoints))
+        self.u = [0] * self.numOfPoints; self.v = [0] * self.numOfPoints; self.depth = [0] * self.numOfPoints
+        for index in indices:
+            x = points[index].X - cx; y = points[index].Y - cy; z = points[index].Z - cz
+            self.u[index] = x * ux + y * uy + z * uz
+            self.v[index] = x * vx + y * vy + z * vz
+            self.depth[index] = x * sx + y * sy + z * sz
+        
+        if indices:
+            self.extents = (min(self.u[index] for index in indices), max(self.u[index] for index in indices),
+                            min(self.v[index] for index in indices), max(self.v[index] for index in indices),
+                            min(self.depth[index] for index in indices))
+        else: self.extents = None
+        if not pixelSize and indices:
+            area = (self.extents[1] - self.extents[0]) * (self.extents[3] - self.extents[2])
+            pixelSize = math.sqrt(area / len(indices)) or 1
+        self.pixelSize = pixelSize
+        
+        # each row of pixels keeps its points sorted along the row
+        self.rows = {}
+        for index in sorted(indices, key = self.u.__getitem__):
+            row = int(math.floor(self.v[index] / pixelSize))
+            if row not in self.rows: self.rows[row] = ([], [])
+            self.rows[row][0].append(self.u[index]); self.rows[row][1].append(index)
+    
+    def render(self):
+        """Rasterize the triangles and return the list of shaded True/False for the points."""
+        if self.extents is None: return self.shaded
+        occluder = self.occluder
+        bounds = occluder.bounds; child = occluder.child; start = occluder.start; count = occluder.count
+        triangles = occluder.triangles
+        (ux, uy, uz), (vx, vy, vz), (sx, sy, sz) = self.axes
+        aux = abs(ux); auy = abs(uy); auz = abs(uz); avx = abs(vx); avy = abs(vy); avz = abs(vz)
+        asx = abs(sx); asy = abs(sy); asz = abs(sz)
+        cx, cy, cz = self.center
+        minU, maxU, minV, maxV, minDepth = self.extents
+        pointU = self.u; pointV = self.v; pointDepth = self.depth
+        shaded = self.shaded; rows = self.rows; pixelSize = self.pixelSize
+        floor = math.floor; bisect_left = bisect.bisect_left; bisect_right = bisect.bisect_right
+        
+        stack = [0] if occluder.numOfTriangles else []
+        while stack:
+            node = stack.pop()
+            b = 6 * node
+            x0, y0, z0, x1, y1, z1 = bounds[b:b + 6]
+            # skip the boxes outside the points and the boxes behind all of them
+            hx = (x1 - x0) / 2; hy = (y1 - y0) / 2; hz = (z1 - z0) / 2
+            x = x0 + hx - cx; y = y0 + hy - cy; z = z0 + hz - cz
+            middle = x * ux + y * uy + z * uz; half = hx * aux + hy * auy + hz * auz
+            if middle + half < minU or middle - half > maxU: continue
+            middle = x * vx + y * vy + z * vz; half = hx * avx + hy * avy + hz * avz
+            if middle + half < minV or middle - half > maxV: continue
+            if x * sx + y * sy + z * sz + hx * asx + hy * asy + hz * asz < minDepth: continue
+            
+            if not count[node]:
+                stack.append(child[node]); stack.append(child[node] + 1)
+                continue
+            
+            k = 9 * start[node]
+            for k in xrange(k, k + 9 * count[node], 9):
+                ax = triangles[k] - cx; ay = triangles[k + 1] - cy; az = triangles[k + 2] - cz
+                e1x, e1y, e1z, e2x, e2y, e2z = triangles[k + 3:k + 9]
+                au = ax * ux + ay * uy + az * uz; av = ax * vx + ay * vy + az * vz; ad = ax * sx + ay * sy + az * sz
+                e1u = e1x * ux + e1y * uy + e1z * uz; e1v = e1x * vx + e1y * vy + e1z * vz; e1d = e1x * sx + e1y * sy + e1z * sz
+                e2u = e2x * ux + e2y * uy + e2z * uz; e2v = e2x * vx + e2y * vy + e2z * vz; e2d = e2x * sx + e2y * sy + e2z * sz
+                if max(ad, ad + e1d, ad + e2d) < minDepth: continue
+                # triangles that are seen edge on don't cast shadows the same as in the ray test
+                area = e1u * e2v - e1v * e2u
+                if -1e-14 < area < 1e-14: continue
+                invArea = 1 / area
+                
+                rowEnd = int(floor(max(av, av + e1v, av + e2v) / pixelSize))
+                low = min(au, au + e1u, au + e2u); high = max(au, au + e1u, au + e2u)
+                for row in xrange(int(floor(min(av, av + e1v, av + e2v) / pixelSize)), rowEnd + 1):
+                    if row not in rows: continue
+                    rowU, rowPoints = rows[row]
+                    for index in rowPoints[bisect_left(rowU, low):bisect_right(rowU, high)]:
+                        if shaded[index]: continue
+                        du = pointU[index] - au; dv = pointV[index] - av
+                        w1 = (du * e2v - dv * e2u) * invArea
+                        if w1 < 0 or w1 > 1: continue
+                        w2 = (e1u * dv - e1v * du) * invArea
+                        if w2 < 0 or w1 + w2 > 1: continue
+                        if ad + w1 * e1d + w2 * e2d >= pointDepth[index]: shaded[index] = True
+        
+        return shaded
+
+
+class MeshRayOcclusion(object):
+    """The same queries as OcclusionBVH with RhinoCommon's mesh intersections."""
+    
+    def __init__(self, mesh):
+        self.mesh = mesh
+    
+    def isOccluded(self, point, vector, maxDistance = None):
+        return rc.Geometry.Intersect.Intersection.MeshRay(self.mesh, rc.Geometry.Ray3d(point, vector)) >= 0.0
+    
+    def isSegmentOccluded(self, startPoint, endPoint):
+        return rc.Geometry.Intersect.Intersection.MeshLine(self.mesh, rc.Geometry.Line(startPoint, endPoint))[1] != None
+    
+    def occludedVectors(self, point, vectors):
+        return [self.isOccluded(point, vector) for vector in vectors]
+    
+    def visibilityMatrix(self, points, vectors, normals = None, packetSize = 64, parallel = False):
+        matrix = VisibilityMatrix(len(points), len(vectors))
+        
+        def traceRow(row):
+            for column, vector in enumerate(vectors):
+                if normals and normals[row].X * vector.X + normals[row].Y * vector.Y + normals[row].Z * vector.Z <= 0: continue
+                if not self.isOccluded(points[row], vector): matrix.set(row, column)
+        
+        if parallel: tasks.Parallel.ForEach(range(len(points)), traceRow)
+        else:
+            for row in range(len(points)): traceRow(row)
+        return matrix
+
+
 class RunAnalysisInsideGH(object):
-    #
+    # default backend of the ray intersections of the calculators. "RhinoCommon" intersects each
+    # ray with the whole mesh and "BVH" builds an OcclusionBVH of each mesh once for all the rays.
+    # parallel_sunlightHoursCalculator also takes backend = "ShadowMap" to render a ShadowMap
+    # for each sun vector.
+    occlusionBackends = ("RhinoCommon", "BVH")
+    occlusionBackend = "RhinoCommon"
+    # number of test points that the shadow map backend of the sunlight hours study also ray
+    # traces to report how far its results are from the ray test
+    shadowMapCheckPoints = 20
+    def occluder(self, mesh, backend = None):
+        """Object that answers the ray queries of a mesh with the selected backend."""
+        backend = backend or self.occlusionBackend
+        if backend not in self.occlusionBackends:
+            raise ValueError("%s is not a valid occlusion backend. Use %s." % (backend, ' or '.join(self.occlusionBackends)))
+        if mesh == None: return None
+        if backend == "BVH": return OcclusionBVH.fromMeshes([mesh])
+        return MeshRayOcclusion(mesh)
+    
+    def visibilityTest(self, occluder, points, vectors, normals = None, parallel = False):
+        """Function of (point index, vector index) that is True if the ray isn't blocked.
+        
+        The BVH backend traces all the rays at once as packets into a VisibilityMatrix. The
+        RhinoCommon backend is asked for each ray when it's needed so the calculators don't
+        intersect rays that they would skip.
+        """
+        if occluder == None: return lambda i, j: True
+        if isinstance(occluder, OcclusionBVH):
+            return occluder.visibilityMatrix(points, vectors, normals, parallel = parallel).get
+        return lambda i, j: not occluder.isOccluded(points[i], vectors[j])
+    
+    def shadowMapVisibility(self, occluder, points, vectors, normals = None, pixelSize = None, parallel = False):
+        """VisibilityMatrix of the points and the sun vectors from one ShadowMap for each vector.
+        
+        A few of the points are also ray traced and the difference is printed as the tolerance
+        of the result.
+        """
+        matrix = VisibilityMatrix(len(points), len(vectors))
+        shadows = [None] * len(vectors)
+        
+        def renderShadows(column):
+            shadows[column] = ShadowMap(occluder, vectors[column], points, pixelSize, normals).render()
+        
+        if parallel: tasks.Parallel.ForEach(range(len(vectors)), renderShadows)
+        else:
+            for column in range(len(vectors)): renderShadows(column)
+        # the rows share bytes between the columns so the matrix is filled after the maps
+        for column, shaded in enumerate(shadows):
+            for row in xrange(len(points)):
+                if not shaded[row]: matrix.set(row, column)
+        
+        if self.shadowMapCheckPoints and len(points):
+            rows = sorted(set(row * len(points) // self.shadowMapCheckPoints for row in range(self.shadowMapCheckPoints)))
+            reference = occluder.visibilityMatrix([points[row] for row in rows], vectors,
+                                                  normals and [normals[row] for row in rows])
+            differences = [sum(matrix.get(row, column) != reference.get(count, column) for column in xrange(len(vectors)))
+                           for count, row in enumerate(rows)]
+            print "Shadow map tolerance: " + `sum(differences)` + " of " + `len(rows) * len(vectors)` + \
+                  " rays of " + `len(rows)` + " test points differ from the ray test (at most " + `max(differences)` + " for a point)."
+        return matrix
+    
     def calRadRoseRes(self, tiltedRoseVectors, TregenzaPatchesNormalVectors, genCumSkyResult, testPoint = rc.Geometry.Point3d.Origin, bldgMesh = [], groundRef = 0):
         radResult = []; sunUpHours = 1
         for vec in tiltedRoseVectors:
@@ -2199,12 +5486,11 @@ class RunAnalysisInsideGH(object):
     def parallel_radCalculator(self, testPts, testVec, meshSrfArea, bldgMesh,
                                 contextMesh, parallel, cumSkyResult, TregenzaPatches,
                                 conversionFac, contextHeight = 2200000000000000,
-                                northVector = rc.Geometry.Vector3d.YAxis, transmittance=None):
+                                northVector = rc.Geometry.Vector3d.YAxis, transmittance=None, backend = None):
         # preparing bulk lists
-        # create an empty dictionary for each point
-        intersectionMtx = {}
-        for pp in range(len(testPts)): intersectionMtx[pp] = {}
-            
+        # the visible patches and their weights for each point
+        intersectionRows = [None] * len(testPts)
+        
         radiation = [0] * len(testPts)
         groundRadiation = [0] * len(testPts)
         radResult = [0] * len(testPts)
@@ -2223,9 +5509,21 @@ class RunAnalysisInsideGH(object):
         if angle != 0: [vec.Rotate(angle, ZAxis) for vec in TregenzaVectors]
         PI = math.pi
         
+        # prepare the meshes for the ray queries once
+        bldgOccluder = self.occluder(bldgMesh, backend)
+        if contextMesh == None: contextOccluders = []
+        # There is only one context mesh and it is assumed to be opaque.
+        elif hasattr(contextMesh, 'Faces'): contextOccluders = [(self.occluder(contextMesh, backend), 0)]
+        # There are several context meshes and each has a different transmittance.
+        else: contextOccluders = [(self.occluder(contMesh, backend), transmittance[meshCount]) for meshCount, contMesh in enumerate(contextMesh)]
+        bldgVisible = self.visibilityTest(bldgOccluder, testPts, TregenzaVectors, testVec, parallel)
+        contextVisibility = [(self.visibilityTest(contextOccluder, testPts, TregenzaVectors, testVec, parallel), meshTransmittance)
+                             for contextOccluder, meshTransmittance in contextOccluders]
+        
         try:
             def srfRadCalculator(i):
                 patchNum = 0
+                visiblePatches = []; patchWeights = []
                 for patchVec in TregenzaVectors:
                     
                     # let the user cancel the process
@@ -2233,39 +5531,27 @@ class RunAnalysisInsideGH(object):
                     
                     vecAngle = rc.Geometry.Vector3d.VectorAngle(patchVec, testVec[i]) # calculate the angle between the surface and sky patch
                     
-                    intersectionMtx[i][patchNum] = {'isIntersect' : 0,
-                                                    'vecAngle' : vecAngle}
-                    
                     if vecAngle < (PI/2):
                         check = 1; # this is simply here becuse I can't trust the break!! Isn't it stupid?
-                        ray = rc.Geometry.Ray3d(testPts[i], patchVec) # generate the ray
                         
-                        if bldgMesh!=None:
-                            #for bldg in bldgMesh: # bldgMesh is all joined as one mesh
-                            if rc.Geometry.Intersect.Intersection.MeshRay(bldgMesh, ray) >= 0.0: check = 0;
+                        if bldgOccluder!=None:
+                            #bldgMesh is all joined as one mesh
+                            if not bldgVisible(i, patchNum): check = 0;
                         
-                        if check != 0 and contextMesh!=None: #and testPts[i].Z < contextHeight:
-                            try:
-                                # There is only one context mesh and it is assumed to be opaque.
-                                if rc.Geometry.Intersect.Intersection.MeshRay(contextMesh,ray) >= 0.0:
-                                    check = 0
-                            except:
-                                # There are several context meshes and eachhas a different transmittance.
-                                for meshCount, contMesh in enumerate(contextMesh):
-                                    if rc.Geometry.Intersect.Intersection.MeshRay(contMesh,ray) >= 0.0:
-                                        check = check*transmittance[meshCount]
+                        if check != 0: #and testPts[i].Z < contextHeight:
+                            for contextVisible, meshTransmittance in contextVisibility:
+                                if not contextVisible(i, patchNum):
+                                    check = check*meshTransmittance
                         
-                        if check == 1:
-                            radiation[i] = radiation[i] + (cumSkyResult[patchNum] * math.cos(vecAngle))
-                            intersectionMtx[i][patchNum] =  {'isIntersect' : 1, 'vecAngle' : vecAngle}
-                            groundRadiation[i] = 0
-                        elif check != 0:
-                            radiation[i] = radiation[i] + ((cumSkyResult[patchNum] * math.cos(vecAngle))*check)
-                            intersectionMtx[i][patchNum] =  {'isIntersect' : check, 'vecAngle' : vecAngle}
+                        if check != 0:
+                            weight = math.cos(vecAngle) * check
+                            radiation[i] = radiation[i] + (cumSkyResult[patchNum] * weight)
+                            visiblePatches.append(patchNum); patchWeights.append(weight)
                             groundRadiation[i] = 0
                     patchNum += 1
                 
                 radResult[i] = (groundRadiation[i] + radiation[i]) #/sunUpHours
+                intersectionRows[i] = (visiblePatches, patchWeights)
         
         except:
             print "The calculation is terminated by user!"
@@ -2289,10 +5575,12 @@ class RunAnalysisInsideGH(object):
         for r in range(len(testPts)):
             totalRadiation = totalRadiation + (radResult[r] * meshSrfArea[r] * (conversionFac * conversionFac))
         
+        intersectionMtx = IntersectionMatrix(len(TregenzaVectors), intersectionRows, testVec, TregenzaVectors)
+        
         return radResult, totalRadiation, intersectionMtx
     
     
-    def parallel_sunlightHoursCalculator(self, testPts, testVec, meshSrfArea, bldgMesh, contextMesh, parallel, sunVectors, conversionFac, northVector, timeStep = 1):
+    def parallel_sunlightHoursCalculator(self, testPts, testVec, meshSrfArea, bldgMesh, contextMesh, parallel, sunVectors, conversionFac, northVector, timeStep = 1, backend = None, gridSize = None):
         # preparing bulk lists
         sunlightHours = [0] * len(testPts)
         sunlightHoursResult = [0] * len(testPts)
@@ -2318,6 +5606,18 @@ class RunAnalysisInsideGH(object):
         sunVisibility = []
         for pt in testPts: sunVisibility.append(range(len(sunV)))
         
+        # prepare the meshes for the ray queries once
+        if backend == "ShadowMap":
+            # one shadow map of all the meshes for each sun vector with pixels of the grid size
+            bldgOccluder = OcclusionBVH.fromMeshes([bldgMesh, contextMesh])
+            contextOccluder = None
+            bldgVisible = self.shadowMapVisibility(bldgOccluder, testPts, sunV, testVec, gridSize, parallel).get
+        else:
+            bldgOccluder = self.occluder(bldgMesh, backend)
+            contextOccluder = self.occluder(contextMesh, backend)
+            bldgVisible = self.visibilityTest(bldgOccluder, testPts, sunV, testVec, parallel)
+        contextVisible = self.visibilityTest(contextOccluder, testPts, sunV, testVec, parallel)
+        
         try:
             def sunlightHoursCalculator(i):
                 for vectorCount, vector in enumerate(sunV):
@@ -2329,12 +5629,11 @@ class RunAnalysisInsideGH(object):
                     check = 0
                     if vecAngle < (PI/2):
                         check = 1; # this is simply here becuse I can't trust the break! Isn't it stupid?
-                        ray = rc.Geometry.Ray3d(testPts[i], vector) # generate the ray
                         
-                        if bldgMesh!=None:
-                            if rc.Geometry.Intersect.Intersection.MeshRay(bldgMesh, ray) >= 0.0: check = 0
-                        if check != 0 and contextMesh!=None:
-                            if rc.Geometry.Intersect.Intersection.MeshRay(contextMesh,ray) >= 0.0: check = 0
+                        if bldgOccluder!=None:
+                            if not bldgVisible(i, vectorCount): check = 0
+                        if check != 0 and contextOccluder!=None:
+                            if not contextVisible(i, vectorCount): check = 0
                         
                         if check != 0:
                             sunlightHours[i] += 1/timeStep
@@ -2370,7 +5669,7 @@ class RunAnalysisInsideGH(object):
         return sunlightHoursResult, totalSLH, sunVisibility
     
     
-    def parallel_viewCalculator(self, testPts, testVec, meshSrfArea, bldgMesh, contextMesh, parallel, viewPoints, viewPtsWeights, conversionFac, viewType, patchAreas, geoBlockView):
+    def parallel_viewCalculator(self, testPts, testVec, meshSrfArea, bldgMesh, contextMesh, parallel, viewPoints, viewPtsWeights, conversionFac, viewType, patchAreas, geoBlockView, backend = None):
         # preparing bulk lists for parallel process.
         view = [0] * len(testPts)
         viewResult = [0] * len(testPts)
@@ -2405,6 +5704,14 @@ class RunAnalysisInsideGH(object):
         #If the view type is spherical or connical, neglect it from the view analysis.
         if geoBlockView == False: bldgMesh = None
         
+        # prepare the meshes for the ray queries once
+        bldgOccluder = self.occluder(bldgMesh, backend)
+        contextOccluder = self.occluder(contextMesh, backend)
+        # the view vectors are shared by all the points. the view points need a segment to each point
+        if viewType != -1:
+            bldgVisible = self.visibilityTest(bldgOccluder, testPts, viewPoints, parallel = parallel)
+            contextVisible = self.visibilityTest(contextOccluder, testPts, viewPoints, parallel = parallel)
+        
         #Function for view by test points.
         try:
             def viewCalculatorPoint(i):
@@ -2417,12 +5724,11 @@ class RunAnalysisInsideGH(object):
                     vecAngle = rc.Geometry.Vector3d.VectorAngle(vector, testVec[i]) # calculate the angle between the surface and the vector
                     
                     check = 1; # this is simply here becuse I can't trust the break! Isn't it stupid?
-                    line = rc.Geometry.Line(testPts[i], viewPt)
                     
-                    if bldgMesh!=None:
-                        if rc.Geometry.Intersect.Intersection.MeshLine(bldgMesh, line)[1] != None: check = 0
-                    if check != 0 and contextMesh!=None:
-                        if rc.Geometry.Intersect.Intersection.MeshLine(contextMesh, line)[1] != None: check = 0
+                    if bldgOccluder!=None:
+                        if bldgOccluder.isSegmentOccluded(testPts[i], viewPt): check = 0
+                    if check != 0 and contextOccluder!=None:
+                        if contextOccluder.isSegmentOccluded(testPts[i], viewPt): check = 0
                     
                     if check != 0:
                         view[i] += ptImportance[ptCount]
@@ -2446,12 +5752,11 @@ class RunAnalysisInsideGH(object):
                     vecAngle = rc.Geometry.Vector3d.VectorAngle(viewVec, testVec[i]) # calculate the angle between the surface and the vector
                     
                     check = 1
-                    ray = rc.Geometry.Ray3d(testPts[i], viewVec)
                     
-                    if bldgMesh!=None:
-                        if rc.Geometry.Intersect.Intersection.MeshRay(bldgMesh, ray) != -1: check = 0
-                    if check != 0 and contextMesh!=None:
-                        if rc.Geometry.Intersect.Intersection.MeshRay(contextMesh, ray) != -1: check = 0
+                    if bldgOccluder!=None:
+                        if not bldgVisible(i, vecCount): check = 0
+                    if check != 0 and contextOccluder!=None:
+                        if not contextVisible(i, vecCount): check = 0
                     
                     if check != 0:
                         if viewType < 4: view[i] += vecImportance[vecCount]
@@ -6079,165 +9384,204 @@ class Photovoltaics(object):
         
         return correctedSrfAzimuthD, northDeg, validNorth, printMsg
     
+    # "NREL" for the NREL (Michalsky) algorithm or "Sunpath" for the NOAA formulas of the Sunpath class
+    sunPositionMethod = "NREL"
+    
     def NRELsunPosition(self, latitude, longitude, timeZone, year, month, day, hour):
         # sunZenith, sunAzimuth, sunAltitude angles
-        # based on Michalsky (1988), modified to calculate sun azimuth angles for locations south of the equator using the approach described in (Iqbal, 1983)
-        min = 30
-        
-        # leap year
-        if year%4 == 0:
-            k = 1
-        else:
-            k = 0
+        sunZenithDL, sunAzimuthDL, sunAltitudeDL = self.NRELsunPositions(latitude, longitude, timeZone, [year], [month], [day], [hour])
+        return sunZenithDL[0], sunAzimuthDL[0], sunAltitudeDL[0]
+    
+    def NRELsunPositions(self, latitude, longitude, timeZone, years, months, days, hours):
+        """Sun zenith, azimuth and altitude angles (degrees) for lists of dates in one pass.
         
+        Based on Michalsky (1988), modified to calculate sun azimuth angles for locations
+        south of the equator using the approach described in (Iqbal, 1983). The results are
+        the same as calling NRELsunPosition for each hour. The sun position is calculated for
+        the middle of each hour.
+        """
+        sin = math.sin; cos = math.cos; tan = math.tan; asin = math.asin; acos = math.acos; atan = math.atan
+        pi = math.pi
         numOfDays = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
-        jdoy = int(numOfDays[int(month)-1] + int(day))
-        
-        # julian day of year
-        if month > 2:
-            jdoy = jdoy + k
-        
-        # current decimal time of day in UTC
-        tutc = hour + min/60.0 - timeZone
-        
-        if tutc < 0:
-            tutc = tutc + 24
-            jdoy = jdoy - 1
-        elif tutc > 24:
-            tutc = tutc - 24
-            jdoy = jdoy + 1
-        
-        julian = 32916.5 + 365*(year-1949) + int((year-1949)/4) + jdoy + (tutc/24) - 51545
-        
-        mnlong = 280.46 + 0.9856474*julian  # in degrees
-        mnlong = mnlong - 360*int(mnlong/360)
-        
-        if (mnlong < 0):
-            mnlong = (mnlong+360)
-        
-        mnanom = (357.528 + 0.9856003*julian)
-        mnanom = mnanom - 360*int(mnanom/360)
-        
-        if (mnanom < 0):
-            mnanom = (mnanom+360)
-        mnanom = mnanom*(math.pi/180)  # in radians
-        
-        eclong = (mnlong + 1.915*math.sin(mnanom) + 0.02 * math.sin(2*mnanom))
-        eclong = eclong - 360*int(eclong/360)
-        
-        if (eclong < 0):
-            eclong = (eclong+360)
-        eclong = eclong*(math.pi/180)
-        
-        obleq = (math.pi/180)*(23.439 - 0.0000004*julian)
-        
-        if (math.cos(eclong) < 0):
-            ra = math.atan(((math.cos(obleq)*math.sin(eclong))/math.cos(eclong))) + math.pi
-        elif (math.cos(obleq)*math.sin(eclong) < 0):
-            ra = math.atan(((math.cos(obleq)*math.sin(eclong))/math.cos(eclong))) + 2*math.pi
-        else:
-            ra = math.atan(((math.cos(obleq)*math.sin(eclong))/math.cos(eclong)))
-        
-        beta = math.asin(math.sin(obleq)*math.sin(eclong))   # in radians
-        
-        
-        # perform check and adjustment for sunrise or sunset
-        sunrise_a = -math.tan((math.pi/180)*latitude)*math.tan(beta)
-        if sunrise_a >= 1:
-            sunrise_HAR = 0
-        elif sunrise_a <=-1:
-            sunrise_HAR = math.pi
-        else:
-            sunrise_HAR = math.acos(sunrise_a)
-        
-        sunrise_a = (1/15.0)*(mnlong - (180/math.pi)*ra)
-        if sunrise_a < -0.33:
-            sunrise_EOT = sunrise_a+24
-        elif sunrise_a > 0.33:
-            sunrise_EOT = sunrise_a-24
-        else:
-            sunrise_EOT = sunrise_a
-        
-        t_sunrise = 12 - (1/15.0)*(180/math.pi)*sunrise_HAR - (longitude/15 - timeZone) - sunrise_EOT
-        t_sunset = 12 + (1/15.0)*(180/math.pi)*sunrise_HAR - (longitude/15 - timeZone) - sunrise_EOT
-        
-        if int(t_sunrise) == hour:
-            min=(((t_sunrise - int(t_sunrise))*60)+60)/2
-            tutc = hour + min/60.0 - timeZone
-        elif int(t_sunset) == hour:
-            min=((t_sunset - int(t_sunset))*60)/2
+        latR = (pi/180)*latitude
+        sinLatR = sin(latR); cosLatR = cos(latR)
+        # values that only change with the year
+        yearDays = {}
+        
+        sunZenithDL = []; sunAzimuthDL = []; sunAltitudeDL = []
+        for year, month, day, hour in izip(years, months, days, hours):
+            min = 30
+            try:
+                k, yearDay = yearDays[year]
+            except KeyError:
+                # leap year
+                k = 1 if year%4 == 0 else 0
+                yearDay = 32916.5 + 365*(year-1949) + (year-1949)//4
+                yearDays[year] = k, yearDay
+            
+            # julian day of year
+            jdoy = int(numOfDays[int(month)-1] + int(day))
+            if month > 2:
+                jdoy = jdoy + k
+            
+            # current decimal time of day in UTC
             tutc = hour + min/60.0 - timeZone
+            if tutc < 0:
+                tutc = tutc + 24
+                jdoy = jdoy - 1
+            elif tutc > 24:
+                tutc = tutc - 24
+                jdoy = jdoy + 1
+            
+            julian = yearDay + jdoy + (tutc/24.0) - 51545
+            
+            mnlong = 280.46 + 0.9856474*julian  # in degrees
+            mnlong = mnlong - 360*int(mnlong/360.0)
+            if (mnlong < 0):
+                mnlong = (mnlong+360)
+            
+            mnanom = (357.528 + 0.9856003*julian)
+            mnanom = mnanom - 360*int(mnanom/360.0)
+            if (mnanom < 0):
+                mnanom = (mnanom+360)
+            mnanom = mnanom*(pi/180)  # in radians
+            
+            eclong = (mnlong + 1.915*sin(mnanom) + 0.02 * sin(2*mnanom))
+            eclong = eclong - 360*int(eclong/360.0)
+            if (eclong < 0):
+                eclong = (eclong+360)
+            eclong = eclong*(pi/180)
+            
+            obleq = (pi/180)*(23.439 - 0.0000004*julian)
+            
+            if (cos(eclong) < 0):
+                ra = atan(((cos(obleq)*sin(eclong))/cos(eclong))) + pi
+            elif (cos(obleq)*sin(eclong) < 0):
+                ra = atan(((cos(obleq)*sin(eclong))/cos(eclong))) + 2*pi
+            else:
+                ra = atan(((cos(obleq)*sin(eclong))/cos(eclong)))
+            
+            beta = asin(sin(obleq)*sin(eclong))   # in radians
+            
+            # perform check and adjustment for sunrise or sunset
+            sunrise_a = -tan(latR)*tan(beta)
+            if sunrise_a >= 1:
+                sunrise_HAR = 0
+            elif sunrise_a <=-1:
+                sunrise_HAR = pi
+            else:
+                sunrise_HAR = acos(sunrise_a)
+            
+            sunrise_a = (1/15.0)*(mnlong - (180/pi)*ra)
+            if sunrise_a < -0.33:
+                sunrise_EOT = sunrise_a+24
+            elif sunrise_a > 0.33:
+                sunrise_EOT = sunrise_a-24
+            else:
+                sunrise_EOT = sunrise_a
+            
+            t_sunrise = 12 - (1/15.0)*(180/pi)*sunrise_HAR - (longitude/15.0 - timeZone) - sunrise_EOT
+            t_sunset = 12 + (1/15.0)*(180/pi)*sunrise_HAR - (longitude/15.0 - timeZone) - sunrise_EOT
+            
+            if int(t_sunrise) == hour:
+                min=(((t_sunrise - int(t_sunrise))*60)+60)/2.0
+                tutc = hour + min/60.0 - timeZone
+            elif int(t_sunset) == hour:
+                min=((t_sunset - int(t_sunset))*60)/2.0
+                tutc = hour + min/60.0 - timeZone
+            
+            gmst = 6.697375 + 0.0657098242*julian + tutc
+            gmst = gmst - 24*int(gmst/24.0)
+            if (gmst < 0):
+                gmst = gmst + 24
+            
+            lmst = gmst + longitude/15.0
+            lmst = lmst - 24*int(lmst/24.0)
+            if (lmst < 0):
+                lmst = lmst + 24
+            
+            b = 15*(pi/180) * lmst - ra
+            if (b < -pi):
+                HA = b + 2*pi  # in radians
+            elif (b > pi):
+                HA = b - 2*pi  # in radians
+            else:
+                HA = b
+            
+            # sun altitude, not corrected for radiation (in radians):
+            a = sin(beta) * sinLatR + cos(beta) * cosLatR * cos(HA)
+            if (a >= -1) and (a <= 1):
+                alpha0 = asin(a)
+            elif (a > 1):
+                alpha0 = pi/2
+            else:
+                alpha0 = -pi/2
+            
+            # sun altitude, corrected for refraction (in radians):
+            alpha0d = 180/pi * alpha0
+            if (alpha0d > -0.56):
+                r = 3.51561*((0.1594+0.0196*alpha0d+0.00002*(alpha0d**2))/(1+0.505*alpha0d+0.0845*(alpha0d**2)))
+            else:
+                r = 0.56
+            
+            if (alpha0d+r > 90):
+                sunAltitudeR = pi/2
+            else:
+                sunAltitudeR = (pi/180) * (alpha0d+r)
+            
+            # sun azimuth angle (in radians):
+            a = (sin(alpha0)*sin(pi/180*latitude ) - sin(beta))/(cos(alpha0)*cos(pi/180*latitude ))
+            if (a >= -1) and (a <= 1):
+                b = acos(a)
+            elif (cos(alpha0) == 0) or (a < -1):
+                b = pi
+            elif (a > 1):
+                b = 0
+            
+            if (HA < -pi):
+                sunAzimuthR = b
+            elif ((HA >= -pi) and (HA <= 0)) or (HA >= pi):
+                sunAzimuthR = pi - b
+            elif (HA > 0) and (HA < pi):
+                sunAzimuthR = pi + b
+            
+            # sun zenith angle (in radians)
+            sunZenithR = (pi/2) - sunAltitudeR
+            
+            sunZenithDL.append(math.degrees(sunZenithR))
+            sunAzimuthDL.append(math.degrees(sunAzimuthR))
+            sunAltitudeDL.append(math.degrees(sunAltitudeR))
+        
+        return sunZenithDL, sunAzimuthDL, sunAltitudeDL
+    
+    def sunPositions(self, latitude, longitude, timeZone, years, months, days, hours, method = None):
+        """Sun zenith, azimuth and altitude angles (degrees) for the middle of each hour.
+        
+        Results are kept in the cache of SunPositions so the same timeline is calculated once.
+        
+        Args:
+            years, months, days, hours: Lists of the dates. hours are from 0 to 23 as in NRELsunPosition.
+            method: "NREL" for the NREL algorithm that corrects the altitude for refraction or
+                "Sunpath" for the faster NOAA formulas of the Sunpath class. Default is
+                sunPositionMethod.
+        Returns:
+            Three lists for zenith, azimuth and altitude angles.
+        """
+        if method is None: method = self.sunPositionMethod
+        if method not in ("NREL", "Sunpath"):
+            raise ValueError('method should be "NREL" or "Sunpath".')
         
+        key = ('Photovoltaics', method, tuple(years), tuple(months), tuple(days), tuple(hours)) + \
+              SunPositions.siteKey(latitude, longitude, timeZone, 0, False)
         
-        gmst = 6.697375 + 0.0657098242*julian + tutc
-        gmst = gmst - 24*int(gmst/24)
-        
-        if (gmst < 0):
-            gmst = gmst + 24
-        
-        lmst = gmst + longitude/15
-        lmst = lmst - 24*int(lmst/24)
-        
-        if (lmst < 0):
-            lmst = lmst + 24
-       
-        b = 15*(math.pi/180) * lmst - ra
-        
-        if (b < -math.pi):
-            HA = b + 2*math.pi  # in radians
-        elif (b > math.pi):
-            HA = b - 2*math.pi  # in radians
-        else:
-            HA = b
-        
-        # sun altitude, not corrected for radiation (in radians):
-        a = math.sin(beta) * math.sin((math.pi/180)*latitude ) + math.cos(beta) * math.cos((math.pi/180)*latitude ) * math.cos(HA)
-        
-        if (a >= -1) and (a <= 1):
-            alpha0 = math.asin(a)
-        elif (a > 1):
-            alpha0 = math.pi/2
-        elif (a < -1):
-            alpha0 = -math.pi/2
-        
-        # sun altitude, corrected for refraction (in radians):
-        alpha0d = 180/math.pi * alpha0
-        
-        if (alpha0d > -0.56):
-            r = 3.51561*((0.1594+0.0196*alpha0d+0.00002*(alpha0d**2))/(1+0.505*alpha0d+0.0845*(alpha0d**2)))
-        elif (alpha0d <= -0.56):
-            r = 0.56
-        
-        if (alpha0d+r > 90):
-            sunAltitudeR = math.pi/2
-        elif (alpha0d+r <= 90):
-            sunAltitudeR = (math.pi/180) * (alpha0d+r)
-        
-        # sun azimuth angle (in radians):
-        a = (math.sin(alpha0)*math.sin(math.pi/180*latitude ) - math.sin(beta))/(math.cos(alpha0)*math.cos(math.pi/180*latitude ))
-        
-        if (a >= -1) and (a <= 1):
-            b = math.acos(a)
-        elif (math.cos(alpha0) == 0) or (a < -1):
-            b = math.pi
-        elif (a > 1):
-            b = 0
-        
-        if (HA < -math.pi):
-            sunAzimuthR = b
-        elif ((HA >= -math.pi) and (HA <= 0)) or (HA >= math.pi):
-            sunAzimuthR = math.pi - b
-        elif (HA > 0) and (HA < math.pi):
-            sunAzimuthR = math.pi + b
-        
-        # sun zenith angle (in radians)
-        sunZenithR = (math.pi/2) - sunAltitudeR
-        
-        sunZenithD = math.degrees(sunZenithR)
-        sunAzimuthD = math.degrees(sunAzimuthR)
-        sunAltitudeD = math.degrees(sunAltitudeR)
+        def builder():
+            if method == "NREL":
+                return self.NRELsunPositions(latitude, longitude, timeZone, years, months, days, hours)
+            table = SunPositions(latitude, longitude, timeZone, months, days, [hour + 0.5 for hour in hours])
+            sunAltitudeDL = map(math.degrees, table.altitudes)
+            return [90 - altitude for altitude in sunAltitudeDL], map(math.degrees, table.azimuths), sunAltitudeDL
         
-        return sunZenithD, sunAzimuthD, sunAltitudeD
+        return SunPositions.cached(key, builder)
     
     def calculateAlbedo(self, dryBulbTemperature):
         # correcting albedo values for the presence of snow
@@ -7288,6 +10632,21 @@ if checkIn.letItFly:
     sc.sticky["ladybug_ComfortModels"] = ComfortModels
     sc.sticky["ladybug_WindSpeed"] = WindSpeed
     sc.sticky["ladybug_Photovoltaics"] = Photovoltaics
+    sc.sticky["ladybug_Calendar"] = Calendar
+    sc.sticky["ladybug_WeatherCache"] = WeatherCache
+    sc.sticky["ladybug_WeatherArchive"] = WeatherArchive
+    sc.sticky["ladybug_DataCollection"] = DataCollection
+    sc.sticky["ladybug_ConditionalStatement"] = ConditionalStatement
+    sc.sticky["ladybug_SunPositions"] = SunPositions
+    sc.sticky["ladybug_SunEvents"] = SunEvents
+    sc.sticky["ladybug_SkyPatches"] = SkyPatches
+    sc.sticky["ladybug_SkyMatrix"] = SkyMatrix
+    sc.sticky["ladybug_SkyMatrixCache"] = SkyMatrixCache
+    sc.sticky["ladybug_OcclusionBVH"] = OcclusionBVH
+    sc.sticky["ladybug_VisibilityMatrix"] = VisibilityMatrix
+    sc.sticky["ladybug_IntersectionMatrix"] = IntersectionMatrix
+    sc.sticky["ladybug_HourlyResultStore"] = HourlyResultStore
+    sc.sticky["ladybug_ShadowMap"] = ShadowMap
         
     if sc.sticky.has_key("ladybug_release") and sc.sticky["ladybug_release"]:
         now = time.localtime()